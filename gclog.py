@@ -0,0 +1,685 @@
+# coding: utf-8
+
+import sys, os
+import json
+import time
+import glob
+import itertools
+import importlib
+
+"""
+Command line of the gc log parsers.
+
+One entry point for all the parser modules. The format and the collector
+of each input are detected (gclog_detect.py), and only the parser module
+of the input is imported, so that a run on a JDK8 log does not pay for
+the import of the unified logging modules and numpy.
+
+Usage:
+    python2 -O gclog.py parse [INPUT...] [--jobs=N] [--format=jsonl|json] [--out=PATH]
+    # Events of the inputs, one JSON object per line (jsonl, the default)
+    # or one JSON array per input (json).
+    # stdin is parsed as it comes, and events are flushed every --batch=N
+    # events or --latency=SECS seconds (gclog_pipe.py).
+    python2 -O gclog.py stats [INPUT...] --size=SECS [--step=SECS] [--clock=utc|uptime]
+    # Windowed pause statistics (gclog_window.py), per input.
+    python2 -O gclog.py stall [INPUT...] --size=SECS [--clock=uptime|utc]
+    # Windowed safepoint stall which no gc pause accounts for
+    # (gclog_safepoint.py), per input.
+    python2 -O gclog.py follow FILE [--interval=SECS]
+    # Events of a growing log, as tail -f does. A rotated log is reopened.
+    python2 -O gclog.py bench [INPUT...] [--wrap=plain,cache,prefilter]
+    # Lines per second of the parser of each input, plain and wrapped.
+    python2 -O gclog.py index [INPUT...] [--every=N]
+    # Build or update the sidecar index (gclog_index.py) of each input.
+
+    INPUT is a file, a directory (its gc logs), a glob (quoted, e.g.
+    'logs/*.log') or - for stdin, which is the default.
+    --out=PATH writes to a file instead of stdout. If PATH is a directory
+    (or ends with /), one file is written per input, named after it.
+    --module=NAME skips the detection and parses all inputs by a parser
+    module, e.g. --module=gclog_parser_cms.
+    --jobs=N parses N inputs at a time (parse, stats, stall, bench, index).
+    --glob=PATTERNS walks directories recursively for the files whose names
+    match any of the patterns, e.g. --glob='gc*.log*' (gclog_manifest.py).
+    The outputs of --out=DIR/ then keep the paths of the inputs as given
+    under DIR, e.g. DIR/archive/host/jvm/date/gc.log.jsonl.
+    --manifest=PATH (parse, with --out=DIR/) skips the inputs which are
+    unchanged since they were recorded in the manifest, and records each
+    input when it is done, so a run which crashed is resumed by running it
+    again.
+
+"""
+
+################################################################################
+# Constants.
+################################################################################
+
+COMMANDS = ["parse", "stats", "stall", "follow", "bench", "index"]
+
+FORMATS = {"jsonl": ".jsonl", "json": ".json"}
+DEFAULT_FORMAT = "jsonl"
+
+# Lines of stdin read to detect its format.
+STDIN_DETECT_LINES = 200
+
+# Seconds between two reads of a followed log at its end.
+FOLLOW_INTERVAL = 1.0
+
+STDIN = "-"
+
+
+################################################################################
+# Inputs.
+################################################################################
+
+"""
+Paths of inputs given as files, directories or globs.
+
+args :: [String]
+globs :: String | None # walks directories recursively by gclog_manifest.walkLogs.
+return :: [String] # STDIN for stdin.
+
+"""
+def expandInputs(args, globs=None):
+    if len(args) == 0:
+        return [STDIN]
+    paths = []
+    for arg in args:
+        if arg == STDIN:
+            paths.append(arg)
+        elif os.path.isdir(arg) and globs is not None:
+            import gclog_manifest
+            paths.extend(p for (p, size, mtime) in gclog_manifest.walkLogs(arg, globs))
+        elif os.path.isdir(arg):
+            import gclog_detect
+            paths.extend(gclog_detect.listLogs(arg))
+        elif os.path.exists(arg):
+            paths.append(arg)
+        else:
+            matched = sorted(glob.glob(arg))
+            if len(matched) == 0:
+                raise IOError("No such file: %s" % arg)
+            paths.extend(matched)
+    return paths
+
+"""
+Detection of an input.
+
+path :: String
+moduleName :: String | None # skips the detection.
+return :: Dictionary # as gclog_detect.detectFile.
+
+"""
+def detectInput(path, moduleName=None):
+    if moduleName is not None:
+        return {'path': path, 'module': moduleName, 'format': None,
+                'collector': None, 'layout': None}
+    import gclog_detect
+    return gclog_detect.detectFile(path)
+
+"""
+Parser module of a detection, imported now.
+An input of unknown format or collector is reported to stderr.
+
+found :: Dictionary
+return :: Module | None
+
+"""
+def loadModule(found):
+    if found['module'] is None:
+        sys.stderr.write("%s: unknown format or collector (%s, %s), skipped\n"
+                         % (found['path'], found['format'], found['collector']))
+        return None
+    module = importlib.import_module(found['module'])
+    if hasattr(module, 'setLayout'):
+        import gclog_unified
+        # A worker may have set the layout of another input.
+        module.setLayout(found.get('layout') or gclog_unified.DEFAULT_LAYOUT)
+    return module
+
+"""
+Lines of stdin, and its detection from the first of them.
+
+Detection is tried at 1, 2, 4, ... lines until the collector is found or
+STDIN_DETECT_LINES lines came, not to hold a slow stream back.
+
+moduleName :: String | None
+lines :: Iterable String | None # lines of stdin, gclog_pipe.pipeLines by default.
+return :: (Dictionary, Iterable String)
+
+"""
+def detectStdin(moduleName=None, lines=None):
+    import gclog_pipe
+
+    if lines is None:
+        lines = gclog_pipe.pipeLines(sys.stdin)
+    if moduleName is not None:
+        return (detectInput(STDIN, moduleName), lines)
+    import gclog_detect
+    head = []
+    found = gclog_detect.detectLines(head)
+    tryAt = 1
+    for line in lines:
+        head.append(line)
+        if len(head) == tryAt or len(head) >= STDIN_DETECT_LINES:
+            found = gclog_detect.detectLines(head)
+            if found['module'] is not None or len(head) >= STDIN_DETECT_LINES:
+                break
+            tryAt *= 2
+    else:
+        found = gclog_detect.detectLines(head)
+    found['path'] = STDIN
+    return (found, itertools.chain(head, lines))
+
+"""
+Events of an input.
+
+path :: String
+moduleName :: String | None
+unparsed :: ((String, ParseError) -> ANY) | None
+found :: Dictionary | None # detection of the input if done already.
+lines :: Iterable String | None # lines of stdin given with found by detectStdin.
+return :: Generator Dictionary
+
+"""
+def inputEvents(path, moduleName=None, unparsed=None, found=None, lines=None):
+    if path == STDIN:
+        if found is None:
+            (found, lines) = detectStdin(moduleName)
+        module = loadModule(found)
+        if module is None:
+            return
+        for data in module.iterGcLog(lines, unparsed):
+            yield data
+        return
+    if found is None:
+        found = detectInput(path, moduleName)
+    module = loadModule(found)
+    if module is None:
+        return
+    with open(path, 'r') as fd:
+        for data in module.iterGcLog(fd, unparsed):
+            yield data
+
+
+################################################################################
+# Outputs.
+################################################################################
+
+"""
+Write events in a format.
+
+events :: Iterable Dictionary
+fd :: File
+fmt :: 'jsonl' | 'json'
+return :: Int # events written.
+
+"""
+def writeEvents(events, fd, fmt=DEFAULT_FORMAT):
+    n = 0
+    if fmt == "json":
+        fd.write("[")
+        for data in events:
+            if n > 0:
+                fd.write(", ")
+            fd.write(json.dumps(data))
+            n += 1
+        fd.write("]\n")
+    else:
+        for data in events:
+            fd.write(json.dumps(data))
+            fd.write("\n")
+            n += 1
+    return n
+
+"""
+Whether --out is a directory of one file per input.
+
+out :: String | None
+return :: Bool
+
+"""
+def isOutDir(out):
+    return out is not None and (out.endswith('/') or os.path.isdir(out))
+
+"""
+Path of the output of an input in an output directory.
+
+out :: String
+path :: String
+suffix :: String
+keepPath :: Bool # keep the path of the input under out, not only its name.
+return :: String
+
+"""
+def outPath(out, path, suffix, keepPath=False):
+    if path == STDIN:
+        name = 'stdin'
+    elif keepPath:
+        parts = os.path.normpath(path).split(os.sep)
+        name = os.path.join(*[p for p in parts if p not in ('', os.curdir, os.pardir)])
+    else:
+        name = os.path.basename(path)
+    return os.path.join(out, name + suffix)
+
+"""
+Run a task on every input, a few at a time.
+
+A task writes its results to its own file, or returns them to be written
+by the caller in the order of the inputs.
+
+task :: (Tuple -> ANY) # a function of this module, to be run by workers.
+argsL :: [Tuple]
+jobs :: Int
+return :: Iterable ANY
+
+"""
+def runTasks(task, argsL, jobs):
+    if jobs <= 1 or len(argsL) <= 1 or any(a[0] == STDIN for a in argsL):
+        return itertools.imap(task, argsL)
+    return mapPool(task, argsL, jobs)
+
+# ((Tuple -> ANY), [Tuple], Int) -> Generator ANY
+def mapPool(task, argsL, jobs):
+    from multiprocessing import Pool
+
+    pool = Pool(processes=min(jobs, len(argsL)))
+    try:
+        for ret in pool.imap(task, argsL):
+            yield ret
+    finally:
+        pool.close()
+        pool.join()
+
+
+################################################################################
+# Commands.
+################################################################################
+
+"""
+Parse an input.
+This runs in a worker process when --jobs is given.
+
+args :: (String, String | None, String | None, String)
+        # (path, module name, output path, format)
+return :: Int | [Dictionary] | None # events written, or events if no output path.
+                                   # None for an input of unknown kind.
+
+"""
+def parseTask(args):
+    (path, moduleName, out, fmt) = args
+    if out is None:
+        return list(inputEvents(path, moduleName))
+    if path == STDIN:
+        found = None
+    else:
+        found = detectInput(path, moduleName)
+        if loadModule(found) is None:
+            return None
+    outDir = os.path.dirname(out)
+    if not os.path.isdir(outDir):
+        try:
+            os.makedirs(outDir)
+        except OSError:
+            # Made by another worker meanwhile.
+            if not os.path.isdir(outDir):
+                raise
+    with open(out, 'w') as fd:
+        return writeEvents(inputEvents(path, moduleName, found=found), fd, fmt)
+
+"""
+Parse an input, and make its record of the manifest.
+This runs in a worker process when --jobs is given.
+
+args :: (String, String | None, String, String) # as parseTask.
+return :: Record | None # gclog_manifest.newRecord with out and events.
+
+"""
+def recordTask(args):
+    import gclog_manifest
+
+    record = gclog_manifest.newRecord(args[0])
+    n = parseTask(args)
+    if n is None:
+        return None
+    record['out'] = args[2]
+    record['events'] = n
+    return record
+
+# (Dictionary, [String]) -> Int
+def cmdParse(opts, paths):
+    fmt = opts.get('format', DEFAULT_FORMAT)
+    if fmt not in FORMATS:
+        raise ValueError("Unknown format: %s" % fmt)
+    moduleName = opts.get('module')
+    jobs = int(opts.get('jobs', 1))
+    out = opts.get('out')
+    manifest = opts.get('manifest')
+    if manifest is not None and (not isOutDir(out) or STDIN in paths):
+        raise ValueError("--manifest needs --out=DIR/ and inputs other than stdin")
+    if isOutDir(out):
+        if not os.path.isdir(out):
+            os.makedirs(out)
+        task = parseTask
+        fd = None
+        if manifest is not None:
+            import gclog_manifest
+            done = gclog_manifest.loadManifest(manifest)
+            pending = [p for p in paths if not gclog_manifest.isUnchanged(done.get(p), p)]
+            sys.stderr.write('%d inputs unchanged, %d to parse\n'
+                             % (len(paths) - len(pending), len(pending)))
+            paths = pending
+            task = recordTask
+            fd = gclog_manifest.openManifest(manifest)
+        keepPath = 'glob' in opts
+        argsL = [(p, moduleName, outPath(out, p, FORMATS[fmt], keepPath), fmt) for p in paths]
+        try:
+            for (args, n) in zip(argsL, runTasks(task, argsL, jobs)):
+                if n is None:
+                    continue
+                if fd is not None:
+                    gclog_manifest.appendRecord(fd, n)
+                    n = n['events']
+                sys.stderr.write('%s: %d events\n' % (args[2], n))
+        finally:
+            if fd is not None:
+                fd.close()
+        return 0
+    if paths == [STDIN] and fmt == 'jsonl' and out is None:
+        return pipeStdin(opts)
+    fd = open(out, 'w') if out is not None else sys.stdout
+    try:
+        if jobs <= 1:
+            # Events are written as they are parsed.
+            for p in paths:
+                writeEvents(inputEvents(p, moduleName), fd, fmt)
+        else:
+            argsL = [(p, moduleName, None, fmt) for p in paths]
+            for events in runTasks(parseTask, argsL, jobs):
+                writeEvents(events, fd, fmt)
+    finally:
+        if fd is not sys.stdout:
+            fd.close()
+    return 0
+
+"""
+Parse stdin as it comes, flushing events by --batch or --latency
+(gclog_pipe.py).
+
+opts :: Dictionary
+return :: Int
+
+"""
+def pipeStdin(opts):
+    import gclog_pipe
+
+    writer = gclog_pipe.mkBatchWriter(
+        sys.stdout, int(opts.get('batch', gclog_pipe.DEFAULT_BATCH)),
+        float(opts.get('latency', gclog_pipe.DEFAULT_LATENCY)))
+    (found, lines) = detectStdin(opts.get('module'), gclog_pipe.pipeLines(sys.stdin, writer))
+    module = loadModule(found)
+    if module is None:
+        return 1
+    gclog_pipe.pipeEvents(module, lines, writer)
+    return 0
+
+"""
+Windowed pause statistics of an input.
+This runs in a worker process when --jobs is given.
+
+args :: (String, String | None, Float, Float | None, String)
+        # (path, module name, size, step, clock)
+return :: [Dictionary]
+
+"""
+def statsTask(args):
+    import gclog_window
+
+    (path, moduleName, size, step, clock) = args
+    windows = []
+    for w in gclog_window.windowStats(inputEvents(path, moduleName), size, step, clock):
+        w['path'] = path
+        windows.append(w)
+    return windows
+
+# (Dictionary, [String]) -> Int
+def cmdStats(opts, paths):
+    if opts.get('size') is None:
+        sys.stderr.write("Usage: gclog.py stats [INPUT...] --size=SECS [--step=SECS] [--clock=utc|uptime]\n")
+        return 2
+    size = float(opts['size'])
+    step = float(opts['step']) if 'step' in opts else None
+    clock = opts.get('clock', 'utc')
+    argsL = [(p, opts.get('module'), size, step, clock) for p in paths]
+    out = opts.get('out')
+    fd = open(out, 'w') if out is not None else sys.stdout
+    try:
+        for windows in runTasks(statsTask, argsL, int(opts.get('jobs', 1))):
+            writeEvents(windows, fd, 'jsonl')
+    finally:
+        if fd is not sys.stdout:
+            fd.close()
+    return 0
+
+"""
+Windowed safepoint stall of an input. The safepoint lines are caught
+from the lines its parser module leaves unparsed, so it is read once.
+The catcher parses the unified headers by the layout detected for the
+gc parser module, or the default one.
+This runs in a worker process when --jobs is given.
+
+args :: (String, String | None, Float, String)
+        # (path, module name, size, clock)
+return :: [Dictionary]
+
+"""
+def stallTask(args):
+    import gclog_safepoint
+    import gclog_unified
+
+    (path, moduleName, size, clock) = args
+    if path == STDIN:
+        (found, lines) = detectStdin(moduleName)
+    else:
+        (found, lines) = (detectInput(path, moduleName), None)
+    # A worker may have set the layout of another input.
+    gclog_safepoint.setLayout(found.get('layout') or gclog_unified.DEFAULT_LAYOUT)
+    catch = gclog_safepoint.mkSafepointCatcher()
+    events = gclog_safepoint.interleave(inputEvents(path, moduleName, catch, found, lines), catch)
+    windows = []
+    for w in gclog_safepoint.stallWindows(gclog_safepoint.joinPauses(events, clock), size, clock):
+        w['path'] = path
+        windows.append(w)
+    return windows
+
+# (Dictionary, [String]) -> Int
+def cmdStall(opts, paths):
+    if opts.get('size') is None:
+        sys.stderr.write("Usage: gclog.py stall [INPUT...] --size=SECS [--clock=uptime|utc]\n")
+        return 2
+    size = float(opts['size'])
+    clock = opts.get('clock', 'uptime')
+    argsL = [(p, opts.get('module'), size, clock) for p in paths]
+    out = opts.get('out')
+    fd = open(out, 'w') if out is not None else sys.stdout
+    try:
+        for windows in runTasks(stallTask, argsL, int(opts.get('jobs', 1))):
+            writeEvents(windows, fd, 'jsonl')
+    finally:
+        if fd is not sys.stdout:
+            fd.close()
+    return 0
+
+"""
+Lines of a growing file, as tail -f gives them.
+
+A line is given only when it is complete. When the file is replaced
+(another inode) or truncated, it is read again from its head.
+
+path :: String
+interval :: Float # seconds to sleep at the end of the file.
+return :: Generator String
+
+"""
+def followLines(path, interval=FOLLOW_INTERVAL):
+    fd = open(path, 'r')
+    ino = os.fstat(fd.fileno()).st_ino
+    partial = ''
+    try:
+        while True:
+            line = fd.readline()
+            if line:
+                if not line.endswith('\n'):
+                    partial += line
+                    continue
+                yield partial + line
+                partial = ''
+                continue
+            time.sleep(interval)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if st.st_ino != ino or st.st_size < fd.tell():
+                fd.close()
+                fd = open(path, 'r')
+                ino = os.fstat(fd.fileno()).st_ino
+                partial = ''
+    finally:
+        fd.close()
+
+# (Dictionary, [String]) -> Int
+def cmdFollow(opts, paths):
+    if len(paths) != 1 or paths[0] == STDIN:
+        raise ValueError("follow takes one file")
+    path = paths[0]
+    interval = float(opts.get('interval', FOLLOW_INTERVAL))
+    moduleName = opts.get('module')
+    while moduleName is None:
+        found = detectInput(path)
+        if found['module'] is not None:
+            break
+        # Too few lines yet to tell.
+        time.sleep(interval)
+    else:
+        found = detectInput(path, moduleName)
+    module = loadModule(found)
+    if module is None:
+        return 1
+    for data in module.iterGcLog(followLines(path, interval)):
+        sys.stdout.write(json.dumps(data) + '\n')
+        sys.stdout.flush()
+    return 0
+
+"""
+Time the parser of an input, plain and with the wrappers.
+This runs in a worker process when --jobs is given.
+
+args :: (String, String | None, [String]) # (path, module name, wrappers)
+return :: [Dictionary]
+
+"""
+def benchTask(args):
+    (path, moduleName, wraps) = args
+    found = detectInput(path, moduleName)
+    module = loadModule(found)
+    if module is None:
+        return []
+    with open(path, 'r') as fd:
+        lines = fd.readlines()
+    results = []
+    for wrap in wraps:
+        if wrap == 'plain':
+            parser = module.parseJavaGcLog
+        elif wrap == 'cache':
+            import gclog_cache
+            parser = gclog_cache.mkShapeCache(module.parseJavaGcLog, module.ParseError)
+        elif wrap == 'prefilter':
+            import gclog_prefilter
+            parser = gclog_prefilter.mkPrefilter(module.parseJavaGcLog, module.ParseError,
+                                                 module.PREFILTER_LITERALS)
+        else:
+            raise ValueError("Unknown wrapper: %s" % wrap)
+        t0 = time.time()
+        n = 0
+        for data in module.iterGcLog(lines, parser=parser):
+            n += 1
+        secs = time.time() - t0
+        results.append({'path': path, 'module': found['module'], 'wrap': wrap,
+                        'lines': len(lines), 'events': n, 'secs': secs,
+                        'lines_per_sec': len(lines) / secs if secs > 0 else None})
+    return results
+
+# (Dictionary, [String]) -> Int
+def cmdBench(opts, paths):
+    wraps = opts.get('wrap', 'plain').split(',')
+    argsL = [(p, opts.get('module'), wraps) for p in paths if p != STDIN]
+    for results in runTasks(benchTask, argsL, int(opts.get('jobs', 1))):
+        writeEvents(results, sys.stdout, 'jsonl')
+    return 0
+
+"""
+Build or update the sidecar index of an input.
+This runs in a worker process when --jobs is given.
+
+args :: (String, Int)
+return :: Dictionary
+
+"""
+def indexTask(args):
+    import gclog_index
+
+    (path, every) = args
+    idx = gclog_index.updateIndex(path, every)
+    return {'path': path, 'lines': idx['lines'], 'entries': len(idx['entries'])}
+
+# (Dictionary, [String]) -> Int
+def cmdIndex(opts, paths):
+    import gclog_index
+
+    every = int(opts.get('every', gclog_index.DEFAULT_EVERY))
+    argsL = [(p, every) for p in paths if p != STDIN]
+    writeEvents(runTasks(indexTask, argsL, int(opts.get('jobs', 1))), sys.stdout, 'jsonl')
+    return 0
+
+
+################################################################################
+# main
+################################################################################
+
+"""
+Run a command line.
+
+argv :: [String] # without the program name.
+return :: Int # exit status.
+
+"""
+def main(argv):
+    if len(argv) == 0 or argv[0] not in COMMANDS:
+        sys.stderr.write("Usage: gclog.py {%s} [INPUT...] [--OPTION=VALUE...]\n"
+                         % "|".join(COMMANDS))
+        return 2
+    args = [a for a in argv[1:] if not a.startswith('--')]
+    opts = dict((a[2:].split('=', 1) + [None])[:2] for a in argv[1:] if a.startswith('--'))
+    paths = expandInputs(args, opts.get('glob'))
+    cmd = argv[0]
+    # Output is cut short by head and the like without a traceback.
+    import gclog_pipe
+    gclog_pipe.defaultSigpipe()
+    if cmd == 'parse':
+        return cmdParse(opts, paths)
+    elif cmd == 'stats':
+        return cmdStats(opts, paths)
+    elif cmd == 'stall':
+        return cmdStall(opts, paths)
+    elif cmd == 'follow':
+        return cmdFollow(opts, paths)
+    elif cmd == 'bench':
+        return cmdBench(opts, paths)
+    return cmdIndex(opts, paths)
+
+if __name__=='__main__':
+    sys.exit(main(sys.argv[1:]))
+
+# end of file.
@@ -0,0 +1,315 @@
+# coding: utf-8
+
+import sys
+import json
+import importlib
+from collections import deque, OrderedDict
+
+"""
+Assembly of events printed over many lines.
+
+Some events of a gc log are printed over several lines, e.g. the
+concurrent mode failure of CMS
+    ... [CMS-concurrent-abortable-preclean: 1.989/4.482 secs] ...
+     (concurrent mode failure): 1041940K->1048575K(1048576K), ...
+which the grammar parses line by line into fragments
+(CMS-concurrent-abortable-preclean-fullgc0 and -fullgc1 here).
+This joins the fragments of an event as the rules of a parser module
+(MULTILINE_RULES) describe them.
+
+A rule is a dictionary:
+    start      type of the fragment which opens an event.
+    end        type of the fragment which closes it.
+    parts      {type: key} of the fragments between them, which are
+               appended to the list data[key] without their "type".
+               A key of None merges the fragment into the event, and
+               a key of (key, [field]) appends only the values of the
+               fields as a list, e.g. ("ages", ["age", "bytes"]) gives
+               "ages": [[1, 30011408], [2, 3437248]].
+    type       type of the joined event.
+    lookahead  events after the start within which the end must come.
+    timeout    seconds of uptime after the start within which the end
+               must come (None for no limit).
+    orphans    'keep' (the default) or 'drop' the ends and parts which
+               come without a start.
+A part or an end may belong to many rules, e.g. the detail lines of
+both young and mixed pauses, and goes to the one which is open.
+
+A rule with a "key" instead of a "start" joins by that field, for logs
+whose fragments are printed before the event and carry its id, e.g.
+the gc,phases lines of a pause of unified logging before the pause:
+    key        field which tells the event of a fragment, e.g. "gc_id".
+    end        types of the events into which the parts are merged.
+    parts      as above.
+    open       keys held at most; the oldest is an orphan when another
+               comes (DEFAULT_OPEN_KEYS).
+    orphans    as above. Parts kept as orphans are given when they are
+               dropped from the held keys, not in the order of the log.
+The parts of a key are held until an end with the key comes, and only
+`open` keys are held, so a log of any length is joined in one pass.
+
+The start, the parts and the end are merged into one dictionary, later
+fragments overriding earlier ones, and "type" is set to the type of
+the rule.
+An event whose end does not come in time is an orphan: its start is
+given as it is with "orphan": True, and so is an end or a part which
+comes without a start, unless its rule drops them. Nothing fails on a
+log which was cut or whose lines are out of order.
+
+Events are given as soon as they are complete. An event which comes
+while another is open is held until the open one is complete or an
+orphan, so the order of the log is kept; at most `lookahead` events are
+held per rule.
+
+Chunked-parallel parsing (gclog_index.parallelParse) parses the chunks
+in workers and joins their events here in order, so an event whose
+fragments fall into two chunks is joined as well.
+
+Usage:
+    for data in assemble(events, module.MULTILINE_RULES):
+        ...
+
+    python2 -O this.py module < ${GC_LOG_FILE} | ${YOUR_ANALYZER}
+    # module is a parser module such as gclog_parser_cms.
+    # The number of orphans is written to stderr.
+
+"""
+
+################################################################################
+# Constants.
+################################################################################
+
+DEFAULT_LOOKAHEAD = 4
+
+# Keys whose parts are held by a rule with a "key".
+DEFAULT_OPEN_KEYS = 8
+
+
+################################################################################
+# Assembler.
+################################################################################
+
+"""
+Uptime of an event, None if it has no stamp (e.g. a continuation line).
+
+data :: Dictionary
+return :: Float | None
+
+"""
+def eventUptime(data):
+    if "end_sec" in data:
+        return data["end_sec"]
+    return data.get("timestamp")
+
+"""
+A new assembler.
+
+rules :: [Rule]
+return :: Assembler
+
+Assembler :: {'rules': [Rule],
+              'roles': {String: [(Int, String)]}, # type -> [(rule, 'start'|'end'|'part')]
+              'open': {Int: Fragment},          # open event of each rule.
+              'queue': deque(Fragment)}         # events held in order.
+Fragment :: {'rule': Int | None, 'data': Dictionary, 'seen': Int,
+             't0': Float | None, 'done': Bool}
+
+"""
+def newAssembler(rules):
+    roles = {}
+    for (i, rule) in enumerate(rules):
+        roles.setdefault(rule["start"], []).append((i, 'start'))
+        roles.setdefault(rule["end"], []).append((i, 'end'))
+        for t in rule.get("parts", {}):
+            roles.setdefault(t, []).append((i, 'part'))
+    return {'rules': rules, 'roles': roles, 'open': {}, 'queue': deque()}
+
+"""
+Merge a part into an event.
+
+event :: Dictionary
+data :: Dictionary # the part.
+key :: String | (String, [String]) | None # of the parts of a rule.
+
+"""
+def mergePart(event, data, key):
+    if key is None:
+        t = event["type"]
+        event.update(data)
+        event["type"] = t
+    elif isinstance(key, tuple):
+        (key, fields) = key
+        event.setdefault(key, []).append([data.get(f) for f in fields])
+    else:
+        part = dict(data)
+        del part["type"]
+        event.setdefault(key, []).append(part)
+
+# (Assembler, Int) -> ()
+def orphanOpen(state, i):
+    frag = state['open'].pop(i)
+    frag['data']['orphan'] = True
+    frag['done'] = True
+
+"""
+Give an event to an assembler.
+
+state :: Assembler
+data :: Dictionary
+return :: [Dictionary] # events complete now, in order.
+
+"""
+def feed(state, data):
+    rules = state['rules']
+    opened = state['open']
+    roles = state['roles'].get(data["type"], [])
+    mine = [i for (i, kind) in roles if kind != 'start']
+    if opened:
+        t = eventUptime(data)
+        for i in opened.keys():
+            if i in mine:
+                continue
+            frag = opened[i]
+            frag['seen'] += 1
+            rule = rules[i]
+            timeout = rule.get("timeout")
+            if frag['seen'] > rule.get("lookahead", DEFAULT_LOOKAHEAD) or \
+               (timeout is not None and t is not None and frag['t0'] is not None and
+                t - frag['t0'] > timeout):
+                orphanOpen(state, i)
+    queue = state['queue']
+    starts = [i for (i, kind) in roles if kind == 'start']
+    if not roles:
+        queue.append({'rule': None, 'data': data, 'done': True})
+    elif starts:
+        i = starts[0]
+        if i in opened:
+            orphanOpen(state, i)
+        frag = {'rule': i, 'data': data, 'seen': 0, 't0': eventUptime(data), 'done': False}
+        opened[i] = frag
+        queue.append(frag)
+    else:
+        for (i, kind) in roles:
+            if i in opened:
+                break
+        else:
+            (i, kind) = roles[0]
+        frag = opened.get(i)
+        if frag is None:
+            if rules[i].get("orphans", 'keep') == 'keep':
+                data['orphan'] = True
+                queue.append({'rule': None, 'data': data, 'done': True})
+        elif kind == 'part':
+            mergePart(frag['data'], data, rules[i]["parts"][data["type"]])
+        else:
+            frag['data'].update(data)
+            frag['data']["type"] = rules[i]["type"]
+            frag['done'] = True
+            del opened[i]
+    ready = []
+    while queue and queue[0]['done']:
+        ready.append(queue.popleft()['data'])
+    return ready
+
+"""
+Give the events held by an assembler at the end of a stream.
+Open events are orphans.
+
+state :: Assembler
+return :: [Dictionary]
+
+"""
+def finish(state):
+    for i in state['open'].keys():
+        orphanOpen(state, i)
+    ready = [frag['data'] for frag in state['queue']]
+    state['queue'].clear()
+    return ready
+
+"""
+Join the parts of a stream of events to the ends with the same key.
+
+events :: Iterable Dictionary
+rule :: Rule # with "key".
+return :: Generator Dictionary
+
+"""
+def joinByKey(events, rule):
+    field = rule["key"]
+    ends = frozenset(rule["end"])
+    parts = rule["parts"]
+    limit = rule.get("open", DEFAULT_OPEN_KEYS)
+    keep = rule.get("orphans", 'keep') == 'keep'
+    held = OrderedDict()    # key -> parts merged so far.
+    for data in events:
+        t = data["type"]
+        if t in parts:
+            k = data.get(field)
+            event = held.get(k)
+            if event is None:
+                if len(held) >= limit:
+                    (k0, orphan) = held.popitem(last=False)
+                    if keep:
+                        orphan['orphan'] = True
+                        yield orphan
+                event = held[k] = {"type": t, field: k}
+            mergePart(event, data, parts[t])
+        elif t in ends and data.get(field) in held:
+            event = held.pop(data[field])
+            event.update(data)
+            yield event
+        else:
+            yield data
+    if keep:
+        for orphan in held.itervalues():
+            orphan['orphan'] = True
+            yield orphan
+
+"""
+Join the fragments of a stream of events.
+Rules with a "key" are applied first, in order.
+
+events :: Iterable Dictionary
+rules :: [Rule]
+return :: Generator Dictionary
+
+"""
+def assemble(events, rules):
+    for rule in rules:
+        if "key" in rule:
+            events = joinByKey(events, rule)
+    rules = [rule for rule in rules if "key" not in rule]
+    if not rules:
+        for data in events:
+            yield data
+        return
+    state = newAssembler(rules)
+    for data in events:
+        for ready in feed(state, data):
+            yield ready
+    for ready in finish(state):
+        yield ready
+
+
+################################################################################
+# main
+################################################################################
+
+if __name__=='__main__':
+    module = importlib.import_module(sys.argv[1])
+    rules = getattr(module, 'MULTILINE_RULES', [])
+
+    def parsed():
+        for line in sys.stdin:
+            try:
+                yield module.parseJavaGcLog(line.rstrip(), {})[1]
+            except module.ParseError:
+                pass
+
+    orphans = 0
+    for data in assemble(parsed(), rules):
+        orphans += data.get('orphan', False)
+        print json.dumps(data)
+    sys.stderr.write('%d orphans\n' % orphans)
+
+# end of file.
@@ -0,0 +1,171 @@
+# coding: utf-8
+
+import sys
+import json
+import time
+import importlib
+
+"""
+Line-shape cache for the alternatives of orP.
+
+A gc log repeats a few dozen kinds of lines. With the digits removed,
+the head of a line (its shape) tells which alternative of parseJavaGcLog
+parses it. This cache remembers the alternative which parsed each shape,
+so the next line of the same shape goes to it directly instead of
+trying the alternatives one by one.
+When there is no entry, or the remembered alternative fails, the whole
+orP is tried as before and the entry is updated.
+
+The shape is the first `width` characters of the line without digits,
+which include the decorators or stamps at the head and the name of the
+event. Two alternatives which can both parse one line (orP takes the
+first of them) must differ within it.
+
+The cache is an LRU of `size` entries. A hit only updates the tick of
+its entry, and the least recently used entry is looked for only when
+the cache is full, which is rare as the shapes are few.
+
+Usage:
+    parse = mkShapeCache(module.parseJavaGcLog, module.ParseError)
+    for data in module.iterGcLog(lines, parser=parse):
+        ...
+    print parse.stats
+    # {'lookups': Int, 'hits': Int, 'misses': Int, 'stale': Int,
+    #  'evictions': Int}
+
+    python2 -O this.py module < ${GC_LOG_FILE} | ${YOUR_ANALYZER}
+    # module is a parser module such as gclog_parser_cms.
+    # The stats are written to stderr.
+
+"""
+
+################################################################################
+# Constants.
+################################################################################
+
+# Entries of a cache.
+DEFAULT_SIZE = 256
+
+# Characters of a shape.
+DEFAULT_WIDTH = 64
+
+# Characters looked at to make a shape. Digits are at most half of the
+# head of a line, such as the stamps.
+SCAN_WIDTH = 4 * DEFAULT_WIDTH
+
+DIGITS = "0123456789"
+
+
+################################################################################
+# Shape.
+################################################################################
+
+"""
+Shape of a line.
+
+text :: String
+width :: Int
+return :: String
+
+"""
+def lineShape(text, width=DEFAULT_WIDTH):
+    return text[:max(SCAN_WIDTH, 4 * width)].translate(None, DIGITS)[:width]
+
+"""
+Hit rate of the stats of a cache.
+
+stats :: Dictionary
+return :: Float
+
+"""
+def hitRate(stats):
+    if stats["lookups"] == 0:
+        return 0.0
+    return float(stats["hits"]) / stats["lookups"]
+
+
+################################################################################
+# Cache.
+################################################################################
+
+"""
+Wrap an orP parser with a line-shape cache.
+
+The wrapper behaves like the parser, and has the counters as .stats.
+    lookups    lines parsed.
+    hits       lines parsed by the remembered alternative.
+    misses     lines of a shape without entry.
+    stale      lines which the remembered alternative failed to parse.
+    evictions  entries dropped by the LRU.
+
+parser :: Parser # an orP or a dispatchP, typically parseJavaGcLog.
+error :: Exception class # ParseError of the module of the parser.
+size :: Int
+width :: Int
+return :: Parser
+
+"""
+def mkShapeCache(parser, error, size=DEFAULT_SIZE, width=DEFAULT_WIDTH):
+    if getattr(parser, 'combinator', None) not in ('or', 'dispatch'):
+        raise ValueError("Only orP and dispatchP can be cached: %r" % parser)
+    alternatives = parser.parsers
+    entries = {}    # shape -> [index of alternative, tick of last use]
+    stats = {'lookups': 0, 'hits': 0, 'misses': 0, 'stale': 0, 'evictions': 0}
+
+    def full_(text, data, shape):
+        # Same as parser, but finds which alternative succeeds.
+        msgL = []
+        for (i, alt) in enumerate(alternatives):
+            try:
+                ret = alt(text, data)
+            except error, msg:
+                msgL.append(msg)
+                continue
+            if len(entries) >= size:
+                oldest = min(entries, key=lambda k: entries[k][1])
+                del entries[oldest]
+                stats['evictions'] += 1
+            entries[shape] = [i, stats['lookups']]
+            return ret
+        raise error(str(msgL))
+
+    def parseCached_(text, data):
+        stats['lookups'] += 1
+        shape = lineShape(text, width)
+        entry = entries.get(shape)
+        if entry is None:
+            stats['misses'] += 1
+            return full_(text, data, shape)
+        entry[1] = stats['lookups']
+        try:
+            # A copy, not to leave fields of a failed alternative.
+            ret = alternatives[entry[0]](text, dict(data) if isinstance(data, dict) else data)
+        except error:
+            stats['stale'] += 1
+            del entries[shape]
+            return full_(text, data, shape)
+        stats['hits'] += 1
+        return ret
+
+    parseCached_.stats = stats
+    parseCached_.entries = entries
+    return parseCached_
+
+
+################################################################################
+# main
+################################################################################
+
+if __name__=='__main__':
+    module = importlib.import_module(sys.argv[1])
+    parse = mkShapeCache(module.parseJavaGcLog, module.ParseError)
+    t0 = time.time()
+    for data in module.iterGcLog(sys.stdin, parser=parse):
+        print json.dumps(data)
+    stats = dict(parse.stats)
+    stats['hit_rate'] = hitRate(stats)
+    stats['shapes'] = len(parse.entries)
+    stats['secs'] = time.time() - t0
+    sys.stderr.write(json.dumps(stats) + '\n')
+
+# end of file.
@@ -0,0 +1,221 @@
+# coding: utf-8
+
+import re
+
+"""
+Chunk-at-a-time scanner for single-line gc log formats.
+
+The line parsers built by andP/orP are called once per line from python.
+This scanner compiles the same grammar into a few fused re.MULTILINE
+patterns and runs them with finditer over large buffers, so the loop over
+lines runs inside the regex engine.
+Matched lines are converted to dictionaries in batches by replaying the
+taggers and data modifiers of the original grammar.
+
+It is only valid for formats where every event is one self-contained line,
+such as the unified logging of OpenJDK11 (gclog_parser_g1_jdk11.py and
+gclog_parser_she_jdk11.py).
+
+Usage:
+    scan = mkChunkScanner(parseJavaGcLog)
+    stats = {}
+    with open(filename, 'rb') as fd:
+        for data in scan(fd, stats):
+            ...
+    # stats: {'lines': Int, 'matched': Int, 'unmatched': Int}
+
+"""
+
+################################################################################
+# Constants.
+################################################################################
+
+# Size of a buffer read at once.
+CHUNK_SIZE = 16 * 1024 * 1024
+
+# The re module of python2 supports up to 100 groups per pattern.
+# Alternatives are packed into families not to exceed this.
+MAX_GROUPS = 99
+
+
+################################################################################
+# Grammar compiler.
+################################################################################
+
+"""
+Flatten a line parser into a list of steps.
+
+The parser must be built from newP, mkTagger and andP only.
+
+parser :: Parser
+skip :: [Parser] # parsers to leave out.
+return :: [('tag', String, ANY) | ('re', String, dataModifier, Int)]
+# Int of 're' is the number of groups in the regex.
+
+"""
+def flattenP(parser, skip=()):
+    if parser in skip:
+        return []
+    if hasattr(parser, 'regexStr'):
+        n = re.compile(parser.regexStr).groups
+        return [('re', parser.regexStr, parser.dataModifier, n)]
+    if hasattr(parser, 'tagKey'):
+        return [('tag', parser.tagKey, parser.tagValue)]
+    if getattr(parser, 'combinator', None) == 'and':
+        steps = []
+        for p in parser.parsers:
+            steps.extend(flattenP(p, skip))
+        return steps
+    raise ValueError("Parser cannot be fused: %r" % parser)
+
+"""
+Alternatives of a parser.
+Nested orP and dispatchP are expanded in order.
+
+parser :: Parser
+return :: [Parser]
+
+"""
+def alternativesP(parser):
+    if getattr(parser, 'combinator', None) in ('or', 'dispatch'):
+        alts = []
+        for p in parser.parsers:
+            alts.extend(alternativesP(p))
+        return alts
+    return [parser]
+
+"""
+Compile a parser into fused patterns.
+
+Each family is a compiled pattern and a table from the group index
+of each alternative to its steps.
+
+parser :: Parser
+skip :: [Parser]
+prefix :: String # regex put in front of every alternative.
+return :: [(Pattern, {Int: [Step]})]
+
+"""
+def compileFused(parser, skip=(), prefix=r"^"):
+    families = []
+    regexL = []
+    table = {}
+    ngroups = 0
+    for alt in alternativesP(parser):
+        steps = flattenP(alt, skip)
+        pieces = []
+        width = 1
+        for step in steps:
+            if step[0] == 're':
+                pieces.append("(?:%s)" % step[1])
+                width += step[3]
+        if ngroups + width > MAX_GROUPS and len(regexL) > 0:
+            families.append((regexL, table))
+            regexL, table, ngroups = [], {}, 0
+        table[ngroups + 1] = steps
+        regexL.append("(%s)" % "".join(pieces))
+        ngroups += width
+    if len(regexL) > 0:
+        families.append((regexL, table))
+    return [(re.compile(prefix + "(?:%s)[^\n]*" % "|".join(regexL), re.MULTILINE), table)
+            for (regexL, table) in families]
+
+"""
+Build a dictionary from a match by replaying the steps of the alternative.
+
+m :: Match
+first :: Int # group index of the alternative.
+steps :: [Step]
+return :: Dictionary
+
+"""
+def convertMatch(m, first, steps):
+    groups = m.groups()
+    data = {}
+    i = first
+    for step in steps:
+        if step[0] == 'tag':
+            data[step[1]] = step[2]
+        else:
+            n = step[3]
+            if step[2] is not None:
+                data = step[2](data, groups[i:i + n])
+            i += n
+    return data
+
+
+################################################################################
+# Scanner.
+################################################################################
+
+"""
+Read a file by large buffers which end at a line boundary.
+
+fd :: File
+chunkSize :: Int
+return :: Generator String
+
+"""
+def readChunks(fd, chunkSize=CHUNK_SIZE):
+    rest = ''
+    while True:
+        buf = fd.read(chunkSize)
+        if not buf:
+            break
+        buf = rest + buf
+        end = buf.rfind('\n') + 1
+        if end == 0:
+            rest = buf
+            continue
+        rest = buf[end:]
+        yield buf[:end]
+    if rest:
+        yield rest + '\n'
+
+"""
+Make a scanner from a line parser.
+Lines which accept rejects are dropped from a buffer before the fused
+patterns run, and counted as unmatched.
+
+parser :: Parser # typically parseJavaGcLog.
+chunkSize :: Int
+skip :: [Parser]
+accept :: (String -> Bool) | None # of a whole line.
+return :: (File, Dictionary | None) -> Generator Dictionary
+
+"""
+def mkChunkScanner(parser, chunkSize=CHUNK_SIZE, skip=(), accept=None):
+    families = compileFused(parser, skip)
+
+    def scan_(fd, stats=None):
+        if stats is None:
+            stats = {}
+        stats.setdefault('lines', 0)
+        stats.setdefault('matched', 0)
+        stats.setdefault('unmatched', 0)
+        for buf in readChunks(fd, chunkSize):
+            lines = buf.count('\n')
+            if accept is not None:
+                kept = [l for l in buf.split('\n')[:-1] if accept(l)]
+                buf = '\n'.join(kept) + '\n' if kept else ''
+            if len(families) == 1:
+                (pattern, table) = families[0]
+                batch = [(m, table) for m in pattern.finditer(buf)]
+            else:
+                # A line matched by several families belongs to the
+                # earliest alternative, as orP would choose.
+                found = {}
+                for (pattern, table) in families:
+                    for m in pattern.finditer(buf):
+                        if m.start() not in found:
+                            found[m.start()] = (m, table)
+                batch = [found[k] for k in sorted(found)]
+            stats['lines'] += lines
+            stats['matched'] += len(batch)
+            stats['unmatched'] += lines - len(batch)
+            for data in [convertMatch(m, m.lastindex, table[m.lastindex])
+                         for (m, table) in batch]:
+                yield data
+    return scan_
+
+# end of file.
@@ -0,0 +1,164 @@
+# coding: utf-8
+
+import sys
+import importlib
+
+import gclog_window
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+"""
+Columnar store of gc events.
+
+The dictionaries of the parser modules are turned into one numpy array
+per field, so that metrics over a whole log are computed by vectorised
+operations instead of loops over dictionaries.
+
+    Numbers       float64 column, NaN where an event has no value.
+    Triples       e.g. heap_all [before, after, capacity] are split into
+                  heap_all_before, heap_all_after and heap_all_cap,
+                  and times [user, sys, real] into times_user,
+                  times_sys and times_real.
+    Blocks        lists of [index, value] pairs, e.g. the ages
+                  [[1, 30011408], [2, 3437248]] of a ParNew with
+                  -XX:+PrintTenuringDistribution, are one 2-D float64
+                  column of (events, largest index + 1), NaN where an
+                  event has no value.
+    Others        object column, None where an event has no value.
+
+Two columns are added from gclog_window.pauseInterval on the uptime clock:
+    pause_start   uptime when a pause started, NaN if not a pause.
+    pause_end     uptime when a pause ended, NaN if not a pause.
+
+A store is saved to and loaded from .npz files.
+
+Usage:
+    python2 -O this.py module ${OUT_NPZ} < ${GC_LOG_FILE}
+    # module is a parser module such as gclog_parser_cms.
+
+"""
+
+################################################################################
+# Constants.
+################################################################################
+
+# Suffixes of the columns of a triple.
+TRIPLE_SUFFIXES = ["_before", "_after", "_cap"]
+# Triples which are not heap.
+OTHER_SUFFIXES = {"times": ["_user", "_sys", "_real"]}
+
+# (ANY) -> Bool
+def isNumber(v):
+    return isinstance(v, (int, long, float)) and not isinstance(v, bool)
+
+# (ANY) -> Bool
+def isPairs(v):
+    return isinstance(v, list) and len(v) > 0 and \
+        all(isinstance(p, list) and len(p) == 2 and isinstance(p[0], (int, long))
+            and isNumber(p[1]) for p in v)
+
+
+################################################################################
+# Columns.
+################################################################################
+
+"""
+Build columns from events.
+
+events :: Iterable Dictionary
+fields :: [String] | None # fields to keep. None keeps all.
+return :: {String: numpy.ndarray}
+
+"""
+def toColumns(events, fields=None):
+    if np is None:
+        raise ImportError("numpy is required for the columnar store")
+    keep = set(fields) if fields is not None else None
+    values = {}
+    blocks = {}    # field -> largest index.
+    n = 0
+    for data in events:
+        iv = gclog_window.pauseInterval(data, 'uptime')
+        if iv is not None:
+            values.setdefault("pause_start", {})[n] = iv[0]
+            values.setdefault("pause_end", {})[n] = iv[1]
+        for (k, v) in data.iteritems():
+            if keep is not None and k not in keep:
+                continue
+            if isPairs(v):
+                values.setdefault(k, {})[n] = v
+                blocks[k] = max(blocks.get(k, 0), max(p[0] for p in v))
+            elif isinstance(v, list) and len(v) == 3 and all(isNumber(x) for x in v):
+                for (suffix, x) in zip(OTHER_SUFFIXES.get(k, TRIPLE_SUFFIXES), v):
+                    values.setdefault(k + suffix, {})[n] = x
+            else:
+                values.setdefault(k, {})[n] = v
+        n += 1
+    cols = {}
+    for (k, column) in values.iteritems():
+        if k in blocks and all(isPairs(v) for v in column.itervalues()):
+            a = np.empty((n, blocks[k] + 1), dtype=np.float64)
+            a.fill(np.nan)
+            for (i, v) in column.iteritems():
+                for (j, x) in v:
+                    a[i, j] = x
+            cols[k] = a
+            continue
+        if all(isNumber(v) for v in column.itervalues()):
+            a = np.empty(n, dtype=np.float64)
+            a.fill(np.nan)
+        else:
+            a = np.empty(n, dtype=object)
+        for (i, v) in column.iteritems():
+            a[i] = v
+        cols[k] = a
+    return cols
+
+"""
+Number of events in columns.
+
+cols :: {String: numpy.ndarray}
+return :: Int
+
+"""
+def columnLength(cols):
+    for a in cols.itervalues():
+        return len(a)
+    return 0
+
+"""
+Save columns to a .npz file.
+
+path :: String
+cols :: {String: numpy.ndarray}
+
+"""
+def saveColumns(path, cols):
+    np.savez_compressed(path, **cols)
+
+"""
+Load columns from a .npz file.
+
+path :: String
+return :: {String: numpy.ndarray}
+
+"""
+def loadColumns(path):
+    with np.load(path, allow_pickle=True) as z:
+        return dict((k, z[k]) for k in z.files)
+
+
+################################################################################
+# main
+################################################################################
+
+if __name__=='__main__':
+    module = importlib.import_module(sys.argv[1])
+    cols = toColumns(module.iterGcLog(sys.stdin))
+    saveColumns(sys.argv[2], cols)
+    print('%d events, %d columns' % (columnLength(cols), len(cols)))
+
+# end of file.
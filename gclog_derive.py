@@ -0,0 +1,322 @@
+# coding: utf-8
+
+import sys
+import json
+import importlib
+
+import gclog_window
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+"""
+Derived metrics of gc events.
+
+Allocation rate:
+    alloc_mb            heap allocated since the previous pause, i.e.
+                        the occupancy before this pause minus the
+                        occupancy after the previous one.
+    alloc_rate_mb_s     alloc_mb / time from the start of the previous
+                        pause to the start of this one.
+    The young generation is used when the event has it (heap_new),
+    otherwise the whole heap (heap_all, heap_mb). The two are never mixed,
+    so a pause after one of the other kind has no allocation rate.
+    Pauses without occupancy (e.g. CMS-initial-mark) are passed over.
+
+Promotion rate (young collections with heap_new and heap_all only):
+    promoted_mb         growth of the old generation by this collection,
+                        i.e. what the young generation freed minus what
+                        the whole heap freed.
+    promotion_rate_mb_s promoted_mb / time from the start of the previous
+                        young collection to the start of this one.
+
+Reclaim efficiency:
+    reclaim_mb_per_ms   whole heap freed by a pause / length of the pause.
+
+CPU parallelism (events with times [user, sys, real]):
+    parallelism         (user + sys) / real, the number of cpus busy.
+    sys_ratio           sys / (user + sys). High when the kernel works for
+                        gc, e.g. for transparent huge pages or swapping.
+
+Fields are added to the events which have them, either one event at a
+time (deriveRates) or vectorised on the columns of gclog_columns.py
+(deriveRatesColumns). Time is uptime.
+
+Usage:
+    python2 -O this.py module < ${GC_LOG_FILE} | ${YOUR_ANALYZER}
+    # module is a parser module such as gclog_parser_cms.
+    # One JSON object per event.
+
+"""
+
+################################################################################
+# Constants.
+################################################################################
+
+# JDK8 young collections.
+JDK8_YOUNG_TYPES = frozenset(["ParNew", "ParallelGC", "SerialGC"])
+
+# Kinds of occupancy.
+KIND_YOUNG = 1
+KIND_HEAP = 2
+
+
+################################################################################
+# Heap of an event.
+################################################################################
+
+"""
+Whether an event is a young collection.
+
+data :: Dictionary
+return :: Bool
+
+"""
+def isYoung(data):
+    t = data.get("type", "")
+    return t in JDK8_YOUNG_TYPES or t.startswith("G1 Pause Young")
+
+"""
+Occupancy before and after a pause in MB.
+
+data :: Dictionary
+return :: (Int, Float, Float) | None # (kind, before, after)
+
+"""
+def occupancyMB(data):
+    if "heap_new" in data:
+        (before, after, cap) = data["heap_new"]
+        return (KIND_YOUNG, before / 1024.0, after / 1024.0)
+    if "heap_mb" in data:
+        (before, after, cap) = data["heap_mb"]
+        return (KIND_HEAP, float(before), float(after))
+    if "heap_all" in data:
+        (before, after, cap) = data["heap_all"]
+        return (KIND_HEAP, before / 1024.0, after / 1024.0)
+    return None
+
+"""
+Growth of the old generation by a young collection in MB.
+
+data :: Dictionary
+return :: Float | None
+
+"""
+def promotedMB(data):
+    if "heap_new" not in data or "heap_all" not in data:
+        return None
+    (newBefore, newAfter, newCap) = data["heap_new"]
+    (allBefore, allAfter, allCap) = data["heap_all"]
+    return ((newBefore - newAfter) - (allBefore - allAfter)) / 1024.0
+
+
+################################################################################
+# Streaming.
+################################################################################
+
+# Dictionary
+def newRateState():
+    return {"pause": None,   # (start, kind, after) of the previous pause.
+            "young": None}   # start of the previous young collection.
+
+"""
+Add the derived fields to one event.
+
+state :: Dictionary
+data :: Dictionary
+return :: Dictionary
+
+"""
+def deriveEvent(state, data):
+    if "times" in data:
+        (user, system, real) = data["times"]
+        if real > 0:
+            data["parallelism"] = (user + system) / real
+        if user + system > 0:
+            data["sys_ratio"] = system / (user + system)
+    iv = gclog_window.pauseInterval(data, 'uptime')
+    if iv is None:
+        return data
+    start = iv[0]
+    if iv[1] > start and ("heap_all" in data or "heap_mb" in data):
+        data["reclaim_mb_per_ms"] = \
+            gclog_window.reclaimedMB(data) / ((iv[1] - start) * 1000.0)
+    occ = occupancyMB(data)
+    prev = state["pause"]
+    if occ is not None and prev is not None and prev[1] == occ[0]:
+        data["alloc_mb"] = occ[1] - prev[2]
+        if start > prev[0]:
+            data["alloc_rate_mb_s"] = data["alloc_mb"] / (start - prev[0])
+    # A pause without occupancy (e.g. CMS-initial-mark) keeps the chain.
+    if occ is not None:
+        state["pause"] = (start, occ[0], occ[2])
+    if isYoung(data):
+        promoted = promotedMB(data)
+        prevYoung = state["young"]
+        if promoted is not None:
+            data["promoted_mb"] = promoted
+            if prevYoung is not None and start > prevYoung:
+                data["promotion_rate_mb_s"] = promoted / (start - prevYoung)
+        state["young"] = start
+    return data
+
+"""
+Add the derived fields to a stream of events.
+
+events :: Iterable Dictionary
+key :: (Dictionary -> ANY) | None # streams are kept per key, e.g. per "jvm".
+return :: Generator Dictionary
+
+"""
+def deriveRates(events, key=None):
+    states = {}
+    for data in events:
+        group = key(data) if key is not None else None
+        state = states.get(group)
+        if state is None:
+            state = states[group] = newRateState()
+        yield deriveEvent(state, data)
+
+
+################################################################################
+# Vectorised.
+################################################################################
+
+"""
+Index of the previous row in the same group among the selected rows.
+
+mask :: numpy.ndarray(bool)
+group :: numpy.ndarray | None
+return :: numpy.ndarray(int64) # -1 if none.
+
+"""
+def previousIndex(mask, group=None):
+    rows = np.flatnonzero(mask)
+    prev = np.empty(len(mask), dtype=np.int64)
+    prev.fill(-1)
+    if len(rows) == 0:
+        return prev
+    if group is None:
+        prev[rows[1:]] = rows[:-1]
+        return prev
+    # A stable sort keeps the order of the rows inside each group.
+    order = rows[np.argsort(group[rows], kind='mergesort')]
+    same = group[order[1:]] == group[order[:-1]]
+    prev[order[1:][same]] = order[:-1][same]
+    return prev
+
+"""
+Columns of occupancy in MB.
+
+cols :: {String: numpy.ndarray}
+n :: Int # number of events.
+return :: (numpy.ndarray(int64), numpy.ndarray, numpy.ndarray) # kind, before, after.
+
+"""
+def occupancyColumns(cols, n):
+    kind = np.zeros(n, dtype=np.int64)
+    before = np.empty(n)
+    before.fill(np.nan)
+    after = before.copy()
+    # Later ones override, so that the priority is the same as occupancyMB.
+    for (name, k, scale) in [("heap_all", KIND_HEAP, 1024.0),
+                             ("heap_mb", KIND_HEAP, 1.0),
+                             ("heap_new", KIND_YOUNG, 1024.0)]:
+        if name + "_before" not in cols:
+            continue
+        b = cols[name + "_before"]
+        has = ~np.isnan(b)
+        kind[has] = k
+        before[has] = b[has] / scale
+        after[has] = cols[name + "_after"][has] / scale
+    return (kind, before, after)
+
+"""
+Derived fields of columns of gclog_columns.py.
+
+The results are the same as deriveRates gives, as columns which are NaN
+where an event has no value. They are also added to cols.
+
+cols :: {String: numpy.ndarray}
+key :: String | None # a column to group by, e.g. "jvm".
+return :: {String: numpy.ndarray}
+
+"""
+def deriveRatesColumns(cols, key=None):
+    if np is None:
+        raise ImportError("numpy is required for vectorised rates")
+    n = len(cols["type"])
+    nan = np.empty(n)
+    nan.fill(np.nan)
+    out = dict((k, nan.copy()) for k in
+               ["alloc_mb", "alloc_rate_mb_s", "promoted_mb", "promotion_rate_mb_s",
+                "reclaim_mb_per_ms", "parallelism", "sys_ratio"])
+    if "times_real" in cols:
+        user = cols["times_user"]
+        system = cols["times_sys"]
+        real = np.nan_to_num(cols["times_real"])
+        cpu = np.nan_to_num(user + system)
+        i = np.flatnonzero(real > 0)
+        out["parallelism"][i] = cpu[i] / real[i]
+        i = np.flatnonzero(cpu > 0)
+        out["sys_ratio"][i] = system[i] / cpu[i]
+    if "pause_start" not in cols:
+        cols.update(out)
+        return out
+    group = cols[key] if key is not None else None
+    start = cols["pause_start"]
+    pause = ~np.isnan(start)
+
+    # Whole heap, heap_all before heap_mb as gclog_window.reclaimedMB.
+    freed = nan.copy()
+    for (name, scale) in [("heap_mb", 1.0), ("heap_all", 1024.0)]:
+        if name + "_before" in cols:
+            f = (cols[name + "_before"] - cols[name + "_after"]) / scale
+            has = ~np.isnan(f)
+            freed[has] = f[has]
+    length = np.where(pause, (cols["pause_end"] - start) * 1000.0, 0.0)
+    i = np.flatnonzero(~np.isnan(freed) & (length > 0))
+    out["reclaim_mb_per_ms"][i] = freed[i] / length[i]
+
+    (kind, before, after) = occupancyColumns(cols, n)
+    # As deriveEvent, the previous pause with occupancy.
+    prev = previousIndex(pause & (kind > 0), group)
+    i = np.flatnonzero((prev >= 0) & (kind > 0))
+    j = prev[i]
+    i = i[kind[j] == kind[i]]
+    j = prev[i]
+    out["alloc_mb"][i] = before[i] - after[j]
+    dt = start[i] - start[j]
+    ok = dt > 0
+    out["alloc_rate_mb_s"][i[ok]] = out["alloc_mb"][i[ok]] / dt[ok]
+
+    types = cols["type"]
+    youngTypes = set(t for t in set(types.tolist())
+                     if t is not None and isYoung({"type": t}))
+    young = pause & np.array([t in youngTypes for t in types], dtype=bool)
+    if "heap_new_before" in cols and "heap_all_before" in cols:
+        promoted = ((cols["heap_new_before"] - cols["heap_new_after"]) -
+                    (cols["heap_all_before"] - cols["heap_all_after"])) / 1024.0
+        has = young & ~np.isnan(promoted)
+        out["promoted_mb"][has] = promoted[has]
+        prev = previousIndex(young, group)
+        i = np.flatnonzero(has & (prev >= 0))
+        dt = start[i] - start[prev[i]]
+        ok = dt > 0
+        out["promotion_rate_mb_s"][i[ok]] = promoted[i[ok]] / dt[ok]
+    cols.update(out)
+    return out
+
+
+################################################################################
+# main
+################################################################################
+
+if __name__=='__main__':
+    module = importlib.import_module(sys.argv[1])
+    for data in deriveRates(module.iterGcLog(sys.stdin)):
+        print json.dumps(data)
+
+# end of file.
@@ -0,0 +1,315 @@
+# coding: utf-8
+
+import re
+import sys, os
+import json
+import importlib
+
+"""
+Format and collector detection of gc logs, and a driver which routes
+each log to its parser module.
+
+The head of a log (SAMPLE_SIZE bytes, doubled up to MAX_SAMPLE_SIZE
+while nothing is found) tells
+    format       "jdk8" for -Xloggc with -XX:+PrintGCDetails, or
+                 "unified" for -Xlog, by the stamps at the head of lines.
+    collector    "cms", "parallel", "serial", "g1", "shenandoah" or "zgc", by
+                 the flags of the JVM (CommandLine flags: -XX:+UseG1GC,
+                 [gc,init] Using G1) if the log has them, otherwise by
+                 the words of its events (ParNew, PSYoungGen, DefNew,
+                 G1 Evacuation Pause, Pause Init Mark, ...).
+A log of JDK6/7 (PermGen instead of Metaspace) goes to gclog_parser.
+For unified logs the decorators are detected too (gclog_unified.py).
+
+    format    collector                module
+    jdk8      cms, parallel, serial    gclog_parser_cms
+    jdk8      g1                       gclog_parser_g1
+    jdk8      shenandoah               gclog_parser_she
+    unified   g1                       gclog_parser_g1_jdk11
+    unified   shenandoah               gclog_parser_she_jdk11
+    unified   zgc                      gclog_parser_zgc
+
+A log of any other combination is reported and left unparsed.
+Only the parser module of a log parses it, so a directory of logs of
+many kinds is processed in one pass by one pool of workers, and the
+modules are imported by the workers when a log needs them.
+
+Usage:
+    python2 -O this.py <dir of gclog> [--jobs=N]
+    # Every file of the directory is detected, and the events of a log
+    # are written to ${GC_LOG_FILE}.json.
+    python2 -O this.py detect ${GC_LOG_FILE}...
+    # One JSON object per log: path, format, collector, module, layout.
+
+"""
+
+################################################################################
+# Constants.
+################################################################################
+
+FORMAT_JDK8 = "jdk8"
+FORMAT_UNIFIED = "unified"
+
+# Bytes at the head of a log looked at first.
+SAMPLE_SIZE = 16 * 1024
+# Bytes looked at for logs mixed with other lines.
+MAX_SAMPLE_SIZE = 1024 * 1024
+
+# Lines of each format.
+# [2021-09-10T15:23:34.217+0800][123.534s]... and other decorators.
+regexp_unified_line = r"^\[[^\]]+\](?:\[[^\]]*\])*\s"
+# 2019-12-05T04:17:14.531+0800: 5.388: [ or 5.388: [
+regexp_jdk8_line = r"^(?:\d{4}-\d{2}-\d{2}T[\d:.]+[+-]\d{4}:\s+)?\d+\.\d+:\s+\["
+
+unifiedLineP = re.compile(regexp_unified_line)
+jdk8LineP = re.compile(regexp_jdk8_line)
+
+# Words of a collector, and their weights.
+# A flag of the JVM decides alone, words of events are counted per line.
+FLAG_WEIGHT = 1000
+COLLECTOR_WORDS = [
+    ("cms", FLAG_WEIGHT, ["-XX:+UseConcMarkSweepGC", "Using Concurrent Mark Sweep"]),
+    ("parallel", FLAG_WEIGHT, ["-XX:+UseParallelGC", "-XX:+UseParallelOldGC",
+                               "Using Parallel"]),
+    ("serial", FLAG_WEIGHT, ["-XX:+UseSerialGC", "Using Serial"]),
+    ("g1", FLAG_WEIGHT, ["-XX:+UseG1GC", "Using G1"]),
+    ("shenandoah", FLAG_WEIGHT, ["-XX:+UseShenandoahGC", "Using Shenandoah"]),
+    ("zgc", FLAG_WEIGHT, ["-XX:+UseZGC", "Using The Z Garbage Collector"]),
+    ("cms", 1, ["CMS-", "ParNew", "concurrent mark-sweep generation"]),
+    ("parallel", 1, ["PSYoungGen", "ParOldGen"]),
+    ("serial", 1, ["DefNew", "Tenured"]),
+    ("g1", 1, ["G1 Evacuation Pause", "garbage-first heap", "GC pause (",
+               "Pause Young (Normal)", "Pause Young (Concurrent Start)",
+               "Pause Young (Mixed)", "Pause Young (Prepare Mixed)"]),
+    ("shenandoah", 1, ["Pause Init Mark", "Pause Final Mark", "Concurrent evacuation",
+                       "Pause Init Update Refs", "Pause Degenerated GC"]),
+    ("zgc", 1, ["Pause Mark Start", "Pause Mark End", "Pause Relocate Start",
+                "Allocation Stall"]),
+]
+
+# Words of JDK6/7 logs, which have a permanent generation.
+PERM_WORDS = ["[CMS Perm", "[PSPermGen", "[Perm"]
+
+# (format, collector) -> parser module.
+ROUTES = {
+    (FORMAT_JDK8, "cms"): "gclog_parser_cms",
+    (FORMAT_JDK8, "parallel"): "gclog_parser_cms",
+    (FORMAT_JDK8, "serial"): "gclog_parser_cms",
+    (FORMAT_JDK8, "g1"): "gclog_parser_g1",
+    (FORMAT_JDK8, "shenandoah"): "gclog_parser_she",
+    (FORMAT_UNIFIED, "g1"): "gclog_parser_g1_jdk11",
+    (FORMAT_UNIFIED, "shenandoah"): "gclog_parser_she_jdk11",
+    (FORMAT_UNIFIED, "zgc"): "gclog_parser_zgc",
+}
+
+# Parser module of JDK6/7 logs.
+PERM_MODULE = "gclog_parser"
+
+# Suffixes of files which are not gc logs, e.g. outputs of the parsers.
+SKIP_SUFFIXES = (".json", "_2", ".idx", ".npz")
+
+
+################################################################################
+# Detection.
+################################################################################
+
+"""
+Format of lines, by votes of their stamps.
+
+lines :: [String]
+return :: String | None
+
+"""
+def detectFormat(lines):
+    votes = {FORMAT_JDK8: 0, FORMAT_UNIFIED: 0}
+    for line in lines:
+        if unifiedLineP.match(line):
+            votes[FORMAT_UNIFIED] += 1
+        elif jdk8LineP.match(line):
+            votes[FORMAT_JDK8] += 1
+    best = max(votes, key=votes.get)
+    return best if votes[best] > 0 else None
+
+"""
+Collector of lines, by the flags of the JVM or the words of its events.
+
+lines :: [String]
+return :: String | None
+
+"""
+def detectCollector(lines):
+    scores = {}
+    for line in lines:
+        for (collector, weight, words) in COLLECTOR_WORDS:
+            for word in words:
+                if word in line:
+                    scores[collector] = scores.get(collector, 0) + weight
+                    break
+    if not scores:
+        return None
+    return max(scores, key=scores.get)
+
+"""
+Parser module of a format and a collector.
+
+fmt :: String
+collector :: String
+lines :: [String] # to tell JDK6/7 from JDK8.
+return :: String | None
+
+"""
+def routeModule(fmt, collector, lines):
+    module = ROUTES.get((fmt, collector))
+    if module == "gclog_parser_cms":
+        for line in lines:
+            for word in PERM_WORDS:
+                if word in line:
+                    return PERM_MODULE
+    return module
+
+"""
+Detect the format, the collector and the parser module of lines.
+
+lines :: [String]
+return :: Dictionary # {'format', 'collector', 'module', 'layout'}, None if unknown.
+
+"""
+def detectLines(lines):
+    fmt = detectFormat(lines)
+    collector = detectCollector(lines) if fmt is not None else None
+    found = {'format': fmt, 'collector': collector, 'module': None, 'layout': None}
+    if collector is not None:
+        found['module'] = routeModule(fmt, collector, lines)
+    if fmt == FORMAT_UNIFIED:
+        # Imported here, as it imports numpy which JDK8 logs do not need.
+        import gclog_unified
+        found['layout'] = gclog_unified.detectLayout(lines)
+    return found
+
+"""
+Detect the format, the collector and the parser module of a log.
+
+The head is read from SAMPLE_SIZE bytes, and is doubled while the
+collector is not found, up to maxSize bytes.
+
+path :: String
+size :: Int
+maxSize :: Int
+return :: Dictionary # as detectLines, with 'path'.
+
+"""
+def detectFile(path, size=SAMPLE_SIZE, maxSize=MAX_SAMPLE_SIZE):
+    with open(path, 'rb') as fd:
+        head = fd.read(size)
+        while True:
+            # The last line may be cut.
+            lines = head.split('\n')[:-1] or [head]
+            found = detectLines(lines)
+            if found['collector'] is not None or len(head) >= maxSize:
+                break
+            more = fd.read(len(head))
+            if not more:
+                break
+            head += more
+    found['path'] = path
+    return found
+
+
+################################################################################
+# Driver.
+################################################################################
+
+"""
+Parse a log by its parser module and write the events to ${path}.json.
+This runs in a worker process.
+
+path :: String
+return :: Dictionary # detectFile with 'events' and 'unparsed'.
+
+"""
+def routeFile(path):
+    found = detectFile(path)
+    if found['module'] is None:
+        return found
+    module = importlib.import_module(found['module'])
+    if hasattr(module, 'setLayout'):
+        import gclog_unified
+        # A worker may have set the layout of another log.
+        module.setLayout(found['layout'] or gclog_unified.DEFAULT_LAYOUT)
+    counts = [0]
+
+    def count_unparsed(text, msg):
+        counts[0] += 1
+
+    with open(path, 'r') as fd:
+        output = list(module.iterGcLog(fd, count_unparsed))
+    with open(path + '.json', 'w') as fd:
+        fd.write(json.dumps(output))
+    found['events'] = len(output)
+    found['unparsed'] = counts[0]
+    return found
+
+"""
+Gc logs of a directory.
+
+dirs :: String
+return :: [String]
+
+"""
+def listLogs(dirs):
+    paths = []
+    for f in sorted(os.listdir(dirs)):
+        path = os.path.join(dirs, f)
+        if f.startswith('.') or f.endswith(SKIP_SUFFIXES) or not os.path.isfile(path):
+            continue
+        paths.append(path)
+    return paths
+
+"""
+Parse logs of many kinds by one pool of workers.
+
+paths :: [String]
+jobs :: Int | None # None uses all cpus.
+return :: Generator Dictionary # routeFile of each log, in order of completion.
+
+"""
+def routeFiles(paths, jobs=None):
+    from multiprocessing import Pool, cpu_count
+
+    if len(paths) == 0:
+        return
+    pool = Pool(processes=min(jobs or cpu_count(), len(paths)))
+    try:
+        for found in pool.imap_unordered(routeFile, paths):
+            yield found
+    finally:
+        pool.close()
+        pool.join()
+
+
+################################################################################
+# main
+################################################################################
+
+if __name__=='__main__':
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    opts = dict((a[2:].split('=', 1) + [None])[:2] for a in sys.argv[1:] if a.startswith('--'))
+    if args[0] == 'detect':
+        for path in args[1:]:
+            print json.dumps(detectFile(path))
+        exit(0)
+    jobs = int(opts['jobs']) if 'jobs' in opts else None
+    paths = listLogs(args[0])
+    if len(paths) == 0:
+        print('No gclog to parse')
+        exit(0)
+    for found in routeFiles(paths, jobs):
+        if found['module'] is None:
+            print('%s: unknown (%s, %s), skipped'
+                  % (found['path'], found['format'], found['collector']))
+        else:
+            print('%s: %s %s by %s, %d events, %d unparsed lines'
+                  % (found['path'], found['format'], found['collector'],
+                     found['module'], found['events'], found['unparsed']))
+
+# end of file.
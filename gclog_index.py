@@ -0,0 +1,479 @@
+# coding: utf-8
+
+import re
+import sys, os
+import json
+import bisect
+import hashlib
+import importlib
+import itertools
+
+import gclog_assemble
+import gclog_unified
+
+"""
+Sparse line/time index of a gc log for random access.
+
+The index records the byte offset of a line every N lines together with
+the uptime and utc of that line, and is stored next to the log as a
+sidecar file (${GC_LOG_FILE}.idx).
+The time of a line is read by the decorator layout of a unified log
+(detected, or given by --layout), or from the stamps of a JDK8 line with
+or without -XX:+PrintGCDateStamps. A log without time in its lines
+cannot be indexed, and a query by a time the log has not (e.g. utc of a
+log with uptime only) fails.
+The lines of a range are parsed as the whole log would be, by iterGcLog
+of the parser module, with the layout of the index.
+A time range is looked up by binary search, so only the bytes of the
+range are read and parsed.
+The same index gives split points for parsing one file in parallel.
+
+When the log grows, the index is extended from where it stopped.
+When the head of the log changes (the log was rotated), it is rebuilt.
+
+Usage:
+    python2 -O this.py build ${GC_LOG_FILE} [every]
+    python2 -O this.py query ${GC_LOG_FILE} module from to
+    # module is a parser module such as gclog_parser_g1_jdk11.
+    # from and to are uptime seconds (e.g. 120.5)
+    # or a prefix of utc (e.g. 2021-09-10T03:12).
+    python2 -O this.py split ${GC_LOG_FILE} module jobs
+    # --layout=uptime,level,tags gives the decorators of a unified log
+    # instead of those detected.
+
+"""
+
+################################################################################
+# Constants.
+################################################################################
+
+INDEX_VERSION = 2
+INDEX_SUFFIX = '.idx'
+
+# Lines between two entries of an index.
+DEFAULT_EVERY = 10000
+
+# Bytes at the head of a log to detect rotation.
+HEAD_SIZE = 4096
+
+# [2021-09-10T15:23:34.217+0800][123.534s]
+regexp_unified_time = r"\[(\d{4}-\d{2}-\d{2}T[\d:.]+[+-]\d{4})\]\[(\d+\.\d+)s\]"
+# 2019-12-05T04:17:14.531+0800: 5.388:
+# 5.388: (without -XX:+PrintGCDateStamps)
+regexp_jdk8_time = r"(?:(\d{4}-\d{2}-\d{2}T[\d:.]+[+-]\d{4}):\s+)?(\d+\.\d+):\s"
+
+lineTimeP = re.compile(r"^(?:%s|%s)" % (regexp_unified_time, regexp_jdk8_time))
+
+
+################################################################################
+# Line time.
+################################################################################
+
+"""
+Time at the head of a line of either unified (of the default layout) or
+JDK8 format.
+
+line :: String
+return :: (Float, String | None) | None # (uptime, utc)
+
+"""
+def lineTime(line):
+    m = lineTimeP.match(line)
+    if m is None:
+        return None
+    if m.group(1) is not None:
+        return (float(m.group(2)), m.group(1))
+    return (float(m.group(4)), m.group(3))
+
+"""
+Reader of the time of the lines of a log.
+
+layout :: String | None # decorators of a unified log, None for JDK8.
+return :: String -> (Float | None, String | None) | None
+
+"""
+def mkLineTime(layout=None):
+    if layout is None:
+        return lineTime
+    read = gclog_unified.mkLineTime(layout)
+    if read is None:
+        raise ValueError("The layout has no time decorator: %s" % layout)
+    return read
+
+"""
+Decorator layout of a log, detected from its first lines.
+
+path :: String
+return :: String | None # None if the lines have no decorators (JDK8).
+
+"""
+def detectFileLayout(path):
+    with open(path, 'r') as fd:
+        return gclog_unified.detectLayout(itertools.islice(fd, gclog_unified.DETECT_LINES))
+
+"""
+Digest of the head of a log.
+
+path :: String
+return :: String
+
+"""
+def headDigest(path):
+    with open(path, 'rb') as fd:
+        return hashlib.sha1(fd.read(HEAD_SIZE)).hexdigest()
+
+
+################################################################################
+# Index builder.
+################################################################################
+
+"""
+An empty index.
+
+every :: Int
+layout :: String | None
+return :: Index
+
+Index :: {'version': Int, 'every': Int, 'head': String,
+          'layout': String | None, # decorators of a unified log.
+          'size': Int,  # bytes indexed, always at a line boundary.
+          'lines': Int, # lines indexed.
+          'entries': [[offset :: Int, line :: Int, uptime :: Float | None,
+                       utc :: String | None]]}
+
+"""
+def newIndex(every=DEFAULT_EVERY, layout=None):
+    return {'version': INDEX_VERSION, 'every': every, 'head': None, 'layout': layout,
+            'size': 0, 'lines': 0, 'entries': []}
+
+"""
+Extend an index by the part of a log after idx['size'].
+Only complete lines are indexed. The last line without a newline is left
+for the next update.
+
+path :: String
+idx :: Index
+return :: Index
+
+"""
+def extendIndex(path, idx):
+    every = idx['every']
+    entries = idx['entries']
+    offset = idx['size']
+    lineNo = idx['lines']
+    if len(entries) > 0:
+        nextLine = entries[-1][1] + every
+    else:
+        nextLine = 0
+    readTime = mkLineTime(idx['layout'])
+    with open(path, 'rb') as fd:
+        fd.seek(offset)
+        for line in fd:
+            if not line.endswith('\n'):
+                break
+            if lineNo >= nextLine:
+                t = readTime(line)
+                if t is not None:
+                    entries.append([offset, lineNo, t[0], t[1]])
+                    nextLine = lineNo + every
+            offset += len(line)
+            lineNo += 1
+    idx['size'] = offset
+    idx['lines'] = lineNo
+    return idx
+
+"""
+Load the sidecar index of a log.
+
+path :: String # path of the log.
+return :: Index | None
+
+"""
+def loadIndex(path):
+    try:
+        with open(path + INDEX_SUFFIX, 'r') as fd:
+            idx = json.load(fd)
+    except (IOError, ValueError):
+        return None
+    if idx.get('version') != INDEX_VERSION:
+        return None
+    return idx
+
+"""
+Save the sidecar index of a log.
+It is written to a temporary file and renamed not to leave a broken index.
+
+path :: String # path of the log.
+idx :: Index
+
+"""
+def saveIndex(path, idx):
+    tmp = path + INDEX_SUFFIX + '.tmp'
+    with open(tmp, 'w') as fd:
+        json.dump(idx, fd)
+    os.rename(tmp, path + INDEX_SUFFIX)
+
+"""
+Build or update the sidecar index of a log.
+A log whose lines have no time raises ValueError, rather than giving an
+index which no query finds anything by.
+
+path :: String
+every :: Int # used when the index is (re)built.
+layout :: String | None # decorators of a unified log. None detects them.
+return :: Index
+
+"""
+def updateIndex(path, every=DEFAULT_EVERY, layout=None):
+    head = headDigest(path)
+    size = os.path.getsize(path)
+    idx = loadIndex(path)
+    # While a log is shorter than HEAD_SIZE its head changes as it grows,
+    # so a short log is simply indexed again.
+    if idx is None or idx['head'] != head or idx['size'] > size \
+            or (layout is not None and idx['layout'] != layout):
+        idx = newIndex(every, layout if layout is not None else detectFileLayout(path))
+    elif idx['size'] == size:
+        return idx
+    idx['head'] = head
+    extendIndex(path, idx)
+    if idx['lines'] > 0 and len(idx['entries']) == 0:
+        raise ValueError("%s: no line has time (layout %s), cannot be indexed"
+                         % (path, idx['layout']))
+    saveIndex(path, idx)
+    return idx
+
+
+################################################################################
+# Queries.
+################################################################################
+
+"""
+Byte range of a log which covers a time range.
+
+The range is [t0, t1), and t0 and t1 are either uptime seconds (Float)
+or utc (String).
+A utc is compared as a string, so a prefix such as "2021-09-10T03:12"
+can be used. It must have the same form and offset as the log.
+
+idx :: Index
+t0 :: Float | String
+t1 :: Float | String
+return :: (Int, Int | None) # [start, end) in bytes. None is the end of the log.
+
+"""
+def findRange(idx, t0, t1):
+    entries = idx['entries']
+    col = 3 if isinstance(t0, basestring) else 2
+    keys = [e[col] for e in entries]
+    if None in keys:
+        raise ValueError("The log has no %s in its lines"
+                         % ("utc" if col == 3 else "uptime"))
+    i = bisect.bisect_left(keys, t0) - 1
+    start = entries[i][0] if i >= 0 else 0
+    j = bisect.bisect_left(keys, t1)
+    end = entries[j][0] if j < len(entries) else None
+    return (start, end)
+
+"""
+Lines of a byte range.
+
+path :: String
+start :: Int
+end :: Int | None # None reads to the end of the log.
+return :: Generator String
+
+"""
+def readRange(path, start, end=None):
+    with open(path, 'rb') as fd:
+        fd.seek(start)
+        offset = start
+        for line in fd:
+            if end is not None and offset >= end:
+                break
+            offset += len(line)
+            yield line
+
+"""
+Set the layout of an index on a parser module.
+
+module :: Module
+idx :: Index
+
+"""
+def setModuleLayout(module, idx):
+    if hasattr(module, 'setLayout'):
+        module.setLayout(idx['layout'] or gclog_unified.DEFAULT_LAYOUT)
+
+"""
+Parse the events of a time range.
+
+Lines are filtered by the time at their head, and lines without time
+(continuations of a multi-line event) follow the line before them.
+The lines are parsed by iterGcLog of the module, as the whole log is.
+
+path :: String
+module :: Module # a parser module, e.g. gclog_parser_g1_jdk11.
+t0 :: Float | String
+t1 :: Float | String
+unparsed :: ((String, ParseError) -> ANY) | None # as iterGcLog.
+layout :: String | None # as updateIndex.
+return :: Generator Dictionary
+
+"""
+def queryEvents(path, module, t0, t1, unparsed=None, layout=None):
+    idx = updateIndex(path, layout=layout)
+    setModuleLayout(module, idx)
+    return module.iterGcLog(queryLines(path, idx, t0, t1), unparsed)
+
+# (String, Index, Float | String, Float | String) -> Generator String
+def queryLines(path, idx, t0, t1):
+    col = 1 if isinstance(t0, basestring) else 0
+    (start, end) = findRange(idx, t0, t1)
+    readTime = mkLineTime(idx['layout'])
+    inside = False
+    for line in readRange(path, start, end):
+        t = readTime(line)
+        if t is not None and t[col] is not None:
+            if t[col] >= t1:
+                break
+            inside = t[col] >= t0
+        if inside:
+            yield line
+
+
+################################################################################
+# Intra-file parallel splitter.
+################################################################################
+
+"""
+Split a log into byte ranges of about the same size at index entries.
+
+idx :: Index
+parts :: Int
+return :: [(Int, Int | None)] # the last range reads to the end of the log.
+
+"""
+def splitRanges(idx, parts):
+    offsets = [e[0] for e in idx['entries']]
+    size = idx['size']
+    cuts = [0]
+    for k in xrange(1, parts):
+        i = bisect.bisect_left(offsets, size * k / parts)
+        if i < len(offsets) and offsets[i] > cuts[-1]:
+            cuts.append(offsets[i])
+    return zip(cuts, cuts[1:] + [None])
+
+"""
+Parser of the lines of a module, as its iterGcLog uses by default.
+The level and tag filter of a unified logging module is included.
+
+module :: Module
+return :: Parser
+
+"""
+def lineParser(module):
+    if hasattr(module, 'UNIFIED_TAGS'):
+        return gclog_unified.mkDecoratorFilter(module.parseJavaGcLog, module.ParseError,
+                                               gclog_unified.DEFAULT_LEVELS, module.UNIFIED_TAGS)
+    return module.parseJavaGcLog
+
+"""
+Parse a byte range of a log by a parser module.
+This runs in a worker process.
+
+A module without MULTILINE_RULES parses the range by its iterGcLog. A
+module with them gives the fragments, parsed as its iterGcLog does, which
+are joined after all ranges (see parallelParse).
+
+args :: (String, String, Int, Int | None, String | None)
+        # (path, module name, start, end, layout)
+return :: [Dictionary]
+
+"""
+def parseRange(args):
+    (path, moduleName, start, end, layout) = args
+    module = importlib.import_module(moduleName)
+    if hasattr(module, 'setLayout'):
+        module.setLayout(layout or gclog_unified.DEFAULT_LAYOUT)
+    lines = readRange(path, start, end)
+    if not getattr(module, 'MULTILINE_RULES', None):
+        return list(module.iterGcLog(lines))
+    parse = lineParser(module)
+    output = []
+    for line in lines:
+        try:
+            (ret, data) = parse(line.rstrip(), {})
+            output.append(data)
+        except module.ParseError, msg:
+            pass
+    return output
+
+"""
+Parse one log in parallel.
+
+Ranges start at lines with time, so a line and its continuation
+lines are never split. The events of all ranges are joined by
+MULTILINE_RULES of the module in order, so the fragments of an event
+are joined even if they fall into two ranges.
+
+path :: String
+moduleName :: String
+jobs :: Int
+layout :: String | None # as updateIndex.
+return :: [Dictionary]
+
+"""
+def parallelParse(path, moduleName, jobs, layout=None):
+    from multiprocessing import Pool
+
+    idx = updateIndex(path, layout=layout)
+    ranges = splitRanges(idx, jobs)
+    pool = Pool(processes=min(jobs, len(ranges)))
+    try:
+        results = pool.map(parseRange, [(path, moduleName, s, e, idx['layout'])
+                                        for (s, e) in ranges])
+    finally:
+        pool.close()
+        pool.join()
+    module = importlib.import_module(moduleName)
+    rules = getattr(module, 'MULTILINE_RULES', [])
+    return list(gclog_assemble.assemble(itertools.chain(*results), rules))
+
+
+################################################################################
+# main
+################################################################################
+
+# String -> Float | String
+def get_time(text):
+    try:
+        return float(text)
+    except ValueError:
+        return text
+
+if __name__=='__main__':
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    opts = dict((a[2:].split('=', 1) + [None])[:2] for a in sys.argv[1:] if a.startswith('--'))
+    layout = opts.get('layout')
+    cmd = args[0]
+    path = args[1]
+    if cmd == 'build':
+        every = int(args[2]) if len(args) > 2 else DEFAULT_EVERY
+        idx = updateIndex(path, every, layout)
+        print('%d lines, %d entries' % (idx['lines'], len(idx['entries'])))
+    elif cmd == 'query':
+        module = importlib.import_module(args[2])
+        t0 = get_time(args[3])
+        t1 = get_time(args[4])
+        for data in queryEvents(path, module, t0, t1, layout=layout):
+            print json.dumps(data)
+    elif cmd == 'split':
+        output = parallelParse(path, args[2], int(args[3]), layout)
+        with open(path+'.json','w') as fd:
+            fd.write(json.dumps(output))
+    else:
+        print('Unknown command: %s' % cmd)
+        exit(1)
+
+# end of file.
@@ -0,0 +1,302 @@
+# coding: utf-8
+
+import sys, os
+import json
+import stat
+import fnmatch
+
+import gclog_detect
+import gclog_index
+
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
+
+"""
+Recursive discovery of gc logs, and a manifest of the logs processed.
+
+Discovery:
+    An archive such as host/jvm/date/gc*.log* is walked recursively, and
+    the files whose names match any of the glob patterns are gc logs.
+    Directories are read by scandir (os.scandir of python3, or the
+    scandir package), which tells files from directories by the entries
+    without a stat of each; without it, by os.listdir and os.lstat.
+    Hidden files and directories, and the outputs of the parsers
+    (gclog_detect.SKIP_SUFFIXES) are skipped. Symbolic links are not
+    followed. Files are given in order of their paths.
+
+Manifest:
+    One JSON object per log processed, appended and flushed when the log
+    is done:
+        path      the log.
+        size      bytes, and mtime, when the log was processed.
+        head      digest of the head of the log (gclog_index.headDigest).
+        out       where its output was written.
+        events    events written.
+    The last record of a path holds. A log is unchanged if it has the
+    same size, and the same mtime or head, so most logs are skipped by a
+    stat alone. A log which grew, or was rotated or replaced, is
+    processed again.
+    A run which crashes leaves the records of the logs it finished, so
+    a re-run resumes with the others. A line cut by the crash is ignored.
+
+Usage:
+    python2 -O this.py list ROOT... [--glob=PATTERNS]
+    # Paths of the gc logs under the roots, e.g. --glob='gc*.log*'.
+    python2 -O this.py pending MANIFEST ROOT... [--glob=PATTERNS]
+    # Paths of the gc logs which are not unchanged in the manifest.
+    python2 -O this.py compact MANIFEST
+    # Keep only the last record of each path.
+
+    python2 -O gclog.py parse ROOT --glob='gc*.log*' --out=DIR/ --manifest=PATH
+    # Parse the logs not processed yet (see gclog.py).
+
+"""
+
+################################################################################
+# Constants.
+################################################################################
+
+# Patterns of the names of gc logs, separated by commas.
+DEFAULT_GLOBS = "*"
+
+
+################################################################################
+# Discovery.
+################################################################################
+
+"""
+Parse glob patterns.
+
+spec :: String | [String] # e.g. "gc*.log*,gclog*"
+return :: [String]
+
+"""
+def parseGlobs(spec):
+    if isinstance(spec, basestring):
+        spec = spec.split(',')
+    return [g.strip() for g in spec if g.strip()]
+
+"""
+Whether a file name is a gc log.
+
+name :: String
+globs :: [String]
+return :: Bool
+
+"""
+def isLogName(name, globs):
+    if name.startswith('.') or name.endswith(gclog_detect.SKIP_SUFFIXES):
+        return False
+    for g in globs:
+        if fnmatch.fnmatch(name, g):
+            return True
+    return False
+
+"""
+Entries of a directory, in order of their names.
+
+path :: String
+return :: [(String, Bool, Int, Float)] # (name, is a directory, size, mtime).
+                                       # size and mtime are None for directories.
+
+"""
+def listEntries(path):
+    entries = []
+    if scandir is not None:
+        for e in scandir(path):
+            if e.is_dir(follow_symlinks=False):
+                entries.append((e.name, True, None, None))
+            elif e.is_file(follow_symlinks=False):
+                st = e.stat(follow_symlinks=False)
+                entries.append((e.name, False, st.st_size, st.st_mtime))
+    else:
+        for name in os.listdir(path):
+            st = os.lstat(os.path.join(path, name))
+            if stat.S_ISDIR(st.st_mode):
+                entries.append((name, True, None, None))
+            elif stat.S_ISREG(st.st_mode):
+                entries.append((name, False, st.st_size, st.st_mtime))
+    entries.sort()
+    return entries
+
+"""
+Gc logs under a directory, recursively.
+A directory which cannot be read is reported to stderr and skipped.
+
+root :: String
+globs :: String | [String]
+return :: Generator (String, Int, Float) # (path, size, mtime)
+
+"""
+def walkLogs(root, globs=DEFAULT_GLOBS):
+    globs = parseGlobs(globs)
+    stack = [root]
+    while stack:
+        top = stack.pop()
+        try:
+            entries = listEntries(top)
+        except OSError, e:
+            sys.stderr.write("%s: %s, skipped\n" % (top, e.strerror))
+            continue
+        dirs = []
+        for (name, isDir, size, mtime) in entries:
+            path = os.path.join(top, name)
+            if isDir:
+                if not name.startswith('.'):
+                    dirs.append(path)
+            elif isLogName(name, globs):
+                yield (path, size, mtime)
+        # Popped in order of their names.
+        stack.extend(reversed(dirs))
+
+
+################################################################################
+# Manifest.
+################################################################################
+
+"""
+Load the records of a manifest, the last of each path.
+
+path :: String
+return :: {String: Record}
+
+Record :: {'path': String, 'size': Int, 'mtime': Float, 'head': String,
+           'out': String | None, 'events': Int | None}
+
+"""
+def loadManifest(path):
+    done = {}
+    try:
+        fd = open(path, 'r')
+    except IOError:
+        return done
+    with fd:
+        for line in fd:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            done[record['path']] = record
+    return done
+
+"""
+A record of a log, before it is processed.
+The log is read now, so a log which grows meanwhile is processed again.
+
+path :: String
+return :: Record # without out and events.
+
+"""
+def newRecord(path):
+    st = os.stat(path)
+    return {'path': path, 'size': st.st_size, 'mtime': st.st_mtime,
+            'head': gclog_index.headDigest(path), 'out': None, 'events': None}
+
+"""
+Whether a log is unchanged since its record.
+
+record :: Record | None
+path :: String
+size :: Int | None # None stats the log.
+mtime :: Float | None
+return :: Bool
+
+"""
+def isUnchanged(record, path, size=None, mtime=None):
+    if record is None:
+        return False
+    if size is None:
+        st = os.stat(path)
+        (size, mtime) = (st.st_size, st.st_mtime)
+    if record['size'] != size:
+        return False
+    return record['mtime'] == mtime or record['head'] == gclog_index.headDigest(path)
+
+"""
+Logs which are not unchanged in a manifest.
+
+logs :: Iterable (String, Int | None, Float | None) # as walkLogs.
+done :: {String: Record} # of loadManifest.
+return :: Generator String
+
+"""
+def pendingLogs(logs, done):
+    for (path, size, mtime) in logs:
+        if not isUnchanged(done.get(path), path, size, mtime):
+            yield path
+
+"""
+Open a manifest to append records.
+A line cut by a crash is ended, not to spoil the next record.
+
+path :: String
+return :: File
+
+"""
+def openManifest(path):
+    cut = False
+    if os.path.exists(path) and os.path.getsize(path) > 0:
+        with open(path, 'rb') as fd:
+            fd.seek(-1, os.SEEK_END)
+            cut = fd.read(1) != '\n'
+    fd = open(path, 'a')
+    if cut:
+        fd.write('\n')
+    return fd
+
+"""
+Append a record to a manifest, flushed at once so that it survives a
+crash of the run.
+
+fd :: File # of openManifest.
+record :: Record
+
+"""
+def appendRecord(fd, record):
+    fd.write(json.dumps(record) + '\n')
+    fd.flush()
+
+"""
+Rewrite a manifest with the last record of each path.
+It is written to a temporary file and renamed not to lose the manifest.
+
+path :: String
+return :: Int # records kept.
+
+"""
+def compactManifest(path):
+    done = loadManifest(path)
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as fd:
+        for p in sorted(done):
+            fd.write(json.dumps(done[p]) + '\n')
+    os.rename(tmp, path)
+    return len(done)
+
+
+################################################################################
+# main
+################################################################################
+
+if __name__=='__main__':
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    opts = dict((a[2:].split('=', 1) + [None])[:2] for a in sys.argv[1:] if a.startswith('--'))
+    globs = opts.get('glob') or DEFAULT_GLOBS
+    if args[0] == 'list':
+        for root in args[1:]:
+            for (path, size, mtime) in walkLogs(root, globs):
+                print path
+    elif args[0] == 'pending':
+        done = loadManifest(args[1])
+        for root in args[2:]:
+            for path in pendingLogs(walkLogs(root, globs), done):
+                print path
+    elif args[0] == 'compact':
+        print('%d records' % compactManifest(args[1]))
+
+# end of file.
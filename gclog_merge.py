@@ -0,0 +1,200 @@
+# coding: utf-8
+
+import sys
+import json
+import heapq
+import itertools
+import calendar
+import time
+import importlib
+
+"""
+Time-ordered merge of gc events of many JVMs.
+
+Each gc log is parsed lazily by iterGcLog of a parser module, and the
+streams, each ordered by time, are merged by a heap-based k-way merge.
+Only one event per stream is held at a time, so memory is bounded by
+the number of streams, not by the size of the logs.
+Every event is tagged with its source JVM as "jvm".
+
+Events are ordered by "utc", which all the parser modules capture,
+converted to epoch seconds so that JVMs in different time zones can be
+merged. When a stream has no utc (a JDK8 log without date stamps, or
+-Xlog without time decorators), all the streams are ordered by uptime
+("timestamp" or "end_sec") instead, which is reported to stderr.
+A stream without any time of the clock is an error.
+
+Usage:
+    python2 -O this.py module ${GC_LOG_FILE}... | ${YOUR_ANALYZER}
+    # module is a parser module such as gclog_parser_cms.
+    # One JSON object per line is written to stdout.
+
+"""
+
+################################################################################
+# Time of events.
+################################################################################
+
+# Cache of the epoch seconds of the last minute seen.
+_minute_cache = [None, 0]
+
+"""
+Epoch seconds of a timestamp of gc logs.
+
+utc :: String # e.g. 2021-09-10T15:23:34.217+0800
+return :: Float
+
+"""
+def utcSeconds(utc):
+    minute = utc[:16]
+    tz = utc[-5:]
+    key = minute + tz
+    if _minute_cache[0] != key:
+        t = calendar.timegm(time.strptime(minute, "%Y-%m-%dT%H:%M"))
+        offset = (int(tz[1:3]) * 60 + int(tz[3:5])) * 60
+        if tz[0] == '-':
+            offset = -offset
+        _minute_cache[0] = key
+        _minute_cache[1] = t - offset
+    return _minute_cache[1] + float(utc[17:-5])
+
+"""
+Merge key of an event.
+
+data :: Dictionary
+clock :: 'utc' | 'uptime'
+return :: Float | None # None if the event has no time of the clock.
+
+"""
+def eventTime(data, clock='utc'):
+    if clock == 'utc':
+        utc = data.get("utc")
+        if utc is None:
+            return None
+        return utcSeconds(utc)
+    if "end_sec" in data:
+        return data["end_sec"]
+    return data.get("timestamp")
+
+"""
+Events of a stream with their merge keys.
+An event without time takes the time of the event before it, or of the
+first event with time at the head of the stream.
+
+name :: String # of the stream, for the error.
+events :: Iterable Dictionary
+clock :: 'utc' | 'uptime'
+return :: Generator (Float, Dictionary)
+
+"""
+def timedEvents(name, events, clock='utc'):
+    t = None
+    held = []
+    for data in events:
+        t1 = eventTime(data, clock)
+        if t1 is not None:
+            t = t1
+        if t is None:
+            held.append(data)
+            continue
+        for h in held:
+            yield (t, h)
+        held = []
+        yield (t, data)
+    if held:
+        raise ValueError("%s: no %s in %d events" % (name, clock, len(held)))
+
+"""
+Clock to merge streams by: utc, unless the first event of a stream has
+none.
+
+sources :: [(String, Iterable Dictionary)]
+return :: ('utc' | 'uptime', [(String, Iterable Dictionary)]) # with the
+          # sources, whose first events were read, to use instead.
+
+"""
+def mergeClock(sources):
+    clock = 'utc'
+    peeked = []
+    for (name, events) in sources:
+        it = iter(events)
+        head = list(itertools.islice(it, 1))
+        if head and "utc" not in head[0]:
+            sys.stderr.write("%s: no utc, the streams are merged by uptime\n" % name)
+            clock = 'uptime'
+        peeked.append((name, itertools.chain(head, it)))
+    return (clock, peeked)
+
+
+################################################################################
+# k-way merge.
+################################################################################
+
+"""
+Merge event streams each ordered by time into one.
+
+An event without time takes the time of the event before it in its
+stream (see timedEvents). Events of the same time keep the order of the
+streams.
+
+sources :: [(String, Iterable Dictionary)] # (jvm name, events)
+clock :: 'utc' | 'uptime' | None # None chooses by mergeClock.
+return :: Generator Dictionary
+
+"""
+def mergeStreams(sources, clock=None):
+    if clock is None:
+        (clock, sources) = mergeClock(sources)
+    heap = []
+    iters = []
+    for (i, (name, events)) in enumerate(sources):
+        it = timedEvents(name, events, clock)
+        iters.append((name, it))
+        for (t, data) in it:
+            heapq.heappush(heap, (t, i, data))
+            break
+    while heap:
+        (t, i, data) = heap[0]
+        (name, it) = iters[i]
+        data["jvm"] = name
+        yield data
+        for (t, data) in it:
+            heapq.heapreplace(heap, (t, i, data))
+            break
+        else:
+            heapq.heappop(heap)
+
+"""
+Merge gc logs parsed by a parser module.
+
+paths :: [String]
+module :: Module # a parser module, e.g. gclog_parser_cms.
+jvmName :: (String -> String) | None # makes the jvm tag from a path.
+clock :: 'utc' | 'uptime' | None # as mergeStreams.
+return :: Generator Dictionary
+
+"""
+def mergeFiles(paths, module, jvmName=None, clock=None):
+    fds = [open(path, 'r') for path in paths]
+    try:
+        sources = []
+        for (path, fd) in zip(paths, fds):
+            name = jvmName(path) if jvmName is not None else path
+            sources.append((name, module.iterGcLog(fd)))
+        for data in mergeStreams(sources, clock):
+            yield data
+    finally:
+        for fd in fds:
+            fd.close()
+
+
+################################################################################
+# main
+################################################################################
+
+if __name__=='__main__':
+    module = importlib.import_module(sys.argv[1])
+    for data in mergeFiles(sys.argv[2:], module):
+        print json.dumps(data)
+
+# end of file.
@@ -3,6 +3,9 @@
 import re
 import sys, os
 import json
+from collections import deque
+
+import gclog_assemble
 
 """
 This is a parser of GC log of Sun HotSpot JVM Version 6.
@@ -12,6 +15,14 @@ Required JVM option: -Xloggc=${GC_LOG_FILE} -XX:+PrintGCDetails
 Usage:
    java -Xloggc=${GC_LOG_FILE} -XX:+PrintGCDetails ${ANY_OTHER_OPTIONS}
    this.py < ${GC_LOG_FILE} | grep -v ^### | ${YOUR_ANALYZER}
+   this.py - --cycles [--parnews=N] | ${YOUR_ANALYZER}
+   # One "CMS Cycle" per concurrent cycle instead of its phases, and one
+   # "CMS Incident" per failure (see iterCycles).
+   this.py - --incidents [--parnews=N] | ${YOUR_ANALYZER}
+   # Only the incidents.
+   this.py tenuring ${OUT_NPZ} < ${GC_LOG_FILE}
+   # With -XX:+PrintTenuringDistribution, the age tables of the ParNews
+   # as numpy blocks (see tenuringBlocks), and their premature promotion.
 
 You can get all data as a python dictionary structure
 in your analyer as follows:
@@ -57,6 +68,9 @@ def newP(regexStr, dataModifier):
         else:
             msg = "Parse failed: pattern \"%s\" for \"%s\"" % (regexStr, line)
             raise ParseError(msg)
+    # Kept for tools which look into the grammar (see gclog_cache.py).
+    parse_.regexStr = regexStr
+    parse_.dataModifier = dataModifier
     return parse_
 
 ################################################################################
@@ -113,6 +127,8 @@ def andP(parsers):
             text0 = text1
             data0 = data1
         return (text0, data0)
+    parseAnd_.combinator = 'and'
+    parseAnd_.parsers = parsers
     return parseAnd_
 
 """
@@ -133,6 +149,8 @@ def orP(parsers):
                 msgL.append(msg)
         msgs = toString(msgL)
         raise ParseError(msgs)
+    parseOr_.combinator = 'or'
+    parseOr_.parsers = parsers
     return parseOr_
 
 """
@@ -193,6 +211,8 @@ def mkTagger(key, value):
     def tagger_(line, dictData):
         dictData[key] = value
         return (line, dictData)
+    tagger_.tagKey = key
+    tagger_.tagValue = value
     return tagger_
 
 
@@ -202,37 +222,85 @@ def get_float(match_strL):
     assert len(match_strL) == 1
     return float(match_strL[0])
 
+# match_strL :: [String] # length must be 1.
+# return :: Int
+def get_int(match_strL):
+    assert len(match_strL) == 1
+    return int(match_strL[0])
+
 # match_strL :: [String] # length must be 3.
 # return :: [Int] # length is 3.
 def get_int3(match_strL):
     assert len(match_strL) == 3
     return [int(match_strL[0]), int(match_strL[1]), int(match_strL[2])]
 
+# match_strL :: [String] # length must be 3.
+# return :: [Float] # length is 3.
+def get_float3(match_strL):
+    assert len(match_strL) == 3
+    return [float(match_strL[0]), float(match_strL[1]), float(match_strL[2])]
+
 # match_strL :: [String]
 # return :: True
 def get_true(match_strL):
     return True
 
+# match_strL :: [String]
+# return :: String
+def get_string(match_strL):
+    return match_strL[0]
+
 
 ################################################################################
 # Regexp aliases.
 ################################################################################
 
-regexp_timestamp = r"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d+\.\d+\+\d{4}:\s+"
+regexp_timestamp = r"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d+\.\d+[+-]\d{4}:\s+"
 regexp_float = r"(\d+\.\d*)"
 regexp_float_colon = regexp_timestamp + regexp_float + r":\s+"
+regexp_date = r"(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d+\.\d+[+-]\d{4}):\s+"
 regexp_heap_info = r"(\d+)K->(\d+)K\((\d+)K\)"
 regexp_float_secs = regexp_float + r"\s*secs\s+"
 regexp_basic_string = r"([0-9a-zA-Z_-]+)"
+# Cause of a JDK8 gc, e.g. (Allocation Failure), (System.gc()).
+regexp_cause = r"\((?:[^()]|\([^()]*\))*\)\s*"
 
 
 ################################################################################
 # Parsers for gc log entries.
 ################################################################################
 
+"""
+Date and uptime stamps at the head of an event.
+e.g. 2019-12-05T04:17:14.531+0800: 5.388:
+
+"""
+parseTimestamp = andP([ \
+	newP(regexp_date, mkDictModifier("utc", get_string)), \
+	newP(regexp_float + r":\s+", mkDictModifier("timestamp", get_float)), ])
+
+"""
+CPU times of an event at the end of a line.
+e.g. [Times: user=0.10 sys=0.02, real=0.13 secs]
+
+They are kept as [user, sys, real] in seconds.
+Times in another form (e.g. a locale with decimal commas) are skipped.
+
+"""
+parseTimes = orP([ \
+	newP(r"\[Times:\s+user=" + regexp_float + r"\s+sys=" + regexp_float + \
+	     r",\s+real=" + regexp_float + r"\s+secs\s*\]$", mkDictModifier("times", get_float3)), \
+	newP(r"\[Times:.*\]$", None), ])
+if __debug__:
+    text = r"[Times: user=0.10 sys=0.02, real=0.13 secs]"
+    (ret, data) = parseTimes(text, {})
+    print text
+    print len(ret)
+    print data
+
 parseParNew = andP([ \
 	mkTagger("type", "ParNew"), \
-	newP(regexp_float_colon, mkDictModifier("timestamp", get_float)), \
+	parseTimestamp, \
 	newP(r"\[GC\s+\(Allocation\sFailure\)\s+", None), \
 	newP(regexp_float_colon, None), \
 	newP(r"\[ParNew:\s+", None), \
@@ -241,7 +309,7 @@ parseParNew = andP([ \
 	newP(regexp_heap_info, mkDictModifier("heap_all", get_int3)), \
 	newP(r"(?:\sicms_dc=\d+\s*)?,\s*", None), \
 	newP(regexp_float + r"\s*secs\]\s*", mkDictModifier("response", get_float)), \
-	newP(r"\[Times:.*\]$", None), ])
+	parseTimes, ])
 if __debug__:
     text = r"2019-12-05T04:17:14.531+0800: 5.388: [GC (Allocation Failure) 2019-12-05T04:17:14.531+0800: 5.388: [ParNew: 5070147K->61055K(5662336K), 0.1314250 secs] 5070147K->61055K(7759488K), 0.1315435 secs] [Times: user=0.10 sys=0.02, real=0.13 secs]"
     (ret, data) = parseParNew(text, {})
@@ -260,14 +328,80 @@ if __debug__:
 #     print len(ret)
 #     print data
     
+"""
+A ParNew with -XX:+PrintTenuringDistribution is printed over many lines,
+the age table of the survivors between its head and its tail:
+    2019-12-05T04:06:46.796+0800: 6.796: [GC (Allocation Failure) 2019-12-05T04:06:46.796+0800: 6.796: [ParNew
+    Desired survivor size 53673984 bytes, new threshold 6 (max 6)
+    - age   1:   30011408 bytes,   30011408 total
+    - age   2:    3437248 bytes,   33448656 total
+    : 4519501K->79457K(5662336K), 0.1314250 secs] 6014686K->1587081K(7759488K), 0.1315435 secs] [Times: user=0.36 sys=0.03, real=0.13 secs]
+They are joined by MULTILINE_RULES into one ParNew event with
+    survivor_desired     desired survivor size in bytes.
+    tenuring_threshold   the new threshold, tenuring_max its maximum.
+    ages                 [[age, bytes], ...] of the ages printed.
+
+"""
+parseParNewHead = andP([ \
+	mkTagger("type", "ParNew-head"), \
+	parseTimestamp, \
+	newP(r"\[GC\s+\(Allocation\sFailure\)\s+", None), \
+	newP(regexp_float_colon, None), \
+	newP(r"\[ParNew\s*$", None), ])
+if __debug__:
+    text = r"2019-12-05T04:06:46.796+0800: 6.796: [GC (Allocation Failure) 2019-12-05T04:06:46.796+0800: 6.796: [ParNew"
+    (ret, data) = parseParNewHead(text, {})
+    print text
+    print len(ret)
+    print data
+
+parseTenuringThreshold = andP([ \
+	mkTagger("type", "ParNew-tenuring"), \
+	newP(r"Desired\ssurvivor\ssize\s(\d+)\sbytes,\s+", mkDictModifier("survivor_desired", get_int)), \
+	newP(r"new\sthreshold\s(\d+)\s+", mkDictModifier("tenuring_threshold", get_int)), \
+	newP(r"\(max\s(\d+)\)\s*$", mkDictModifier("tenuring_max", get_int)), ])
+if __debug__:
+    text = r"Desired survivor size 53673984 bytes, new threshold 6 (max 6)"
+    (ret, data) = parseTenuringThreshold(text, {})
+    print text
+    print len(ret)
+    print data
+
+parseTenuringAge = andP([ \
+	mkTagger("type", "ParNew-age"), \
+	newP(r"-\s+age\s+(\d+):\s+", mkDictModifier("age", get_int)), \
+	newP(r"(\d+)\sbytes,\s+", mkDictModifier("bytes", get_int)), \
+	newP(r"(\d+)\stotal\s*$", None), ])
+if __debug__:
+    text = r"- age   2:    3437248 bytes,   33448656 total"
+    (ret, data) = parseTenuringAge(text, {})
+    print text
+    print len(ret)
+    print data
+
+parseParNewTail = andP([ \
+	mkTagger("type", "ParNew-tail"), \
+	newP(r":\s+", None), \
+	newP(regexp_heap_info + r",\s+", mkDictModifier("heap_new", get_int3)), \
+	newP(regexp_float + r"\s*secs\]\s*", None), \
+	newP(regexp_heap_info, mkDictModifier("heap_all", get_int3)), \
+	newP(r"(?:\sicms_dc=\d+\s*)?,\s*", None), \
+	newP(regexp_float + r"\s*secs\]\s*", mkDictModifier("response", get_float)), \
+	parseTimes, ])
+if __debug__:
+    text = r": 4519501K->79457K(5662336K), 0.1314250 secs] 6014686K->1587081K(7759488K), 0.1315435 secs] [Times: user=0.36 sys=0.03, real=0.13 secs]"
+    (ret, data) = parseParNewTail(text, {})
+    print text
+    print len(ret)
+    print data
 
 parseInitialMark = andP([ \
 	mkTagger("type", "CMS-initial-mark"), \
-	newP(regexp_float_colon, mkDictModifier("timestamp", get_float)), \
+	parseTimestamp, \
 	newP(r".*CMS-initial-mark:\s+\d+K\(\d+K\)\]\s*", None), \
 	newP(r"\d+K\(\d+K\),\s*", None), \
 	newP(regexp_float + r"\s*secs\]\s*", mkDictModifier("response", get_float)), \
-	newP(r"\[Times:.*\]$", None), ])
+	parseTimes, ])
 if __debug__:
     text = r"2019-12-05T04:20:59.201+0800: 230.059: [GC (CMS Initial Mark) [1 CMS-initial-mark: 1930270K(2097152K)] 1968958K(7759488K), 0.0045541 secs] [Times: user=0.00 sys=0.00, real=0.01 secs]"
     (ret, data) = parseInitialMark(text, {})
@@ -278,7 +412,7 @@ if __debug__:
 
 parseMarkStart = andP([ \
 	mkTagger("type", "CMS-concurrent-mark-start"), \
-	newP(regexp_float_colon, mkDictModifier("timestamp", get_float)), \
+	parseTimestamp, \
 	newP(r".*CMS-concurrent-mark-start.*$", None), ])
 if __debug__:
     text = r"2019-12-05T04:22:50.833+0800: 341.691: [CMS-concurrent-mark-start]"
@@ -290,11 +424,11 @@ if __debug__:
 
 parseMark = andP([ \
 	mkTagger("type", "CMS-concurrent-mark"), \
-	newP(regexp_float_colon, mkDictModifier("timestamp", get_float)), \
+	parseTimestamp, \
 	newP(r"\[CMS-concurrent-mark:\s+", None), \
 	newP(regexp_float + r"/", None), \
 	newP(regexp_float + r"\s+secs\]\s+", mkDictModifier("response", get_float)), \
-	newP(r"\[Times:.*\]$", None), ])
+	parseTimes, ])
 if __debug__:
     text = r"2019-12-05T04:26:03.302+0800: 534.159: [CMS-concurrent-mark: 1.720/1.897 secs] [Times: user=11.94 sys=1.69, real=1.89 secs]"
     (ret, data) = parseMark(text, {})
@@ -305,7 +439,7 @@ if __debug__:
 
 parsePrecleanStart = andP([ \
 	mkTagger("type", "CMS-concurrent-preclean-start"), \
-	newP(regexp_float_colon, mkDictModifier("timestamp", get_float)), \
+	parseTimestamp, \
 	newP(r".*CMS-concurrent-preclean-start.*$", None), ])
 if __debug__:
     text = r"2019-12-05T04:26:03.302+0800: 534.159: [CMS-concurrent-preclean-start]"
@@ -317,11 +451,11 @@ if __debug__:
 
 parsePreclean = andP([ \
 	mkTagger("type", "CMS-concurrent-preclean"), \
-	newP(regexp_float_colon, mkDictModifier("timestamp", get_float)), \
+	parseTimestamp, \
 	newP(r"\[CMS-concurrent-preclean:\s+", None), \
 	newP(regexp_float + r"/", None), \
 	newP(regexp_float + r"\s+secs\]\s+", mkDictModifier("response", get_float)), \
-	newP(r"\[Times:.*\]$", None), ])
+	parseTimes, ])
 if __debug__:
     text = r"2019-12-05T04:26:03.390+0800: 534.248: [CMS-concurrent-preclean: 0.014/0.018 secs] [Times: user=0.07 sys=0.00, real=0.01 secs]"
     (ret, data) = parsePreclean(text, {})
@@ -332,7 +466,7 @@ if __debug__:
 
 parseAbortablePrecleanStart = andP([ \
 	mkTagger("type", "CMS-concurrent-abortable-preclean-start"), \
-	newP(regexp_float_colon, mkDictModifier("timestamp", get_float)), \
+	parseTimestamp, \
 	newP(r".*CMS-concurrent-abortable-preclean-start.*$", None), ])
 if __debug__:
     text = r"2019-12-05T04:26:03.390+0800: 534.248: [CMS-concurrent-abortable-preclean-start]"
@@ -344,11 +478,11 @@ if __debug__:
 
 parseAbortablePreclean = andP([ \
 	mkTagger("type", "CMS-concurrent-abortable-preclean"), \
-	newP(regexp_float_colon, mkDictModifier("timestamp", get_float)), \
+	parseTimestamp, \
 	newP(r"\[CMS-concurrent-abortable-preclean:\s+", None), \
 	newP(regexp_float + r"/", None), \
 	newP(regexp_float + r"\s+secs\]\s+", mkDictModifier("response", get_float)), \
-	newP(r"\[Times:.*\]$", None), ])
+	parseTimes, ])
 if __debug__:
     text = r"2019-12-05T04:18:32.874+0800: 83.732: [CMS-concurrent-abortable-preclean: 0.793/0.954 secs] [Times: user=3.78 sys=0.38, real=0.96 secs]"
     (ret, data) = parseAbortablePreclean(text, {})
@@ -359,15 +493,16 @@ if __debug__:
 
 parseAbortablePrecleanFullGC0 = andP([ \
 	mkTagger("type", "CMS-concurrent-abortable-preclean-fullgc0"), \
-	newP(regexp_float_colon, mkDictModifier("timestamp", get_float)), \
+	parseTimestamp, \
 	orP([newP(r"\[Full GC\s*\(System\.gc\(\)\)\s*" + regexp_float_colon, mkDictModifier("system", get_true)),\
              newP(r"\[Full GC\s*" + regexp_float_colon, None), \
+             newP(r"\[GC\s*\(Allocation Failure\).*" + r"\[ParNew\s\(promotion failed\).*secs\]" + regexp_float_colon, mkDictModifier("promotion_failed", get_true)), \
              newP(r"\[GC\s*\(Allocation Failure\).*" + r"\[ParNew.*secs\]" + regexp_float_colon, None),]), \
 	newP(r"\[CMS" + regexp_float_colon, None), \
 	newP(r"\[CMS-concurrent-(abortable-)?preclean:\s+", None), \
 	newP(regexp_float + r"/", None), \
 	newP(regexp_float + r"\s+secs\]\s*", mkDictModifier("response", get_float)), \
-	newP(r"\[Times:.*\]$", None), ])
+	parseTimes, ])
 if __debug__:
     #text = r"2019-12-11T12:07:18.104+0800: 415.160: [GC (Allocation Failure) 2019-12-11T12:07:18.104+0800: 415.160: [ParNew: 6606079K->6606079K(6606080K), 0.0000257 secs]2019-12-11T12:07:18.104+0800: 415.160: [CMS2019-12-11T12:07:18.459+0800: 415.515: [CMS-concurrent-mark: 0.392/0.393 secs] [Times: user=0.92 sys=0.02, real=0.39 secs]"
     #(ret, data) = parseAbortablePrecleanFullGC0(text, {})
@@ -394,14 +529,14 @@ if __debug__:
 
 parseAbortablePrecleanFullGC1 = andP([ \
 	mkTagger("type", "CMS-concurrent-abortable-preclean-fullgc1"), \
-	newP(r"\s*\(concurrent mode (failure|interrupted)\):\s+", None), \
+	newP(r"\s*\(concurrent mode (failure|interrupted)\):\s+", mkDictModifier("concurrent_mode", get_string)), \
 	newP(regexp_heap_info + r",\s+", mkDictModifier("heap_1", get_int3)), \
 	newP(regexp_float + r"\s+secs\s*\]\s+", None), \
 	newP(regexp_heap_info + r",\s+", mkDictModifier("heap_2", get_int3)), \
 	newP(r"\[Metaspace:\s+", None), \
 	newP(regexp_heap_info + r"\],\s+", mkDictModifier("meta", get_int3)), \
 	newP(regexp_float + r"\s*secs\s*\]\s*", mkDictModifier("response", get_float)), \
-	newP(r"\[Times:.*\]$", None), ])
+	parseTimes, ])
 if __debug__:
     text = r" (concurrent mode failure): 1041940K->1048575K(1048576K), 3.0127238 secs] 7646509K->1423853K(7654656K), [Metaspace: 9132K->9132K(1058816K)], 5.3052202 secs] [Times: user=5.14 sys=0.17, real=5.30 secs]"
     (ret, data) = parseAbortablePrecleanFullGC1(text, {})
@@ -418,11 +553,11 @@ if __debug__:
 parseAbortablePrecleanFailureTime = andP([ \
 	mkTagger("type", "CMS-concurrent-abortable-preclean-failure-time"), \
 	newP(r"\s*CMS:\s*abort preclean due to time\s*", None), \
-	newP(regexp_float_colon, mkDictModifier("timestamp", get_float)), \
+	parseTimestamp, \
 	newP(r"\[CMS-concurrent-abortable-preclean:\s*", None), \
 	newP(regexp_float + r"/", None), \
 	newP(regexp_float + r"\s*secs\s*\]\s*", mkDictModifier("response", get_float)), \
-	newP(r"\[Times:.*\]$", None), ])
+	parseTimes, ])
 if __debug__:
     text = r" CMS: abort preclean due to time 2019-12-11T12:08:12.632+0800: 469.688: [CMS-concurrent-abortable-preclean: 0.128/5.034 secs] [Times: user=16.42 sys=3.59, real=5.04 secs]"
     (ret, data) = parseAbortablePrecleanFailureTime(text, {})
@@ -448,11 +583,11 @@ if __debug__:
 
 parseRemark = andP([ \
 	mkTagger("type", "CMS-remark"), \
-	newP(regexp_float_colon, mkDictModifier("timestamp", get_float)), \
+	parseTimestamp, \
 	newP(r"\[GC\s+\(CMS Final Remark\)\s+\[YG occupancy.+CMS-remark:\s+\d+K\(\d+K\)\]\s*", None), \
 	newP(r"\d+K\(\d+K\),\s*", None), \
 	newP(regexp_float + r"\s*secs\]\s*", mkDictModifier("response", get_float)), \
-	newP(r"\[Times:.*\]$", None), ])
+	parseTimes, ])
 if __debug__:
     text = r"2019-12-05T04:58:15.792+0800: 335.407: [GC (CMS Final Remark) [YG occupancy: 2668048 K (5662336 K)]2019-12-05T04:58:15.792+0800: 335.407: [Rescan (parallel) , 0.8799493 secs]2019-12-05T04:58:16.672+0800: 336.287: [weak refs processing, 0.0000365 secs]2019-12-05T04:58:16.672+0800: 336.287: [class unloading, 0.0067348 secs]2019-12-05T04:58:16.679+0800: 336.294: [scrub symbol table, 0.0027506 secs]2019-12-05T04:58:16.682+0800: 336.297: [scrub string table, 0.0002704 secs][1 CMS-remark: 1939770K(2097152K)] 4607818K(7759488K), 0.8898802 secs] [Times: user=0.88 sys=0.01, real=0.88 secs]"
     (ret, data) = parseRemark(text, {})
@@ -463,7 +598,7 @@ if __debug__:
 
 parseSweepStart = andP([ \
 	mkTagger("type", "CMS-concurrent-sweep-start"), \
-	newP(regexp_float_colon, mkDictModifier("timestamp", get_float)), \
+	parseTimestamp, \
 	newP(r"\[CMS-concurrent-sweep-start\]$", None), ])
 if __debug__:
     text = r"2019-12-05T04:58:16.682+0800: 336.297: [CMS-concurrent-sweep-start]"
@@ -475,11 +610,11 @@ if __debug__:
 
 parseSweep = andP([ \
 	mkTagger("type", "CMS-concurrent-sweep"), \
-	newP(regexp_float_colon, mkDictModifier("timestamp", get_float)), \
+	parseTimestamp, \
 	newP(r"\[CMS-concurrent-sweep:\s+", None), \
 	newP(regexp_float + r"/", None), \
 	newP(regexp_float + r"\s+secs\]\s+", mkDictModifier("response", get_float)), \
-	newP(r"\[Times:.*\]$", None), ])
+	parseTimes, ])
 if __debug__:
     text = r"2019-12-05T04:58:17.259+0800: 336.873: [CMS-concurrent-sweep: 0.483/0.576 secs] [Times: user=3.43 sys=0.44, real=0.58 secs]"
     (ret, data) = parseSweep(text, {})
@@ -490,7 +625,7 @@ if __debug__:
 
 parseResetStart = andP([ \
 	mkTagger("type", "CMS-concurrent-reset-start"), \
-	newP(regexp_float_colon, mkDictModifier("timestamp", get_float)), \
+	parseTimestamp, \
 	newP(r"\[CMS-concurrent-reset-start\]$", None), ])
 if __debug__:
     text = r"2019-12-05T04:58:17.259+0800: 336.874: [CMS-concurrent-reset-start]"
@@ -502,11 +637,11 @@ if __debug__:
 
 parseReset = andP([ \
 	mkTagger("type", "CMS-concurrent-reset"), \
-	newP(regexp_float_colon, mkDictModifier("timestamp", get_float)), \
+	parseTimestamp, \
 	newP(r"\[CMS-concurrent-reset:\s+", None), \
 	newP(regexp_float + r"/", None), \
 	newP(regexp_float + r"\s+secs\]\s+", mkDictModifier("response", get_float)), \
-	newP(r"\[Times:.*\]$", None), ])
+	parseTimes, ])
 if __debug__:
     text = r"2019-12-05T04:58:17.265+0800: 336.880: [CMS-concurrent-reset: 0.007/0.007 secs] [Times: user=0.05 sys=0.01, real=0.01 secs]"
     (ret, data) = parseReset(text, {})
@@ -517,7 +652,7 @@ if __debug__:
 
 parseFullGC = andP([ \
 	mkTagger("type", "FullGC"), \
-	newP(regexp_float_colon, mkDictModifier("timestamp", get_float)), \
+	parseTimestamp, \
 	orP([newP(r"\[Full GC\s*\(System\.gc\(\)\)\s*", mkDictModifier("system", get_true)), \
 		newP(r"\[Full GC\s*", None), ]), \
 	newP(regexp_float_colon, None), \
@@ -530,7 +665,7 @@ parseFullGC = andP([ \
 	newP(r"\]\s*(?:icms_dc=\d+\s*)?", None), \
 	newP(r",\s*", None), \
 	newP(regexp_float + r"\s*secs\]\s*", mkDictModifier("response", get_float)), \
-	newP(r"\[Times:.*\]$", None), ])
+	parseTimes, ])
 if __debug__:
     # text = r"7.992: [Full GC 7.992: [CMS: 6887K->19772K(65536K), 0.4137230 secs] 34678K->19772K(114688K), [CMS Perm : 54004K->53982K(54152K)] icms_dc=0 , 0.4140100 secs] [Times: user=0.68 sys=0.14, real=0.41 secs]"
     # (ret, data) = parseFullGC(text, {})
@@ -544,83 +679,87 @@ if __debug__:
     print data
 
 # This is for -XX:+UseParallelGC
+# The cause is printed by JDK8.
 parseParallelGC = andP([ \
 	mkTagger("type", "ParallelGC"), \
-	newP(regexp_float_colon, mkDictModifier("timestamp", get_float)), \
-	newP(r"\[GC\s+\[PSYoungGen:\s*", None), \
+	parseTimestamp, \
+	newP(r"\[GC\s*(?:" + regexp_cause + r")?\[PSYoungGen:\s*", None), \
 	newP(regexp_heap_info + r"\s*\]\s*", mkDictModifier("heap_new", get_int3)), \
 	newP(regexp_heap_info + r"\s*,\s*", mkDictModifier("heap_all", get_int3)), \
 	newP(regexp_float + r"\s*secs\s*\]\s*", mkDictModifier("response", get_float)), \
-	newP(r"\[Times:.*\]$", None), ])
-# if __debug__:
-#     text = r"162.002: [GC [PSYoungGen: 39323K->3653K(49152K)] 87187K->56999K(114688K), 0.0207580 secs] [Times: user=0.08 sys=0.00, real=0.02 secs]"
-#     (ret, data) = parseParallelGC(text, {})
-#     print text
-#     print len(ret)
-#     print data
+	parseTimes, ])
+if __debug__:
+    text = r"2021-03-02T10:11:12.345+0800: 1.234: [GC (Allocation Failure) [PSYoungGen: 33280K->5104K(38400K)] 33280K->5120K(125952K), 0.0061730 secs] [Times: user=0.02 sys=0.00, real=0.01 secs]"
+    (ret, data) = parseParallelGC(text, {})
+    print text
+    print len(ret)
+    print data
 
 
 # This is for -XX:+UseParallelGC
+# The old generation is ParOldGen with -XX:+UseParallelOldGC (the default
+# of JDK8), and the permanent generation Metaspace on JDK8.
 parseParallelFullGC = andP([ \
 	mkTagger("type", "ParallelFullGC"), \
-	newP(regexp_float_colon, mkDictModifier("timestamp", get_float)), \
-	orP([newP(r"\[Full GC\s*\(System\)\s*\[PSYoungGen:\s*", mkDictModifier("system", get_true)), \
-		newP(r"\[Full GC\s*\[PSYoungGen:\s*", None), ]), \
+	parseTimestamp, \
+	orP([newP(r"\[Full GC\s*\(System(?:\.gc\(\))?\)\s*\[PSYoungGen:\s*", mkDictModifier("system", get_true)), \
+		newP(r"\[Full GC\s*(?:" + regexp_cause + r")?\[PSYoungGen:\s*", None), ]), \
 	newP(regexp_heap_info + r"\s*\]\s*", mkDictModifier("heap_new", get_int3)), \
-	newP(r"\[PSOldGen:\s*", None), \
+	newP(r"\[(?:PSOldGen|ParOldGen):\s*", None), \
 	newP(regexp_heap_info + r"\s*\]\s*", mkDictModifier("heap_old", get_int3)), \
-	newP(regexp_heap_info + r"\s*", mkDictModifier("heap_all", get_int3)), \
-	newP(r"\[PSPermGen:\s*", None), \
+	newP(regexp_heap_info + r"\s*,?\s*", mkDictModifier("heap_all", get_int3)), \
+	newP(r"\[(?:PSPermGen|Metaspace):\s*", None), \
 	newP(regexp_heap_info + r"\s*\]\s*,\s*", mkDictModifier("meta", get_int3)), \
 	newP(regexp_float + r"\s*secs\s*\]\s*", mkDictModifier("response", get_float)), \
-	newP(r"\[Times:.*\]$", None), ])
-# if __debug__:
-#     text = r"162.657: [Full GC [PSYoungGen: 6189K->0K(50752K)] [PSOldGen: 58712K->43071K(65536K)] 64902K->43071K(116288K) [PSPermGen: 81060K->81060K(81152K)], 0.3032230 secs] [Times: user=0.30 sys=0.00, real=0.30 secs]"
-#     (ret, data) = parseParallelFullGC(text, {})
-#     print text
-#     print len(ret)
-#     print data
+	parseTimes, ])
+if __debug__:
+    text = r"2021-03-02T10:11:13.456+0800: 2.345: [Full GC (Ergonomics) [PSYoungGen: 5104K->0K(38400K)] [ParOldGen: 80K->4942K(87552K)] 5184K->4942K(125952K), [Metaspace: 3340K->3340K(1056768K)], 0.0210520 secs] [Times: user=0.06 sys=0.00, real=0.02 secs]"
+    (ret, data) = parseParallelFullGC(text, {})
+    print text
+    print len(ret)
+    print data
 
 
 # This is for -XX:+UseSerialGC
 parseSerialGC = andP([ \
 	mkTagger("type", "SerialGC"), \
-	newP(regexp_float_colon, mkDictModifier("timestamp", get_float)), \
-	newP(r"\[GC\s+", None), \
+	parseTimestamp, \
+	newP(r"\[GC\s*(?:" + regexp_cause + r")?", None), \
 	newP(regexp_float_colon + r"\[DefNew:\s*", None), \
 	newP(regexp_heap_info + r"\s*,\s*", mkDictModifier("heap_new", get_int3)), \
 	newP(regexp_float + r"\s*secs\s*\]\s*", None), \
 	newP(regexp_heap_info + r"\s*,\s*", mkDictModifier("heap_all", get_int3)), \
 	newP(regexp_float + r"\s*secs\s*\]\s*", mkDictModifier("response", get_float)), \
-	newP(r"\[Times:.*\]$", None), ])
-# if __debug__:
-#     text = r"4.687: [GC 4.687: [DefNew: 33343K->649K(49152K), 0.0021450 secs] 45309K->12616K(114688K), 0.0021800 secs] [Times: user=0.00 sys=0.00, real=0.00 secs]"
-#     (ret, data) = parseSerialGC(text, {})
-#     print text
-#     print len(ret)
-#     print data
+	parseTimes, ])
+if __debug__:
+    text = r"2021-03-02T10:11:12.345+0800: 0.123: [GC (Allocation Failure) 2021-03-02T10:11:12.345+0800: 0.123: [DefNew: 4416K->512K(4928K), 0.0032110 secs] 4416K->1510K(15872K), 0.0033020 secs] [Times: user=0.00 sys=0.00, real=0.00 secs]"
+    (ret, data) = parseSerialGC(text, {})
+    print text
+    print len(ret)
+    print data
 
 
 # This is for -XX:+UseSerialGC
 parseSerialFullGC = andP([ \
 	mkTagger("type", "SerialFullGC"), \
-	newP(regexp_float_colon, mkDictModifier("timestamp", get_float)), \
-	newP(r"\[Full GC\s+", None), \
+	parseTimestamp, \
+	orP([newP(r"\[Full GC\s*\(System\.gc\(\)\)\s*", mkDictModifier("system", get_true)), \
+		newP(r"\[Full GC\s*(?:" + regexp_cause + r")?", None), ]), \
 	newP(regexp_float_colon + r"\s*", None), \
 	newP(r"\[Tenured:\s*", None), \
 	newP(regexp_heap_info + r"\s*,\s*", mkDictModifier("heap_old", get_int3)), \
 	newP(regexp_float + r"\s*secs\]\s*", None), \
 	newP(regexp_heap_info + r"\s*,\s*", mkDictModifier("heap_all", get_int3)), \
-	newP(r"\[Perm\s*:\s*", None), \
+	newP(r"\[(?:Perm|Metaspace)\s*:\s*", None), \
 	newP(regexp_heap_info + r"\s*\]\s*,\s*", mkDictModifier("meta", get_int3)), \
 	newP(regexp_float + r"\s*secs\s*\]\s*", mkDictModifier("response", get_float)), \
-	newP(r"\[Times:.*\]$", None), ])
-# if __debug__:
-#     text = r"4.899: [Full GC 4.899: [Tenured: 11966K->12899K(65536K), 0.1237750 secs] 22655K->12899K(114688K), [Perm : 32122K->32122K(32128K)], 0.1238590 secs] [Times: user=0.11 sys=0.00, real=0.13 secs]"
-#     (ret, data) = parseSerialFullGC(text, {})
-#     print text
-#     print len(ret)
-#     print data
+	parseTimes, ])
+if __debug__:
+    text = r"2021-03-02T10:11:12.722+0800: 0.500: [Full GC (Allocation Failure) 2021-03-02T10:11:12.722+0800: 0.500: [Tenured: 10943K->10943K(10944K), 0.0312440 secs] 15871K->15330K(15872K), [Metaspace: 2560K->2560K(1056768K)], 0.0313160 secs] [Times: user=0.03 sys=0.00, real=0.03 secs]"
+    (ret, data) = parseSerialFullGC(text, {})
+    print text
+    print len(ret)
+    print data
 
 
 """
@@ -631,6 +770,10 @@ This supports almost kinds of GC provided by JVM.
  parseParNew
  parseFullGC
 
+-XX:+PrintTenuringDistribution
+ parseParNewHead, parseTenuringThreshold, parseTenuringAge, parseParNewTail
+  are joined by MULTILINE_RULES into a ParNew.
+
 -XX:+UseConcSweepGC -XX:CMSIncrementalMode (-XX:+UseParNewGC)
  parseParNew, parseFullGC,
  parse{InitialMark, MarkStart, Mark, PrecleanStart, Preclean,
@@ -640,13 +783,13 @@ This supports almost kinds of GC provided by JVM.
        Remark,
        SweepStart, Sweep, ResetStart, Reset}
   parseAbortablePrecleanFullGC0 and parseAbortablePrecleanFullGC1
-  must be always together.
+  are joined by MULTILINE_RULES.
 
 -XX:+UseParallelGC
-  parseParallelFullGC, parseParallelGC.
+  parseParallelFullGC, parseParallelGC, with or without the cause of JDK8.
 
 -XX:+UseSerialGC
-  parseSerialFullGC, parseSerialGC.
+  parseSerialFullGC, parseSerialGC, with or without the cause of JDK8.
   
 """
 parseJavaGcLog = orP([ \
@@ -660,8 +803,298 @@ parseJavaGcLog = orP([ \
     parseParallelGC, \
     parseSerialFullGC, \
     parseSerialGC, \
+    parseParNewHead, parseTenuringThreshold, parseTenuringAge, parseParNewTail, \
 ])
 
+# Literals one of which is in every line parseJavaGcLog parses.
+# Lines without any of them are rejected by gclog_prefilter.py.
+PREFILTER_LITERALS = ("[GC", "[Full GC", "CMS-", "[Times:", "Desired survivor", "- age ")
+
+# Events printed over many lines, joined by gclog_assemble.py.
+MULTILINE_RULES = [
+    {"start": "CMS-concurrent-abortable-preclean-fullgc0",
+     "end": "CMS-concurrent-abortable-preclean-fullgc1",
+     "type": "CMS-concurrent-abortable-preclean-fullgc",
+     "lookahead": 4, "timeout": None},
+    {"start": "ParNew-head",
+     "end": "ParNew-tail",
+     "parts": {"ParNew-tenuring": None,
+               "ParNew-age": ("ages", ["age", "bytes"])},
+     "type": "ParNew",
+     "lookahead": 4, "timeout": None},
+]
+
+
+################################################################################
+# Cycles.
+################################################################################
+
+# Events of a concurrent cycle: type -> (field of its time, 'conc' | 'pause' | None).
+CYCLE_PHASES = {
+    "CMS-initial-mark": ("initial_mark_secs", 'pause'),
+    "CMS-concurrent-mark-start": (None, None),
+    "CMS-concurrent-mark": ("mark_secs", 'conc'),
+    "CMS-concurrent-preclean-start": (None, None),
+    "CMS-concurrent-preclean": ("preclean_secs", 'conc'),
+    "CMS-concurrent-abortable-preclean-start": (None, None),
+    "CMS-concurrent-abortable-preclean": ("abortable_preclean_secs", 'conc'),
+    "CMS-concurrent-abortable-preclean-failure-time": ("abortable_preclean_secs", 'conc'),
+    "CMS-remark": ("remark_secs", 'pause'),
+    "CMS-concurrent-sweep-start": (None, None),
+    "CMS-concurrent-sweep": ("sweep_secs", 'conc'),
+    "CMS-concurrent-reset-start": (None, None),
+    "CMS-concurrent-reset": ("reset_secs", 'conc'),
+}
+
+# Events which end a cycle by a stop-the-world collection.
+# The fullgc1 is an orphan of MULTILINE_RULES.
+CYCLE_FAILURES = frozenset(["CMS-concurrent-abortable-preclean-fullgc",
+                            "CMS-concurrent-abortable-preclean-fullgc1",
+                            "FullGC"])
+
+# ParNew events kept before an incident.
+DEFAULT_PARNEWS = 8
+
+# Fields of a ParNew event kept in an incident.
+PARNEW_FIELDS = ["utc", "timestamp", "response", "heap_new", "heap_all"]
+
+"""
+A new cycle started by an event.
+
+data :: Dictionary # CMS-initial-mark, or any phase of a log cut in a cycle.
+return :: Dictionary
+
+"""
+def newCycle(data):
+    cycle = {"type": "CMS Cycle", "timestamp": data.get("timestamp"),
+             "conc_secs": 0.0, "pause_secs": 0.0, "parnews": 0, "phase": None}
+    if "utc" in data:
+        cycle["utc"] = data["utc"]
+    return cycle
+
+"""
+Add a phase to its cycle.
+
+cycle :: Dictionary # of newCycle.
+data :: Dictionary
+
+"""
+def addToCycle(cycle, data):
+    (key, kind) = CYCLE_PHASES[data["type"]]
+    cycle["phase"] = data["type"]
+    if "timestamp" in data:
+        cycle["end_timestamp"] = data["timestamp"] + data.get("response", 0.0)
+    if key is not None and "response" in data:
+        cycle[key] = cycle.get(key, 0.0) + data["response"]
+        cycle[kind + "_secs"] += data["response"]
+
+"""
+End a cycle.
+
+cycle :: Dictionary
+outcome :: String # "completed", "aborted" or "concurrent-mode-failure".
+data :: Dictionary | None # the event which ends it, if not of the cycle.
+return :: Dictionary # the cycle.
+
+"""
+def endCycle(cycle, outcome, data=None):
+    if data is not None and "timestamp" in data:
+        cycle["end_timestamp"] = data["timestamp"] + data.get("response", 0.0)
+    if cycle["timestamp"] is not None and "end_timestamp" in cycle:
+        cycle["duration_secs"] = cycle["end_timestamp"] - cycle["timestamp"]
+    cycle["outcome"] = outcome
+    return cycle
+
+"""
+An incident of a failure.
+
+data :: Dictionary # the failure.
+cycle :: Dictionary | None # open when it came.
+parnews :: deque Dictionary # ParNew events before it.
+return :: Dictionary
+
+"""
+def newIncident(data, cycle, parnews):
+    if data.get("promotion_failed", False):
+        kind = "promotion-failure"
+    else:
+        kind = "concurrent-mode-failure"
+    incident = {"type": "CMS Incident", "kind": kind,
+                "timestamp": data.get("timestamp"), "response": data.get("response"),
+                "parnew": list(parnews)}
+    for k in ["utc", "heap_1", "heap_2", "meta", "times"]:
+        if k in data:
+            incident[k] = data[k]
+    if cycle is not None:
+        incident["cycle_timestamp"] = cycle["timestamp"]
+        incident["cycle_phase"] = cycle["phase"]
+    return incident
+
+"""
+Reduce the phases of each CMS concurrent cycle to one cycle, lazily,
+and give an incident for each failure.
+
+A cycle starts at CMS-initial-mark and has the times of its phases
+(${phase}_secs, summed if a phase comes twice), conc_secs, pause_secs,
+duration_secs, the ParNew events during it (parnews), and an outcome:
+    completed                  it came to CMS-concurrent-reset.
+    concurrent-mode-failure    a (concurrent mode failure) ended it.
+    aborted                    anything else ended it: a new initial mark,
+                               a (concurrent mode interrupted) or another
+                               full gc, or the end of the log ("orphan").
+A failure is a (concurrent mode failure) or a ParNew (promotion failed).
+Its incident has the kind of the failure, the phase of the cycle it
+broke, and the last `parnews` ParNew events before it, which a ring
+buffer keeps.
+
+Only the open cycle and the ring buffer are held. Cycles are given at
+their ends; the other events (ParNew, full gcs, ...) are given as they
+are, when they come.
+
+events :: Iterable Dictionary # of iterGcLog.
+parnews :: Int
+return :: Generator Dictionary
+
+"""
+def iterCycles(events, parnews=DEFAULT_PARNEWS):
+    recent = deque(maxlen=parnews)
+    cycle = None
+    for data in events:
+        t = data["type"]
+        if t in CYCLE_PHASES:
+            if t == "CMS-initial-mark" or cycle is None:
+                if cycle is not None:
+                    yield endCycle(cycle, "aborted")
+                cycle = newCycle(data)
+            addToCycle(cycle, data)
+            if t == "CMS-concurrent-reset":
+                yield endCycle(cycle, "completed")
+                cycle = None
+            continue
+        if t == "ParNew":
+            recent.append(dict((k, data[k]) for k in PARNEW_FIELDS if k in data))
+            if cycle is not None:
+                cycle["parnews"] += 1
+        elif t in CYCLE_FAILURES:
+            failed = data.get("concurrent_mode") == "failure"
+            if failed or data.get("promotion_failed", False):
+                yield newIncident(data, cycle, recent)
+            if cycle is not None:
+                yield endCycle(cycle, "concurrent-mode-failure" if failed else "aborted", data)
+                cycle = None
+        yield data
+    if cycle is not None:
+        cycle["orphan"] = True
+        yield endCycle(cycle, "aborted")
+
+"""
+Incidents of the events of a log, lazily.
+
+events :: Iterable Dictionary # of iterGcLog.
+parnews :: Int
+return :: Generator Dictionary
+
+"""
+def iterIncidents(events, parnews=DEFAULT_PARNEWS):
+    for data in iterCycles(events, parnews):
+        if data["type"] == "CMS Incident":
+            yield data
+
+
+################################################################################
+# Tenuring.
+################################################################################
+
+# Largest age of -XX:MaxTenuringThreshold.
+MAX_TENURING_AGE = 15
+
+# Fields of a ParNew kept in the tenuring blocks.
+TENURING_FIELDS = ["timestamp", "tenuring_threshold", "tenuring_max", "survivor_desired", "ages"]
+
+"""
+Tenuring blocks of the ParNew events with an age table, one row per
+ParNew, as numpy arrays (see gclog_columns.py).
+    timestamp, tenuring_threshold, tenuring_max, survivor_desired
+                     (n,) of each ParNew.
+    ages             (n, MAX_TENURING_AGE + 1) bytes of each age in the
+                     survivor space after the ParNew, 0 for the ages not
+                     printed. Column 0 is unused.
+    survival         (n, MAX_TENURING_AGE + 1) bytes of age a + 1 after
+                     the next ParNew / bytes of age a after this one,
+                     NaN where there is nothing to survive, the age is
+                     promoted, or on the last row.
+    promoted_bytes   (n,) bytes of the ages of the threshold and above,
+                     which the next ParNew promotes.
+    premature_bytes  (n,) the part of them younger than tenuring_max,
+                     promoted early because the threshold was lowered.
+numpy is imported here, as the parsing of JDK8 logs does not need it.
+
+events :: Iterable Dictionary
+return :: {String: numpy.ndarray}
+
+"""
+def tenuringBlocks(events):
+    import numpy as np
+    import gclog_columns
+
+    rows = (data for data in events
+            if data["type"] == "ParNew" and "tenuring_threshold" in data)
+    cols = gclog_columns.toColumns(rows, TENURING_FIELDS)
+    n = gclog_columns.columnLength(cols)
+    blocks = dict((f, cols.get(f, np.zeros(n))) for f in TENURING_FIELDS if f != "ages")
+    ages = np.zeros((n, MAX_TENURING_AGE + 1))
+    if "ages" in cols:
+        block = cols["ages"]
+        ages[:, :block.shape[1]] = np.nan_to_num(block)
+    blocks["ages"] = ages
+    age = np.arange(MAX_TENURING_AGE + 1)
+    threshold = blocks["tenuring_threshold"][:, None]
+    promoted = age >= threshold
+    blocks["promoted_bytes"] = (ages * promoted).sum(axis=1)
+    blocks["premature_bytes"] = (ages * (promoted & (age < blocks["tenuring_max"][:, None]))).sum(axis=1)
+    survival = np.empty_like(ages)
+    survival.fill(np.nan)
+    if n > 1:
+        before = ages[:-1, 1:-1]
+        after = ages[1:, 2:]
+        ok = (before > 0) & ~promoted[:-1, 1:-1]
+        survival[:-1, 1:-1][ok] = after[ok] / before[ok]
+    blocks["survival"] = survival
+    return blocks
+
+"""
+Premature promotion of the tenuring blocks of a log.
+    parnews              ParNews with an age table.
+    threshold_drops      of them with a threshold below tenuring_max.
+    min_threshold        lowest threshold, None without ParNews.
+    promoted_bytes       bytes promoted from the survivor space.
+    premature_bytes      of them younger than tenuring_max.
+    premature_share      premature_bytes / promoted_bytes, None if 0.
+    survival_by_age      mean survival of each age from 1 to
+                         MAX_TENURING_AGE - 1, None where not seen.
+
+blocks :: {String: numpy.ndarray} # of tenuringBlocks.
+return :: Dictionary
+
+"""
+def tenuringSummary(blocks):
+    import numpy as np
+
+    threshold = blocks["tenuring_threshold"]
+    promoted = float(blocks["promoted_bytes"].sum())
+    premature = float(blocks["premature_bytes"].sum())
+    survival = blocks["survival"][:, 1:-1]
+    seen = ~np.isnan(survival)
+    counts = seen.sum(axis=0)
+    sums = np.where(seen, survival, 0.0).sum(axis=0)
+    return {"parnews": len(threshold),
+            "threshold_drops": int((threshold < blocks["tenuring_max"]).sum()),
+            "min_threshold": int(threshold.min()) if len(threshold) else None,
+            "promoted_bytes": promoted,
+            "premature_bytes": premature,
+            "premature_share": premature / promoted if promoted > 0 else None,
+            "survival_by_age": [float(s / c) if c > 0 else None for (s, c) in zip(sums, counts)]}
+
 
 ################################################################################
 # Parser of list of integer. This is for test.
@@ -710,41 +1143,74 @@ if __debug__:
 ################################################################################
 # main
 ################################################################################
-    
-dirs = sys.argv[1]
-allfiles = os.listdir(dirs)
-files = []
-for f in allfiles:
-    if f.startswith('gclog') and f.endswith('log'):
-        files.append(f)
-
-for file in files:
-    print(file)
-    with open(dirs+file,'r') as fd:
-        data_prev = None
-        output = []
-        for line in fd.readlines():
+
+"""
+Parse lines of a gc log lazily.
+
+Events printed over many lines are joined by MULTILINE_RULES
+(gclog_assemble.py), e.g. a CMS-concurrent-abortable-preclean-fullgc0
+event and the CMS-concurrent-abortable-preclean-fullgc1 event following
+it into one CMS-concurrent-abortable-preclean-fullgc event.
+
+lines :: Iterable String
+unparsed :: ((String, ParseError) -> ANY) | None # called for lines failed to parse.
+parser :: Parser | None # parseJavaGcLog by default, or a wrapper of it
+                        # such as gclog_cache.mkShapeCache.
+return :: Generator Dictionary
+
+"""
+def iterGcLog(lines, unparsed=None, parser=None):
+    if parser is None:
+        parser = parseJavaGcLog
+
+    def parsed_():
+        for line in lines:
+            text = line.rstrip()
             try:
-                text = line.rstrip()
-                #print texts
-                (ret, data) = parseJavaGcLog(text, {})
-                #print(file)
-                if data["type"] == "CMS-concurrent-abortable-preclean-fullgc0":
-                    data_prev = data
-                    continue
-                if data["type"] == "CMS-concurrent-abortable-preclean-fullgc1":
-                    assert data_prev["type"] == "CMS-concurrent-abortable-preclean-fullgc0"
-                    data_prev.update(data)
-                    data = data_prev
-                    data_prev = None
-                    data["type"] = "CMS-concurrent-abortable-preclean-fullgc"
-                if __debug__:
-                    print ("len: %d" % len(ret))
-                # print json.dumps(data)
-                output.append(data)
+                (ret, data) = parser(text, {})
             except ParseError, msg:
-                #print msg
-                print ("###%s" % text)
+                if unparsed is not None:
+                    unparsed(text, msg)
+                continue
+            yield data
+
+    return gclog_assemble.assemble(parsed_(), MULTILINE_RULES)
+
+if __name__=='__main__':
+    import gclog_pipe
+    opts = dict((a[2:].split('=', 1) + [None])[:2] for a in sys.argv[1:] if a.startswith('--'))
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    if args and args[0] == 'tenuring':
+        import gclog_columns
+        blocks = tenuringBlocks(iterGcLog(sys.stdin))
+        gclog_columns.saveColumns(args[1], blocks)
+        print json.dumps(tenuringSummary(blocks))
+        exit(0)
+    parnews = int(opts.get('parnews') or DEFAULT_PARNEWS)
+    if 'incidents' in opts:
+        reduce = lambda events: iterIncidents(events, parnews)
+    elif 'cycles' in opts:
+        reduce = lambda events: iterCycles(events, parnews)
+    else:
+        reduce = None
+    if gclog_pipe.isPipe(sys.argv[1:]):
+        gclog_pipe.runPipe(sys.modules[__name__], sys.argv[1:], reduce)
+        exit(0)
+    dirs = args[0]
+    allfiles = os.listdir(dirs)
+    files = []
+    for f in allfiles:
+        if f.startswith('gclog') and f.endswith('log'):
+            files.append(f)
+
+    def print_unparsed(text, msg):
+        print ("###%s" % text)
+
+    for file in files:
+        print(file)
+        with open(dirs+file,'r') as fd:
+            output = iterGcLog(fd, print_unparsed)
+            output = list(reduce(output) if reduce is not None else output)
         with open(dirs+file+'_2','w') as fd:
             fd.write(json.dumps(output))
 
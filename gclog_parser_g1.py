@@ -4,6 +4,8 @@ import re
 import sys, os
 import json
 
+import gclog_assemble
+
 """
 This is a parser of G1 GC log of OpenJDk8.
 
@@ -57,6 +59,9 @@ def newP(regexStr, dataModifier):
         else:
             msg = "Parse failed: pattern \"%s\" for \"%s\"" % (regexStr, line)
             raise ParseError(msg)
+    # Kept for tools which look into the grammar (see gclog_cache.py).
+    parse_.regexStr = regexStr
+    parse_.dataModifier = dataModifier
     return parse_
 
 ################################################################################
@@ -113,6 +118,8 @@ def andP(parsers):
             text0 = text1
             data0 = data1
         return (text0, data0)
+    parseAnd_.combinator = 'and'
+    parseAnd_.parsers = parsers
     return parseAnd_
 
 """
@@ -133,6 +140,8 @@ def orP(parsers):
                 msgL.append(msg)
         msgs = toString(msgL)
         raise ParseError(msgs)
+    parseOr_.combinator = 'or'
+    parseOr_.parsers = parsers
     return parseOr_
 
 """
@@ -193,6 +202,8 @@ def mkTagger(key, value):
     def tagger_(line, dictData):
         dictData[key] = value
         return (line, dictData)
+    tagger_.tagKey = key
+    tagger_.tagValue = value
     return tagger_
 
 
@@ -208,6 +219,32 @@ def get_int3(match_strL):
     assert len(match_strL) == 3
     return [int(match_strL[0]), int(match_strL[1]), int(match_strL[2])]
 
+# match_strL :: [String] # length must be 3.
+# return :: [Float] # length is 3.
+def get_float3(match_strL):
+    assert len(match_strL) == 3
+    return [float(match_strL[0]), float(match_strL[1]), float(match_strL[2])]
+
+# Scale of units of sizes to MB.
+SIZE_UNITS_MB = {"B": 1.0 / 1024 / 1024, "K": 1.0 / 1024, "M": 1.0, "G": 1024.0}
+
+# size :: String # e.g. 3072.0K
+# return :: Float # MB
+def size_mb(size):
+    return float(size[:-1]) * SIZE_UNITS_MB[size[-1]]
+
+# match_strL :: [String] # before(capacity)->after(capacity), length must be 4.
+# return :: [Float] # [before, after, capacity after] in MB.
+def get_mb_triple(match_strL):
+    assert len(match_strL) == 4
+    return [size_mb(match_strL[0]), size_mb(match_strL[2]), size_mb(match_strL[3])]
+
+# match_strL :: [String] # before->after, length must be 2.
+# return :: [Float] # [before, after] in MB.
+def get_mb_pair(match_strL):
+    assert len(match_strL) == 2
+    return [size_mb(match_strL[0]), size_mb(match_strL[1])]
+
 # match_strL :: [String]
 # return :: True
 def get_true(match_strL):
@@ -223,12 +260,16 @@ def get_string(match_strL):
 # Regexp aliases.
 ################################################################################
 
-regexp_timestamp = r"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d+\.\d+\+\d{4}:\s+"
+regexp_timestamp = r"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d+\.\d+[+-]\d{4}:\s+"
 regexp_float = r"(\d+\.\d+)"
 regexp_time_float_colon = regexp_timestamp + regexp_float + r":\s+"
+regexp_date = r"(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d+\.\d+[+-]\d{4}):\s+"
 regexp_heap_info = regexp_float + r"\s\(" + regexp_float + r"\s\)->" + \
                    regexp_float + r"\s\(" + regexp_float + r"\s\)\s*"
 regexp_float_secs = regexp_float + r"\s*secs\s*"
+regexp_number = r"(\d+(?:\.\d+)?)"
+regexp_size = r"(\d+(?:\.\d+)?[BKMG])"
+regexp_phase_name = r"([A-Za-z][A-Za-z ]*?)"
 regexp_basic_string = r"([0-9a-zA-Z_-]+)"
 
 
@@ -236,9 +277,19 @@ regexp_basic_string = r"([0-9a-zA-Z_-]+)"
 # Parsers for gc log entries.
 ################################################################################
 
+"""
+Date and uptime stamps at the head of an event.
+e.g. 2019-12-05T04:17:14.531+0800: 5.388:
+
+"""
+parseTimestamp = andP([ \
+        newP(regexp_date, mkDictModifier("utc", get_string)), \
+        newP(regexp_float + r":\s+", mkDictModifier("timestamp", get_float)), \
+    ])
+
 parseG1PauseYoung = andP([ \
         mkTagger("type", "G1 Pause Young"), \
-        newP(regexp_time_float_colon, mkDictModifier("timestamp", get_float)), \
+        parseTimestamp, \
         #newP(r"\[GC\s+\(G1\sEva\s+Pause\)\s\(young\)\s*", None), \
         newP(r"\[GC.+\(G1\sEvacuation\sPause\)\s\(young\)", None), \
         newP(r",\s*", None), \
@@ -253,7 +304,7 @@ if __debug__:
 
 parseG1PauseMixed = andP([ \
         mkTagger("type", "G1 Pause Mixed"), \
-        newP(regexp_time_float_colon, mkDictModifier("timestamp", get_float)), \
+        parseTimestamp, \
         newP(r"\[GC.+\(G1\sEvacuation\sPause\)\s\(mixed\)", None), \
         newP(r",\s*", None), \
         newP(regexp_float_secs + r"\]$", mkDictModifier("response", get_float)), \
@@ -267,7 +318,7 @@ if __debug__:
 
 parseG1ConcRootScan = andP([ \
         mkTagger("type", "G1 Conc Root Scan"), \
-        newP(regexp_time_float_colon, mkDictModifier("timestamp", get_float)), \
+        parseTimestamp, \
         newP(r"\[GC\sconcurrent-root-region-scan-end", None), \
         newP(r",\s*", None), \
         newP(regexp_float_secs + r"\]$", mkDictModifier("response", get_float)), \
@@ -281,7 +332,7 @@ if __debug__:
 
 parseG1ConcMark = andP([ \
         mkTagger("type", "G1 Conc Mark"), \
-        newP(regexp_time_float_colon, mkDictModifier("timestamp", get_float)), \
+        parseTimestamp, \
         newP(r"\[GC\sconcurrent-mark-end", None), \
         newP(r",\s*", None), \
         newP(regexp_float_secs + r"\]$", mkDictModifier("response", get_float)), \
@@ -295,7 +346,7 @@ if __debug__:
 
 parseG1PauseRemark = andP([ \
         mkTagger("type", "G1 Pause Remark"), \
-        newP(regexp_time_float_colon, mkDictModifier("timestamp", get_float)), \
+        parseTimestamp, \
         newP(r"\[GC\sremark.+\],\s", None), \
         newP(regexp_float_secs + r"\]$", mkDictModifier("response", get_float)), \
     ])
@@ -308,7 +359,7 @@ if __debug__:
 
 parseG1PauseCleanup = andP([ \
         mkTagger("type", "G1 Pause Cleanup"), \
-        newP(regexp_time_float_colon, mkDictModifier("timestamp", get_float)), \
+        parseTimestamp, \
         newP(r"\[GC\scleanup.+,\s", None), \
         newP(regexp_float_secs + r"\]$", mkDictModifier("response", get_float)), \
     ])
@@ -321,7 +372,7 @@ if __debug__:
 
 parseG1ConcCleanup = andP([ \
         mkTagger("type", "G1 Conc Cleanup"), \
-        newP(regexp_time_float_colon, mkDictModifier("timestamp", get_float)), \
+        parseTimestamp, \
         newP(r"\[GC\sconcurrent-cleanup-end,\s", None), \
         newP(regexp_float_secs + r"\]$", mkDictModifier("response", get_float)), \
     ])
@@ -333,11 +384,135 @@ if __debug__:
     print data
 
 
+"""
+Lines of the detail block which -XX:+PrintGCDetails prints after a pause.
+
+2020-06-10T11:40:25.683+0800: 3.062: [GC pause (G1 Evacuation Pause) (young), 0.0038546 secs]
+   [Parallel Time: 2.9 ms, GC Workers: 8]
+      [GC Worker Start (ms): Min: 3062.4, Avg: 3062.5, Max: 3062.6, Diff: 0.2]
+      [Ext Root Scanning (ms): Min: 0.3, Avg: 0.5, Max: 1.3, Diff: 1.0, Sum: 4.1]
+      ...
+      [Termination Attempts: Min: 1, Avg: 1.0, Max: 1, Diff: 0, Sum: 8]
+      ...
+   [Code Root Fixup: 0.0 ms]
+   [Other: 0.8 ms]
+      [Choose CSet: 0.0 ms]
+      ...
+   [Eden: 24.0M(24.0M)->0.0B(13.0M) Survivors: 0.0B->3072.0K Heap: 24.0M(256.0M)->3464.0K(256.0M)]
+ [Times: user=0.02 sys=0.01, real=0.00 secs]
+
+Each line is parsed alone, and the lines are joined to the pause by
+MULTILINE_RULES (gclog_assemble.py). The fields of a phase are named
+after it, e.g. Object Copy gives object_copy_{min,avg,max,diff,sum}_ms
+and Termination Attempts gives termination_attempts_{min,...,sum}.
+
+"""
+parseG1ParallelTime = andP([ \
+        mkTagger("type", "G1 Parallel Time"), \
+        newP(r"\s+\[Parallel\sTime:\s+" + regexp_float + r"\s+ms,\s+", mkDictModifier("parallel_ms", get_float)), \
+        newP(r"GC\sWorkers:\s+(\d+)\]$", mkDictModifier("gc_workers", lambda strL: int(strL[0]))), \
+    ])
+if __debug__:
+    text = r"   [Parallel Time: 2.9 ms, GC Workers: 8]"
+    (ret, data) = parseG1ParallelTime(text, {})
+    print text
+    print len(ret)
+    print data
+
+# Names of the statistics of a worker phase.
+PHASE_STATS = ["min", "avg", "max", "diff", "sum"]
+
+"""
+A modifier for the statistics of a worker phase.
+
+return :: (Dictionary, [String]) -> Dictionary
+          # [name, " (ms)" | None, min, avg, max, diff, sum | None]
+
+"""
+def mkPhaseModifier():
+    def modifyPhase_(dictData, matchStringL):
+        prefix = matchStringL[0].strip().lower().replace(" ", "_") + "_"
+        suffix = "_ms" if matchStringL[1] is not None else ""
+        for (stat, value) in zip(PHASE_STATS, matchStringL[2:]):
+            if value is not None:
+                dictData[prefix + stat + suffix] = float(value)
+        return dictData
+    return modifyPhase_
+
+parseG1WorkerPhase = andP([ \
+        mkTagger("type", "G1 Worker Phase"), \
+        newP(r"\s+\[" + regexp_phase_name + r"(\s\(ms\))?:\s+" + \
+             r"Min:\s+" + regexp_number + r",\s+Avg:\s+" + regexp_number + \
+             r",\s+Max:\s+" + regexp_number + r",\s+Diff:\s+" + regexp_number + \
+             r"(?:,\s+Sum:\s+" + regexp_number + r")?\]$", mkPhaseModifier()), \
+    ])
+if __debug__:
+    text = r"      [Object Copy (ms): Min: 1.2, Avg: 1.9, Max: 2.2, Diff: 1.0, Sum: 15.5]"
+    (ret, data) = parseG1WorkerPhase(text, {})
+    print text
+    print len(ret)
+    print data
+    text = r"      [GC Worker Start (ms): Min: 3062.4, Avg: 3062.5, Max: 3062.6, Diff: 0.2]"
+    (ret, data) = parseG1WorkerPhase(text, {})
+    print text
+    print len(ret)
+    print data
+    text = r"         [Termination Attempts: Min: 1, Avg: 1.0, Max: 1, Diff: 0, Sum: 8]"
+    (ret, data) = parseG1WorkerPhase(text, {})
+    print text
+    print len(ret)
+    print data
+
+"""
+A modifier for the time of a serial phase, e.g. Clear CT gives clear_ct_ms.
+
+return :: (Dictionary, [String]) -> Dictionary # [name, ms]
+
+"""
+def mkPhaseTimeModifier():
+    def modifyPhaseTime_(dictData, matchStringL):
+        key = matchStringL[0].strip().lower().replace(" ", "_") + "_ms"
+        dictData[key] = float(matchStringL[1])
+        return dictData
+    return modifyPhaseTime_
+
+parseG1PhaseTime = andP([ \
+        mkTagger("type", "G1 Phase Time"), \
+        newP(r"\s+\[" + regexp_phase_name + r":\s+" + regexp_float + r"\s+ms\]$", mkPhaseTimeModifier()), \
+    ])
+if __debug__:
+    text = r"      [Ref Proc: 0.5 ms]"
+    (ret, data) = parseG1PhaseTime(text, {})
+    print text
+    print len(ret)
+    print data
+
 parseHeap = andP([ \
-        newP(r"\[Eden:\s+" + regexp_heap_info, mkDictModifier("Eden", get_string)), \
-        newP(r"Survivors:\s+" + regexp_heap_info, mkDictModifier("Survivors", get_string)), \
-        newP(r"Heap:\s+" + regexp_heap_info + r"\]\s*", mkDictModifier("Heap", get_string)), \
+        mkTagger("type", "G1 Heap"), \
+        newP(r"\s+\[Eden:\s+" + regexp_size + r"\(" + regexp_size + r"\)->" + \
+             regexp_size + r"\(" + regexp_size + r"\)\s+", mkDictModifier("eden_mb", get_mb_triple)), \
+        newP(r"Survivors:\s+" + regexp_size + r"->" + regexp_size + r"\s+", mkDictModifier("survivors_mb", get_mb_pair)), \
+        newP(r"Heap:\s+" + regexp_size + r"\(" + regexp_size + r"\)->" + \
+             regexp_size + r"\(" + regexp_size + r"\)\]$", mkDictModifier("heap_mb", get_mb_triple)), \
     ])
+if __debug__:
+    text = r"   [Eden: 24.0M(24.0M)->0.0B(13.0M) Survivors: 0.0B->3072.0K Heap: 24.0M(256.0M)->3464.0K(256.0M)]"
+    (ret, data) = parseHeap(text, {})
+    print text
+    print len(ret)
+    print data
+
+parseG1Times = andP([ \
+        mkTagger("type", "G1 Times"), \
+        newP(r"\s*\[Times:\s+user=" + regexp_float + r"\s+sys=" + regexp_float + \
+             r",\s+real=" + regexp_float + r"\s+secs\]\s*$", mkDictModifier("times", get_float3)), \
+    ])
+if __debug__:
+    text = r" [Times: user=0.02 sys=0.01, real=0.00 secs]"
+    (ret, data) = parseG1Times(text, {})
+    print text
+    print len(ret)
+    print data
 
 """
 Java GC Log parser.
@@ -348,6 +523,10 @@ This supports almost kinds of GC provided by JVM.
 parse pause {young, mixed, remark, cleanup}
 parse concurrent {root-scan, mark, cleanup}
 
+-XX:+PrintGCDetails
+parse {ParallelTime, WorkerPhase, PhaseTime, Heap, Times}
+  joined to the pause before them by MULTILINE_RULES.
+
 """
 parseJavaGcLog = orP([ \
         parseG1PauseYoung, \
@@ -357,8 +536,30 @@ parseJavaGcLog = orP([ \
         parseG1PauseRemark, \
         parseG1PauseCleanup, \
         parseG1ConcCleanup, \
+        parseG1ParallelTime, \
+        parseG1WorkerPhase, \
+        parseG1PhaseTime, \
+        parseHeap, \
+        parseG1Times, \
     ])
 
+# Literals one of which is in every line parseJavaGcLog parses.
+# Lines without any of them are rejected by gclog_prefilter.py.
+PREFILTER_LITERALS = ("[GC", "[Parallel Time:", "Min:", " ms]", "[Eden:", "[Times:")
+
+# Lines of the detail block of a pause.
+DETAIL_PARTS = {"G1 Parallel Time": None, "G1 Worker Phase": None,
+                "G1 Phase Time": None, "G1 Heap": None}
+
+# Events printed over many lines, joined by gclog_assemble.py.
+# The detail block of a pause ends with its [Times: ...] line.
+# Detail lines without a pause (e.g. of a Full GC) are dropped.
+MULTILINE_RULES = [
+    {"start": t, "end": "G1 Times", "parts": DETAIL_PARTS, "type": t,
+     "lookahead": 8, "timeout": None, "orphans": 'drop'}
+    for t in ["G1 Pause Young", "G1 Pause Mixed", "G1 Pause Remark", "G1 Pause Cleanup"]
+]
+
 
 ################################################################################
 # Parser of list of integer. This is for test.
@@ -410,32 +611,56 @@ if __debug__:
 ################################################################################
 # main
 ################################################################################
-    
-dirs = sys.argv[1]
-allfiles = os.listdir(dirs)
-files = []
-for f in allfiles:
-    if f.startswith('gclog') and f.endswith('log'):
-        files.append(f)
-
-for file in files:
-    print(file)
-    with open(dirs+file,'r') as fd:
-        data_prev = None
-        output = []
-        for line in fd.readlines():
+
+"""
+Parse lines of a gc log lazily.
+
+The detail block of a pause is joined to it by MULTILINE_RULES
+(gclog_assemble.py).
+
+lines :: Iterable String
+unparsed :: ((String, ParseError) -> ANY) | None # called for lines failed to parse.
+parser :: Parser | None # parseJavaGcLog by default, or a wrapper of it
+                        # such as gclog_cache.mkShapeCache.
+return :: Generator Dictionary
+
+"""
+def iterGcLog(lines, unparsed=None, parser=None):
+    if parser is None:
+        parser = parseJavaGcLog
+
+    def parsed_():
+        for line in lines:
+            text = line.rstrip()
             try:
-                text = line.rstrip()
-                #print texts
-                (ret, data) = parseJavaGcLog(text, {})
-                print(file)
-                if __debug__:
-                    print ("len: %d" % len(ret))
-                # print json.dumps(data)
-                output.append(data)
+                (ret, data) = parser(text, {})
             except ParseError, msg:
-                print msg
-                #print ("###%s" % text)
+                if unparsed is not None:
+                    unparsed(text, msg)
+                continue
+            yield data
+
+    return gclog_assemble.assemble(parsed_(), MULTILINE_RULES)
+
+if __name__=='__main__':
+    import gclog_pipe
+    if gclog_pipe.isPipe(sys.argv[1:]):
+        gclog_pipe.runPipe(sys.modules[__name__], sys.argv[1:])
+        exit(0)
+    dirs = sys.argv[1]
+    allfiles = os.listdir(dirs)
+    files = []
+    for f in allfiles:
+        if f.startswith('gclog') and f.endswith('log'):
+            files.append(f)
+
+    def print_unparsed(text, msg):
+        print msg
+
+    for file in files:
+        print(file)
+        with open(dirs+file,'r') as fd:
+            output = list(iterGcLog(fd, print_unparsed))
         with open(dirs+file+'_2','w') as fd:
             fd.write(json.dumps(output))
 
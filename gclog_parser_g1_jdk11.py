@@ -5,6 +5,9 @@
 import re
 import sys, os
 import json
+import gclog_chunk
+import gclog_unified
+import gclog_assemble
 
 """
 This is a parser of G1 log of OpenJDk11.
@@ -14,9 +17,21 @@ Required JVM option:
     -Xlog:gc*:file=gc.log:time,uptime,tid,level
 
 Usage:
-    python2 -O this.py gclog_dir
+    python2 -O this.py < ${GC_LOG_FILE} | ${YOUR_ANALYZER}
+    # One JSON object per event, flushed every --batch=N events or
+    # --latency=SECS seconds (see gclog_pipe.py).
+    python2 -O this.py gclog_dir [line|chunk|numpy]
     # If there are gc1.log and gc2.log in gclog_dir,
     # it will save the results in files gc1.json and gc2.json respectively.
+    # The second argument selects the backend (default: line).
+    # chunk scans 16MB buffers with fused patterns (see gclog_chunk.py).
+    # numpy also decodes the headers of all lines at once (see gclog_unified.py).
+    # --levels=info,debug and --tags=gc,gc+phases select the lines given to
+    # the grammar by their decorators (see gclog_unified.py).
+    # --layout=utctime,uptimemillis,pid,tid,level gives the decorators of -Xlog
+    # (default: time,uptime,tid,level,tags), and --layout=auto detects them.
+    # With -Xlog:gc+phases=debug add --levels=info,debug to join the worker
+    # phases to the pauses too (see parseG1Phase).
 
 You can get all data as a python dictionary structure
 in your analyer as follows:
@@ -62,6 +77,9 @@ def newP(regexStr, dataModifier):
         else:
             msg = "Parse failed: pattern \"%s\" for \"%s\"" % (regexStr, line)
             raise ParseError(msg)
+    # Kept for compilers of the grammar (see gclog_chunk.py).
+    parse_.regexStr = regexStr
+    parse_.dataModifier = dataModifier
     return parse_
 
 ################################################################################
@@ -118,6 +136,8 @@ def andP(parsers):
             text0 = text1
             data0 = data1
         return (text0, data0)
+    parseAnd_.combinator = 'and'
+    parseAnd_.parsers = parsers
     return parseAnd_
 
 """
@@ -138,6 +158,8 @@ def orP(parsers):
                 msgL.append(msg)
         msgs = toString(msgL)
         raise ParseError(msgs)
+    parseOr_.combinator = 'or'
+    parseOr_.parsers = parsers
     return parseOr_
 
 """
@@ -163,6 +185,36 @@ def manyP(parser):
         return (text1, data1)
     return parseMany_
 
+"""
+Parser combinator DISPATCH.
+
+Alternatives are grouped by a keyword of the text, and a text is tried
+only by the alternatives of its keyword, in order, so that alternatives
+of other keywords cost nothing. The alternatives of the keyword None
+are tried when a text has no group.
+.parsers has the alternatives of the keywords first and those of None
+last, and the result is the same as orP of them as long as no two
+alternatives parse one text (gclog_chunk.py and gclog_cache.py try
+them in that order).
+
+keyword :: String -> String | None
+table :: [(String | None, Parser)]
+return :: Parser
+
+"""
+def dispatchP(keyword, table):
+    groups = {}
+    for (key, parser) in table:
+        groups.setdefault(key, []).append(parser)
+    default = orP(groups.pop(None, []))
+    groups = dict((key, orP(parsers)) for (key, parsers) in groups.iteritems())
+    def parseDispatch_(text, data):
+        return groups.get(keyword(text), default)(text, data)
+    parseDispatch_.combinator = 'dispatch'
+    parseDispatch_.parsers = [p for (key, p) in table if key is not None] + \
+                             [p for (key, p) in table if key is None]
+    return parseDispatch_
+
 
 ################################################################################
 # Utilities.
@@ -198,6 +250,8 @@ def mkTagger(key, value):
     def tagger_(line, dictData):
         dictData[key] = value
         return (line, dictData)
+    tagger_.tagKey = key
+    tagger_.tagValue = value
     return tagger_
 
 
@@ -229,29 +283,79 @@ def get_true(match_strL):
 def get_string(match_strL):
     return match_strL[0]
 
+# Causes of gc are a few strings repeated in every event,
+# so they are interned to share one object per category.
+# match_strL :: [String] # length must be 1.
+# return :: String
+def get_intern(match_strL):
+    assert len(match_strL) == 1
+    return intern(match_strL[0])
+
 
 ################################################################################
 # Regexp aliases.
 ################################################################################
 
-regexp_timestamp = r"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d+\.\d+\+\d{4}"
+regexp_timestamp = r"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d+\.\d+[+-]\d{4}"
 regexp_float = r"(\d+\.\d+)"
 regexp_heap_info = regexp_float + r"\s\(" + regexp_float + r"\s\)->" + \
                    regexp_float + r"\s\(" + regexp_float + r"\s\)\s*"
+regexp_heap_mb = r"(\d+)M->(\d+)M\((\d+)M\)"
+# (G1 Evacuation Pause), (System.gc())
+regexp_cause = r"\(((?:[^()]|\(\))+)\)"
 regexp_float_secs = regexp_float + r"\s*secs\s*"
 regexp_basic_string = r"([0-9a-zA-Z_-]+)"
+# Pre Evacuate Collection Set, Ext Root Scanning, Merge Per-Thread State
+regexp_phase_name = r"([A-Za-z][\w/-]*(?:\s[\w/-]+)*)"
+regexp_number = r"(\d+(?:\.\d+)?)"
 
 
 ################################################################################
 # Parsers for gc log entries.
 ################################################################################
 
+"""
+Decorators at the head of every line.
+e.g. [2021-09-10T15:23:34.217+0800][123.534s][76035][info]
+     [2021-09-10T15:23:34.217+0800][123.534s][76035][info][gc,marking  ]
+
+This is shared by all the events. Its steps are compiled from the
+decorators of -Xlog by setLayout, and replaced in place so that the
+events need not be rebuilt for another layout.
+Time goes to "utc" and uptime to "end_sec" (see gclog_unified.py).
+Any level is accepted here. Levels and tags are selected before the
+grammar in every backend (info and UNIFIED_TAGS by default, see iterGcLog).
+
+"""
+parseUnifiedHeader = andP([])
+
+"""
+Set the decorator layout of the logs to parse.
+
+spec :: String # decorators of -Xlog, e.g. "utctime,uptimemillis,pid,tid,level"
+
+"""
+def setLayout(spec):
+    steps = []
+    for (name, regexStr, modifier) in gclog_unified.layoutSteps(spec):
+        p = newP(regexStr, modifier)
+        p.decorator = name
+        steps.append(p)
+    parseUnifiedHeader.parsers[:] = steps
+
+setLayout(gclog_unified.DEFAULT_LAYOUT)
+
+# The gc id after the decorators, e.g. " GC(33) ".
+parseGcId = newP(r"\sGC\((\d+)\)\s", mkDictModifier("gc_id", get_int))
+
 parseG1PauseYoungNormal = andP([
         mkTagger("type", "G1 Pause Young Normal"),
-        newP(r"\[(" + regexp_timestamp + r")\]", mkDictModifier("utc", get_string)),
-        newP(r"\[" + regexp_float + r"s\]", mkDictModifier("end_sec", get_float)),
-        newP(r"\[\d+\]\[info\]\sGC\(\d+\)\s", None),
-        newP(r"Pause\sYoung\s\(Normal\).+M\)\s" + regexp_float + r"ms$", mkDictModifier("dur_ms", get_float)),
+        parseUnifiedHeader,
+        parseGcId,
+        newP(r"Pause\sYoung\s\(Normal\)\s", None),
+        newP(regexp_cause + r"\s", mkDictModifier("cause", get_intern)),
+        newP(regexp_heap_mb + r"\s", mkDictModifier("heap_mb", get_int3)),
+        newP(regexp_float + r"ms$", mkDictModifier("dur_ms", get_float)),
     ])
 if __debug__:
     text = r"[2021-09-10T15:23:34.217+0800][123.534s][76035][info] GC(33) Pause Young (Normal) (G1 Evacuation Pause) 4269M->3358M(16384M) 170.022ms"
@@ -260,12 +364,46 @@ if __debug__:
     print len(ret)
     print data
 
+parseG1PauseYoungMixed = andP([
+        mkTagger("type", "G1 Pause Young Mixed"),
+        parseUnifiedHeader,
+        parseGcId,
+        newP(r"Pause\sYoung\s\(Mixed\)\s", None),
+        newP(regexp_cause + r"\s", mkDictModifier("cause", get_intern)),
+        newP(regexp_heap_mb + r"\s", mkDictModifier("heap_mb", get_int3)),
+        newP(regexp_float + r"ms$", mkDictModifier("dur_ms", get_float)),
+    ])
+if __debug__:
+    text = r"[2023-02-14T16:40:11.873+0800][5521.094s][18221][info] GC(412) Pause Young (Mixed) (G1 Evacuation Pause) 9533M->6201M(16384M) 61.214ms"
+    (ret, data) = parseG1PauseYoungMixed(text, {})
+    print text
+    print len(ret)
+    print data
+
+parseG1PauseYoungPrepareMixed = andP([
+        mkTagger("type", "G1 Pause Young Prepare Mixed"),
+        parseUnifiedHeader,
+        parseGcId,
+        newP(r"Pause\sYoung\s\(Prepare\sMixed\)\s", None),
+        newP(regexp_cause + r"\s", mkDictModifier("cause", get_intern)),
+        newP(regexp_heap_mb + r"\s", mkDictModifier("heap_mb", get_int3)),
+        newP(regexp_float + r"ms$", mkDictModifier("dur_ms", get_float)),
+    ])
+if __debug__:
+    text = r"[2023-02-14T16:40:10.412+0800][5519.633s][18221][info] GC(411) Pause Young (Prepare Mixed) (G1 Evacuation Pause) 10912M->9530M(16384M) 48.770ms"
+    (ret, data) = parseG1PauseYoungPrepareMixed(text, {})
+    print text
+    print len(ret)
+    print data
+
 parseG1PauseYoungConcStart = andP([
         mkTagger("type", "G1 Pause Young Concurrent Start"),
-        newP(r"\[(" + regexp_timestamp + r")\]", mkDictModifier("utc", get_string)),
-        newP(r"\[" + regexp_float + r"s\]", mkDictModifier("end_sec", get_float)),
-        newP(r"\[\d+\]\[info\]\sGC\(\d+\)\s", None),
-        newP(r"Pause\sYoung\s\(Concurrent Start\).+M\)\s" + regexp_float + r"ms$", mkDictModifier("dur_ms", get_float)),
+        parseUnifiedHeader,
+        parseGcId,
+        newP(r"Pause\sYoung\s\(Concurrent Start\)\s", None),
+        newP(regexp_cause + r"\s", mkDictModifier("cause", get_intern)),
+        newP(regexp_heap_mb + r"\s", mkDictModifier("heap_mb", get_int3)),
+        newP(regexp_float + r"ms$", mkDictModifier("dur_ms", get_float)),
     ])
 if __debug__:
     text = r"[2021-09-13T09:52:04.024+0800][334.724s][43043][info] GC(126) Pause Young (Concurrent Start) (Metadata GC Threshold) 28810M->27895M(32768M) 406.544ms"
@@ -276,9 +414,8 @@ if __debug__:
 
 parseG1ConcClearClaimedMarks = andP([
         mkTagger("type", "G1 Concurrent Clear Claimed Marks"),
-        newP(r"\[(" + regexp_timestamp + r")\]", mkDictModifier("utc", get_string)),
-        newP(r"\[" + regexp_float + r"s\]", mkDictModifier("end_sec", get_float)),
-        newP(r"\[\d+\]\[info\]\sGC\(\d+\)\s", None),
+        parseUnifiedHeader,
+        parseGcId,
         newP(r"Concurrent\sClear\sClaimed\sMarks\s" + regexp_float + r"ms$", mkDictModifier("dur_ms", get_float)),
     ])
 if __debug__:
@@ -290,9 +427,8 @@ if __debug__:
 
 parseG1ConcScanRootRegions = andP([
         mkTagger("type", "G1 Concurrent Scan Root Regions"),
-        newP(r"\[(" + regexp_timestamp + r")\]", mkDictModifier("utc", get_string)),
-        newP(r"\[" + regexp_float + r"s\]", mkDictModifier("end_sec", get_float)),
-        newP(r"\[\d+\]\[info\]\sGC\(\d+\)\s", None),
+        parseUnifiedHeader,
+        parseGcId,
         newP(r"Concurrent\sScan\sRoot\sRegions\s" + regexp_float + r"ms$", mkDictModifier("dur_ms", get_float)),
     ])
 if __debug__:
@@ -304,9 +440,8 @@ if __debug__:
 
 parseG1ConcMarkFromRoots = andP([
         mkTagger("type", "G1 Concurrent Mark From Roots"),
-        newP(r"\[(" + regexp_timestamp + r")\]", mkDictModifier("utc", get_string)),
-        newP(r"\[" + regexp_float + r"s\]", mkDictModifier("end_sec", get_float)),
-        newP(r"\[\d+\]\[info\]\sGC\(\d+\)\s", None),
+        parseUnifiedHeader,
+        parseGcId,
         newP(r"Concurrent\sMark\sFrom\sRoots\s" + regexp_float + r"ms$", mkDictModifier("dur_ms", get_float)),
     ])
 if __debug__:
@@ -318,9 +453,8 @@ if __debug__:
     
 parseG1ConcPreclean = andP([
         mkTagger("type", "G1 Concurrent Preclean"),
-        newP(r"\[(" + regexp_timestamp + r")\]", mkDictModifier("utc", get_string)),
-        newP(r"\[" + regexp_float + r"s\]", mkDictModifier("end_sec", get_float)),
-        newP(r"\[\d+\]\[info\]\sGC\(\d+\)\s", None),
+        parseUnifiedHeader,
+        parseGcId,
         newP(r"Concurrent\sPreclean\s" + regexp_float + r"ms$", mkDictModifier("dur_ms", get_float)),
     ])
 if __debug__:
@@ -332,9 +466,8 @@ if __debug__:
 
 parseG1ConcMark = andP([
         mkTagger("type", "G1 Concurrent Mark"),
-        newP(r"\[(" + regexp_timestamp + r")\]", mkDictModifier("utc", get_string)),
-        newP(r"\[" + regexp_float + r"s\]", mkDictModifier("end_sec", get_float)),
-        newP(r"\[\d+\]\[info\]\sGC\(\d+\)\s", None),
+        parseUnifiedHeader,
+        parseGcId,
         newP(r"Concurrent\sMark\s\(.+\)\s" + regexp_float + r"ms$", mkDictModifier("dur_ms", get_float)),
     ])
 if __debug__:
@@ -346,10 +479,11 @@ if __debug__:
 
 parseG1PauseRemark = andP([
         mkTagger("type", "G1 Pause Remark"),
-        newP(r"\[(" + regexp_timestamp + r")\]", mkDictModifier("utc", get_string)),
-        newP(r"\[" + regexp_float + r"s\]", mkDictModifier("end_sec", get_float)),
-        newP(r"\[\d+\]\[info\]\sGC\(\d+\)\s", None),
-        newP(r"Pause\sRemark.+\)\s" + regexp_float + r"ms$", mkDictModifier("dur_ms", get_float)),
+        parseUnifiedHeader,
+        parseGcId,
+        newP(r"Pause\sRemark\s", None),
+        newP(regexp_heap_mb + r"\s", mkDictModifier("heap_mb", get_int3)),
+        newP(regexp_float + r"ms$", mkDictModifier("dur_ms", get_float)),
     ])
 if __debug__:
     text = r"[2021-09-13T09:52:04.382+0800][335.083s][43039][info] GC(127) Pause Remark 28680M->28632M(32768M) 236.947ms"
@@ -360,9 +494,8 @@ if __debug__:
 
 parseG1ConcRebuildRemSets = andP([
         mkTagger("type", "G1 Concurrent Rebuild Remembered Sets"),
-        newP(r"\[(" + regexp_timestamp + r")\]", mkDictModifier("utc", get_string)),
-        newP(r"\[" + regexp_float + r"s\]", mkDictModifier("end_sec", get_float)),
-        newP(r"\[\d+\]\[info\]\sGC\(\d+\)\s", None),
+        parseUnifiedHeader,
+        parseGcId,
         newP(r"Concurrent\sRebuild\sRemembered\sSets\s" + regexp_float + r"ms$", mkDictModifier("dur_ms", get_float)),
     ])
 if __debug__:
@@ -374,10 +507,11 @@ if __debug__:
 
 parseG1PauseCleanup = andP([
         mkTagger("type", "G1 Pause Cleanup"),
-        newP(r"\[(" + regexp_timestamp + r")\]", mkDictModifier("utc", get_string)),
-        newP(r"\[" + regexp_float + r"s\]", mkDictModifier("end_sec", get_float)),
-        newP(r"\[\d+\]\[info\]\sGC\(\d+\)\s", None),
-        newP(r"Pause\sCleanup\s.+\)\s" + regexp_float + r"ms$", mkDictModifier("dur_ms", get_float)),
+        parseUnifiedHeader,
+        parseGcId,
+        newP(r"Pause\sCleanup\s", None),
+        newP(regexp_heap_mb + r"\s", mkDictModifier("heap_mb", get_int3)),
+        newP(regexp_float + r"ms$", mkDictModifier("dur_ms", get_float)),
     ])
 if __debug__:
     text = r"[2021-09-13T09:52:04.382+0800][335.083s][43039][info] GC(1) Pause Cleanup 29333M->29333M(32768M) 123.489ms"
@@ -388,9 +522,8 @@ if __debug__:
 
 parseG1ConcCleanupForNextMark = andP([
         mkTagger("type", "G1 Concurrent Cleanup"),
-        newP(r"\[(" + regexp_timestamp + r")\]", mkDictModifier("utc", get_string)),
-        newP(r"\[" + regexp_float + r"s\]", mkDictModifier("end_sec", get_float)),
-        newP(r"\[\d+\]\[info\]\sGC\(\d+\)\s", None),
+        parseUnifiedHeader,
+        parseGcId,
         newP(r"Concurrent\sCleanup\sfor\sNext\sMark\s" + regexp_float + r"ms$", mkDictModifier("dur_ms", get_float)),
     ])
 if __debug__:
@@ -402,9 +535,8 @@ if __debug__:
 
 parseG1ConcCycle = andP([
         mkTagger("type", "G1 Concurrent Cycle"),
-        newP(r"\[(" + regexp_timestamp + r")\]", mkDictModifier("utc", get_string)),
-        newP(r"\[" + regexp_float + r"s\]", mkDictModifier("end_sec", get_float)),
-        newP(r"\[\d+\]\[info\]\sGC\(\d+\)\s", None),
+        parseUnifiedHeader,
+        parseGcId,
         newP(r"Concurrent\sCycle\s" + regexp_float + r"ms$", mkDictModifier("dur_ms", get_float)),
     ])
 if __debug__:
@@ -414,12 +546,53 @@ if __debug__:
     print len(ret)
     print data
 
+parseG1ConcMarkCycle = andP([
+        mkTagger("type", "G1 Concurrent Cycle"),
+        parseUnifiedHeader,
+        parseGcId,
+        newP(r"Concurrent\sMark\sCycle\s" + regexp_float + r"ms$", mkDictModifier("dur_ms", get_float)),
+    ])
+if __debug__:
+    text = r"[2023-02-14T16:39:58.310+0800][5507.531s][18224][info] GC(409) Concurrent Mark Cycle 3381.092ms"
+    (ret, data) = parseG1ConcMarkCycle(text, {})
+    print text
+    print len(ret)
+    print data
+
+parseG1ConcUndoCycle = andP([
+        mkTagger("type", "G1 Concurrent Undo Cycle"),
+        parseUnifiedHeader,
+        parseGcId,
+        newP(r"Concurrent\sUndo\sCycle\s" + regexp_float + r"ms$", mkDictModifier("dur_ms", get_float)),
+    ])
+if __debug__:
+    text = r"[2023-02-14T16:41:02.005+0800][5571.226s][18224][info] GC(420) Concurrent Undo Cycle 12.637ms"
+    (ret, data) = parseG1ConcUndoCycle(text, {})
+    print text
+    print len(ret)
+    print data
+
+parseG1ConcMarkAbort = andP([
+        mkTagger("type", "G1 Concurrent Mark Abort"),
+        parseUnifiedHeader,
+        parseGcId,
+        newP(r"Concurrent\sMark\sAbort$", None),
+    ])
+if __debug__:
+    text = r"[2023-02-14T16:41:30.118+0800][5599.339s][18224][info] GC(425) Concurrent Mark Abort"
+    (ret, data) = parseG1ConcMarkAbort(text, {})
+    print text
+    print len(ret)
+    print data
+
 parseG1PauseFull = andP([
         mkTagger("type", "G1 Pause Full"),
-        newP(r"\[(" + regexp_timestamp + r")\]", mkDictModifier("utc", get_string)),
-        newP(r"\[" + regexp_float + r"s\]", mkDictModifier("end_sec", get_float)),
-        newP(r"\[\d+\]\[info\]\sGC\(\d+\)\s", None),
-        newP(r"Pause\sFull\s\(G1\sEva.+M\)\s" + regexp_float + r"ms$", mkDictModifier("dur_ms", get_float)),
+        parseUnifiedHeader,
+        parseGcId,
+        newP(r"Pause\sFull\s", None),
+        newP(regexp_cause + r"\s", mkDictModifier("cause", get_intern)),
+        newP(regexp_heap_mb + r"\s", mkDictModifier("heap_mb", get_int3)),
+        newP(regexp_float + r"ms$", mkDictModifier("dur_ms", get_float)),
     ])
 if __debug__:
     text = r"[2021-12-01T11:12:32.486+0800][411.094s][13338][info] GC(203) Pause Full (G1 Evacuation Pause) 15656M->13641M(16384M) 4391.867ms"
@@ -428,26 +601,184 @@ if __debug__:
     print len(ret)
     print data
 
+"""
+Phases of a pause, printed before it with -Xlog:gc+phases.
+e.g.
+[info ][gc,phases   ] GC(0)   Pre Evacuate Collection Set: 0.1ms
+[info ][gc,phases   ] GC(0)   Evacuate Collection Set: 3.2ms
+[debug][gc,phases   ] GC(0)     Ext Root Scanning (ms):   Min:  0.1, Avg:  0.2, Max:  0.3, Diff:  0.2, Sum:  0.9, Workers: 4
+[debug][gc,phases   ] GC(0)       Processed Buffers:        Min: 0, Avg:  0.0, Max: 0, Diff: 0, Sum: 0, Workers: 4
+[info ][gc,phases   ] GC(0)   Post Evacuate Collection Set: 0.4ms
+[info ][gc,phases   ] GC(0)   Other: 0.3ms
+[info ][gc,phases   ] GC(203) Phase 1: Mark live objects 1733.291ms
+
+The fields of a phase are named after it as in gclog_parser_g1.py,
+e.g. Evacuate Collection Set gives evacuate_collection_set_ms,
+Ext Root Scanning gives ext_root_scanning_{min,avg,max,diff,sum}_ms,
+and a phase of a full gc gives mark_live_objects_ms.
+The phases are joined to the pause with the same gc id by
+MULTILINE_RULES, so every phase of a log is a column of
+gclog_columns.toColumns, NaN for the pauses without it.
+
+"""
+# Names of the statistics of a worker phase.
+PHASE_STATS = ["min", "avg", "max", "diff", "sum"]
+
+# String -> String
+def phaseKey(name):
+    return name.strip().lower().replace(" ", "_").replace("-", "_").replace("/", "_")
+
+"""
+A modifier for the statistics of a worker phase.
+
+return :: (Dictionary, [String]) -> Dictionary
+          # [name, " (ms)" | None, min, avg, max, diff, sum | None, workers | None]
+
+"""
+def mkWorkerPhaseModifier():
+    def modifyPhase_(dictData, matchStringL):
+        prefix = phaseKey(matchStringL[0]) + "_"
+        suffix = "_ms" if matchStringL[1] is not None else ""
+        for (stat, value) in zip(PHASE_STATS, matchStringL[2:7]):
+            if value is not None:
+                dictData[prefix + stat + suffix] = float(value)
+        if matchStringL[7] is not None:
+            dictData["gc_workers"] = int(matchStringL[7])
+        return dictData
+    return modifyPhase_
+
+"""
+A modifier for the time of a phase, e.g. Other gives other_ms.
+
+return :: (Dictionary, [String]) -> Dictionary # [name, ms]
+
+"""
+def mkPhaseTimeModifier():
+    def modifyPhaseTime_(dictData, matchStringL):
+        dictData[phaseKey(matchStringL[0]) + "_ms"] = float(matchStringL[1])
+        return dictData
+    return modifyPhaseTime_
+
+parseG1WorkerPhase = andP([
+        mkTagger("type", "G1 Worker Phase"),
+        parseUnifiedHeader,
+        parseGcId,
+        newP(r"\s*" + regexp_phase_name + r"(\s\(ms\))?:\s+" +
+             r"Min:\s+" + regexp_number + r",\s+Avg:\s+" + regexp_number +
+             r",\s+Max:\s+" + regexp_number + r",\s+Diff:\s+" + regexp_number +
+             r"(?:,\s+Sum:\s+" + regexp_number + r")?" +
+             r"(?:,\s+Workers:\s+(\d+))?$", mkWorkerPhaseModifier()),
+    ])
+if __debug__:
+    text = r"[2021-09-10T15:23:34.217+0800][123.534s][76035][debug] GC(33)     Ext Root Scanning (ms):   Min:  0.1, Avg:  0.2, Max:  0.3, Diff:  0.2, Sum:  0.9, Workers: 4"
+    (ret, data) = parseG1WorkerPhase(text, {})
+    print text
+    print len(ret)
+    print data
+
+parseG1FullPhase = andP([
+        mkTagger("type", "G1 Phase"),
+        parseUnifiedHeader,
+        parseGcId,
+        newP(r"Phase\s\d+:\s" + regexp_phase_name + r"\s" + regexp_float + r"ms$", mkPhaseTimeModifier()),
+    ])
+if __debug__:
+    text = r"[2021-12-01T11:12:30.102+0800][408.710s][13338][info] GC(203) Phase 1: Mark live objects 1733.291ms"
+    (ret, data) = parseG1FullPhase(text, {})
+    print text
+    print len(ret)
+    print data
+
+parseG1Phase = andP([
+        mkTagger("type", "G1 Phase"),
+        parseUnifiedHeader,
+        parseGcId,
+        newP(r"\s*" + regexp_phase_name + r":\s+" + regexp_float + r"ms$", mkPhaseTimeModifier()),
+    ])
+if __debug__:
+    text = r"[2021-09-10T15:23:34.217+0800][123.534s][76035][info] GC(33)   Evacuate Collection Set: 168.721ms"
+    (ret, data) = parseG1Phase(text, {})
+    print text
+    print len(ret)
+    print data
+
+"""
+Keyword of a line: the first two words after the gc id,
+e.g. "Pause Young" or "Concurrent Mark". None without a gc id.
+
+text :: String
+return :: String | None
+
+"""
+def g1Keyword(text):
+    i = text.find(" GC(")
+    if i < 0:
+        return None
+    j = text.find(") ", i)
+    if j < 0:
+        return None
+    return " ".join(text[j + 2:].split(None, 2)[:2])
+
 """
 Java GC Log parser.
 This supports almost kinds of GC provided by JVM.
 
+The events are dispatched by g1Keyword, so a line is tried only by the
+few events of its keyword, and the phases, whose names are many, are
+tried when a line has no other keyword.
+
+-XX:+UseG1GC (JDK11 and JDK17)
+parse pause {young normal, concurrent start, prepare mixed, mixed,
+             remark, cleanup, full}
+parse concurrent {cycle, mark cycle, undo cycle, mark abort, ...}
+
+-Xlog:gc+phases
+parse {Phase, WorkerPhase, FullPhase}
+  joined to the pause after them by MULTILINE_RULES.
+
 """
-parseJavaGcLog = orP([
-        parseG1PauseYoungNormal,
-        parseG1ConcCycle,
-        parseG1PauseFull,
-        parseG1ConcClearClaimedMarks,
-        parseG1ConcScanRootRegions,
-        parseG1ConcMark,
-        parseG1ConcMarkFromRoots,
-        parseG1ConcPreclean,
-        parseG1PauseRemark,
-        parseG1ConcRebuildRemSets,
-        parseG1PauseCleanup,
-        parseG1ConcCleanupForNextMark,
+parseJavaGcLog = dispatchP(g1Keyword, [
+        ("Pause Young", parseG1PauseYoungNormal),
+        ("Pause Young", parseG1PauseYoungConcStart),
+        ("Pause Young", parseG1PauseYoungPrepareMixed),
+        ("Pause Young", parseG1PauseYoungMixed),
+        ("Pause Remark", parseG1PauseRemark),
+        ("Pause Cleanup", parseG1PauseCleanup),
+        ("Pause Full", parseG1PauseFull),
+        ("Concurrent Cycle", parseG1ConcCycle),
+        ("Concurrent Undo", parseG1ConcUndoCycle),
+        ("Concurrent Clear", parseG1ConcClearClaimedMarks),
+        ("Concurrent Scan", parseG1ConcScanRootRegions),
+        ("Concurrent Mark", parseG1ConcMark),
+        ("Concurrent Mark", parseG1ConcMarkFromRoots),
+        ("Concurrent Mark", parseG1ConcMarkCycle),
+        ("Concurrent Mark", parseG1ConcMarkAbort),
+        ("Concurrent Preclean", parseG1ConcPreclean),
+        ("Concurrent Rebuild", parseG1ConcRebuildRemSets),
+        ("Concurrent Cleanup", parseG1ConcCleanupForNextMark),
+        (None, parseG1Phase),
+        (None, parseG1WorkerPhase),
+        (None, parseG1FullPhase),
     ])
 
+# Literals one of which is in every line parseJavaGcLog parses.
+# Lines without any of them are rejected by gclog_prefilter.py.
+PREFILTER_LITERALS = (" GC(",)
+
+# Tag sets of the lines parseJavaGcLog parses, in the form of -Xlog.
+# Lines with other tags are skipped when the tags decorator is logged.
+UNIFIED_TAGS = "gc,gc+marking,gc+phases"
+
+# Events printed over many lines, joined by gclog_assemble.py.
+# The phases of a pause come before it with the same gc id; at most
+# 8 gc ids are held, and phases without a pause are dropped.
+MULTILINE_RULES = [
+    {"key": "gc_id", "parts": {"G1 Phase": None, "G1 Worker Phase": None},
+     "end": ["G1 Pause Young Normal", "G1 Pause Young Concurrent Start",
+             "G1 Pause Young Prepare Mixed", "G1 Pause Young Mixed", "G1 Pause Remark", "G1 Pause Cleanup", "G1 Pause Full"],
+     "open": gclog_assemble.DEFAULT_OPEN_KEYS, "orphans": 'drop'},
+]
+
 
 ################################################################################
 # Parser of list of integer. This is for test.
@@ -499,31 +830,102 @@ if __debug__:
 ################################################################################
 # main
 ################################################################################
-def process_file(filename):
-   with open(dirs+filename,'r') as fd:
-       data_prev = None
-       output = []
-       for line in fd.readlines():
+"""
+Parse lines of a gc log lazily.
+
+The phases of a pause are joined to it by MULTILINE_RULES
+(gclog_assemble.py).
+
+lines :: Iterable String
+unparsed :: ((String, ParseError) -> ANY) | None # called for lines failed to parse.
+parser :: Parser | None # parseJavaGcLog by default, or a wrapper of it
+                        # such as gclog_cache.mkShapeCache.
+levels :: String | [String] | None # levels selected (see gclog_unified.py),
+                                   # None if parser selects the lines itself.
+tags :: String | [String] | None # tag sets selected, None selects all tags.
+return :: Generator Dictionary
+
+"""
+def iterGcLog(lines, unparsed=None, parser=None, levels=gclog_unified.DEFAULT_LEVELS, tags=UNIFIED_TAGS):
+   if parser is None:
+       parser = parseJavaGcLog
+   if levels is not None:
+       parser = gclog_unified.mkDecoratorFilter(parser, ParseError, levels, tags)
+
+   def parsed_():
+       for line in lines:
+           text = line.rstrip()
            try:
-               text = line.rstrip()
-               #print texts
-               (ret, data) = parseJavaGcLog(text, {})
-               #print(file)
-               if __debug__:
-                   print ("len: %d" % len(ret))
-               # print json.dumps(data)
-               output.append(data)
+               (ret, data) = parser(text, {})
            except ParseError, msg:
-               # print msg
-               #print ("###%s" % text)
-               pass
-       with open(dirs+filename+'.json','w') as fd:
-           fd.write(json.dumps(output))
+               if unparsed is not None:
+                   unparsed(text, msg)
+               continue
+           yield data
+
+   return gclog_assemble.assemble(parsed_(), MULTILINE_RULES)
+
+def process_file_chunk(filename, levels=gclog_unified.DEFAULT_LEVELS, tags=UNIFIED_TAGS):
+   scan = gclog_chunk.mkChunkScanner(parseJavaGcLog,
+       accept=gclog_unified.mkDecoratorAccept(levels, tags))
+   stats = {}
+   with open(dirs+filename,'rb') as fd:
+       output = list(gclog_assemble.assemble(scan(fd, stats), MULTILINE_RULES))
+   if __debug__:
+       print stats
+   with open(dirs+filename+'.json','w') as fd:
+       fd.write(json.dumps(output))
+
+def process_file_numpy(filename, levels=gclog_unified.DEFAULT_LEVELS, tags=UNIFIED_TAGS):
+   scan = gclog_unified.mkHeaderScanner(parseJavaGcLog, parseUnifiedHeader,
+       accept=gclog_unified.mkDecoratorAccept(levels, tags))
+   stats = {}
+   output = list(gclog_assemble.assemble(scan(dirs+filename, stats), MULTILINE_RULES))
+   if __debug__:
+       print stats
+   with open(dirs+filename+'.json','w') as fd:
+       fd.write(json.dumps(output))
+
+def process_file(filename, backend='line', levels=gclog_unified.DEFAULT_LEVELS, tags=UNIFIED_TAGS,
+                layout=None):
+   if layout == 'auto':
+       with open(dirs+filename,'r') as fd:
+           layout = gclog_unified.detectLayout(fd)
+   if layout is not None:
+       setLayout(layout)
+   if backend == 'numpy' and gclog_unified.np is None:
+       print('numpy is not installed, using the chunk backend')
+       backend = 'chunk'
+   if backend == 'numpy':
+       try:
+           return process_file_numpy(filename, levels, tags)
+       except ValueError, msg:
+           print('%s, using the chunk backend' % msg)
+           backend = 'chunk'
+   if backend == 'chunk':
+       return process_file_chunk(filename, levels, tags)
+   parse = gclog_unified.mkDecoratorFilter(parseJavaGcLog, ParseError, levels, tags)
+   with open(dirs+filename,'r') as fd:
+       output = list(iterGcLog(fd, parser=parse, levels=None))
+   if __debug__:
+       print parse.stats
+   with open(dirs+filename+'.json','w') as fd:
+       fd.write(json.dumps(output))
 
 if __name__=='__main__':
+    import gclog_pipe
     from multiprocessing import Pool
 
-    dirs = sys.argv[1]
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    if gclog_pipe.isPipe(sys.argv[1:]):
+        gclog_pipe.runPipe(sys.modules[__name__], sys.argv[1:])
+        exit(0)
+    opts = dict((a[2:].split('=', 1) + [None])[:2] for a in sys.argv[1:] if a.startswith('--'))
+    dirs = args[0]
+    backend = args[1] if len(args) > 1 else 'line'
+    levels = opts.get('levels') or gclog_unified.DEFAULT_LEVELS
+    tags = opts.get('tags') or UNIFIED_TAGS
+    layout = opts.get('layout')
     allfiles = os.listdir(dirs)
     files = []
     for f in allfiles:
@@ -542,7 +944,7 @@ if __name__=='__main__':
         multi_results.append(
             pool.apply_async(
                 process_file,
-                (filename,)
+                (filename, backend, levels, tags, layout)
             )
         )
     print('Waiting for results ...')
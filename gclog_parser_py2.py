@@ -8,6 +8,8 @@ import re
 import sys, os
 import json
 
+import gclog_assemble
+
 """
 This is a parser of GC log of Sun HotSpot JVM Version 6.
 
@@ -61,6 +63,9 @@ def newP(regexStr, dataModifier):
         else:
             msg = "Parse failed: pattern \"%s\" for \"%s\"" % (regexStr, line)
             raise ParseError(msg)
+    # Kept for tools which look into the grammar (see gclog_cache.py).
+    parse_.regexStr = regexStr
+    parse_.dataModifier = dataModifier
     return parse_
 
 ################################################################################
@@ -117,6 +122,8 @@ def andP(parsers):
             text0 = text1
             data0 = data1
         return (text0, data0)
+    parseAnd_.combinator = 'and'
+    parseAnd_.parsers = parsers
     return parseAnd_
 
 """
@@ -137,6 +144,8 @@ def orP(parsers):
                 msgL.append(msg)
         msgs = toString(msgL)
         raise ParseError(msgs)
+    parseOr_.combinator = 'or'
+    parseOr_.parsers = parsers
     return parseOr_
 
 """
@@ -197,6 +206,8 @@ def mkTagger(key, value):
     def tagger_(line, dictData):
         dictData[key] = value
         return (line, dictData)
+    tagger_.tagKey = key
+    tagger_.tagValue = value
     return tagger_
 
 
@@ -212,19 +223,31 @@ def get_int3(match_strL):
     assert len(match_strL) == 3
     return [int(match_strL[0]), int(match_strL[1]), int(match_strL[2])]
 
+# match_strL :: [String] # length must be 3.
+# return :: [Float] # length is 3.
+def get_float3(match_strL):
+    assert len(match_strL) == 3
+    return [float(match_strL[0]), float(match_strL[1]), float(match_strL[2])]
+
 # match_strL :: [String]
 # return :: True
 def get_true(match_strL):
     return True
 
+# match_strL :: [String]
+# return :: String
+def get_string(match_strL):
+    return match_strL[0]
+
 
 ################################################################################
 # Regexp aliases.
 ################################################################################
 
-regexp_timestamp = r"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d+\.\d+\+\d{4}:\s+"
+regexp_timestamp = r"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d+\.\d+[+-]\d{4}:\s+"
 regexp_float = r"(\d+\.\d*)"
 regexp_float_colon = regexp_timestamp + regexp_float + r":\s+"
+regexp_date = r"(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d+\.\d+[+-]\d{4}):\s+"
 regexp_heap_info = r"(\d+)K->(\d+)K\((\d+)K\)"
 regexp_float_secs = regexp_float + r"\s*secs\s+"
 regexp_basic_string = r"([0-9a-zA-Z_-]+)"
@@ -234,9 +257,37 @@ regexp_basic_string = r"([0-9a-zA-Z_-]+)"
 # Parsers for gc log entries.
 ################################################################################
 
+"""
+Date and uptime stamps at the head of an event.
+e.g. 2019-12-05T04:17:14.531+0800: 5.388:
+
+"""
+parseTimestamp = andP([ \
+	newP(regexp_date, mkDictModifier("utc", get_string)), \
+	newP(regexp_float + r":\s+", mkDictModifier("timestamp", get_float)), ])
+
+"""
+CPU times of an event at the end of a line.
+e.g. [Times: user=0.10 sys=0.02, real=0.13 secs]
+
+They are kept as [user, sys, real] in seconds.
+Times in another form (e.g. a locale with decimal commas) are skipped.
+
+"""
+parseTimes = orP([ \
+	newP(r"\[Times:\s+user=" + regexp_float + r"\s+sys=" + regexp_float + \
+	     r",\s+real=" + regexp_float + r"\s+secs\s*\]$", mkDictModifier("times", get_float3)), \
+	newP(r"\[Times:.*\]$", None), ])
+if __debug__:
+    text = r"[Times: user=0.10 sys=0.02, real=0.13 secs]"
+    (ret, data) = parseTimes(text, {})
+    print text
+    print len(ret)
+    print data
+
 parseParNew = andP([ \
 	mkTagger("type", "ParNew"), \
-	newP(regexp_float_colon, mkDictModifier("timestamp", get_float)), \
+	parseTimestamp, \
 	newP(r"\[GC\s+\(Allocation\sFailure\)\s+", None), \
 	newP(regexp_float_colon, None), \
 	newP(r"\[ParNew:\s+", None), \
@@ -245,7 +296,7 @@ parseParNew = andP([ \
 	newP(regexp_heap_info, mkDictModifier("heap_all", get_int3)), \
 	newP(r",\s*", None), \
 	newP(regexp_float + r"\s*secs\]\s*", mkDictModifier("response", get_float)), \
-	newP(r"\[Times:.*\]$", None), ])
+	parseTimes, ])
 if __debug__:
     text = r"2019-12-05T04:17:14.531+0800: 5.388: [GC (Allocation Failure) 2019-12-05T04:17:14.531+0800: 5.388: [ParNew: 5070147K->61055K(5662336K), 0.1314250 secs] 5070147K->61055K(7759488K), 0.1315435 secs] [Times: user=0.10 sys=0.02, real=0.13 secs]"
     (ret, data) = parseParNew(text, {})
@@ -262,11 +313,11 @@ if __debug__:
 
 parseInitialMark = andP([ \
 	mkTagger("type", "CMS-initial-mark"), \
-	newP(regexp_float_colon, mkDictModifier("timestamp", get_float)), \
+	parseTimestamp, \
 	newP(r".*CMS-initial-mark:\s+\d+K\(\d+K\)\]\s*", None), \
 	newP(r"\d+K\(\d+K\),\s*", None), \
 	newP(regexp_float + r"\s*secs\]\s*", mkDictModifier("response", get_float)), \
-	newP(r"\[Times:.*\]$", None), ])
+	parseTimes, ])
 if __debug__:
     text = r"2019-12-05T04:20:59.201+0800: 230.059: [GC (CMS Initial Mark) [1 CMS-initial-mark: 1930270K(2097152K)] 1968958K(7759488K), 0.0045541 secs] [Times: user=0.00 sys=0.00, real=0.01 secs]"
     (ret, data) = parseInitialMark(text, {})
@@ -277,7 +328,7 @@ if __debug__:
 
 parseMarkStart = andP([ \
 	mkTagger("type", "CMS-concurrent-mark-start"), \
-	newP(regexp_float_colon, mkDictModifier("timestamp", get_float)), \
+	parseTimestamp, \
 	newP(r".*CMS-concurrent-mark-start.*$", None), ])
 if __debug__:
     text = r"2019-12-05T04:22:50.833+0800: 341.691: [CMS-concurrent-mark-start]"
@@ -289,11 +340,11 @@ if __debug__:
 
 parseMark = andP([ \
 	mkTagger("type", "CMS-concurrent-mark"), \
-	newP(regexp_float_colon, mkDictModifier("timestamp", get_float)), \
+	parseTimestamp, \
 	newP(r"\[CMS-concurrent-mark:\s+", None), \
 	newP(regexp_float + r"/", None), \
 	newP(regexp_float + r"\s+secs\]\s+", mkDictModifier("response", get_float)), \
-	newP(r"\[Times:.*\]$", None), ])
+	parseTimes, ])
 if __debug__:
     text = r"2019-12-05T04:26:03.302+0800: 534.159: [CMS-concurrent-mark: 1.720/1.897 secs] [Times: user=11.94 sys=1.69, real=1.89 secs]"
     (ret, data) = parseMark(text, {})
@@ -304,7 +355,7 @@ if __debug__:
 
 parsePrecleanStart = andP([ \
 	mkTagger("type", "CMS-concurrent-preclean-start"), \
-	newP(regexp_float_colon, mkDictModifier("timestamp", get_float)), \
+	parseTimestamp, \
 	newP(r".*CMS-concurrent-preclean-start.*$", None), ])
 if __debug__:
     text = r"2019-12-05T04:26:03.302+0800: 534.159: [CMS-concurrent-preclean-start]"
@@ -316,11 +367,11 @@ if __debug__:
 
 parsePreclean = andP([ \
 	mkTagger("type", "CMS-concurrent-preclean"), \
-	newP(regexp_float_colon, mkDictModifier("timestamp", get_float)), \
+	parseTimestamp, \
 	newP(r"\[CMS-concurrent-preclean:\s+", None), \
 	newP(regexp_float + r"/", None), \
 	newP(regexp_float + r"\s+secs\]\s+", mkDictModifier("response", get_float)), \
-	newP(r"\[Times:.*\]$", None), ])
+	parseTimes, ])
 if __debug__:
     text = r"2019-12-05T04:26:03.390+0800: 534.248: [CMS-concurrent-preclean: 0.014/0.018 secs] [Times: user=0.07 sys=0.00, real=0.01 secs]"
     (ret, data) = parsePreclean(text, {})
@@ -331,7 +382,7 @@ if __debug__:
 
 parseAbortablePrecleanStart = andP([ \
 	mkTagger("type", "CMS-concurrent-abortable-preclean-start"), \
-	newP(regexp_float_colon, mkDictModifier("timestamp", get_float)), \
+	parseTimestamp, \
 	newP(r".*CMS-concurrent-abortable-preclean-start.*$", None), ])
 if __debug__:
     text = r"2019-12-05T04:26:03.390+0800: 534.248: [CMS-concurrent-abortable-preclean-start]"
@@ -343,11 +394,11 @@ if __debug__:
 
 parseAbortablePreclean = andP([ \
 	mkTagger("type", "CMS-concurrent-abortable-preclean"), \
-	newP(regexp_float_colon, mkDictModifier("timestamp", get_float)), \
+	parseTimestamp, \
 	newP(r"\[CMS-concurrent-abortable-preclean:\s+", None), \
 	newP(regexp_float + r"/", None), \
 	newP(regexp_float + r"\s+secs\]\s+", mkDictModifier("response", get_float)), \
-	newP(r"\[Times:.*\]$", None), ])
+	parseTimes, ])
 if __debug__:
     text = r"2019-12-05T04:18:32.874+0800: 83.732: [CMS-concurrent-abortable-preclean: 0.793/0.954 secs] [Times: user=3.78 sys=0.38, real=0.96 secs]"
     (ret, data) = parseAbortablePreclean(text, {})
@@ -358,7 +409,7 @@ if __debug__:
 
 parseAbortablePrecleanFullGC0 = andP([ \
 	mkTagger("type", "CMS-concurrent-abortable-preclean-fullgc0"), \
-	newP(regexp_float_colon, mkDictModifier("timestamp", get_float)), \
+	parseTimestamp, \
 	orP([newP(r"\[Full GC\s*\(System\.gc\(\)\)\s*" + regexp_float_colon, mkDictModifier("system", get_true)),\
              newP(r"\[Full GC\s*" + regexp_float_colon, None), \
         newP(r"\[GC\s*\(Allocation Failure\).*" + r"\[ParNew.*secs\]" + regexp_float_colon, None),]), \
@@ -366,7 +417,7 @@ parseAbortablePrecleanFullGC0 = andP([ \
 	newP(r"\[CMS-concurrent-abortable-preclean:\s+", None), \
 	newP(regexp_float + r"/", None), \
 	newP(regexp_float + r"\s+secs\]\s*", mkDictModifier("response", get_float)), \
-	newP(r"\[Times:.*\]$", None), ])
+	parseTimes, ])
 if __debug__:
     text = r"2019-12-11T12:07:18.104+0800: 415.160: [GC (Allocation Failure) 2019-12-11T12:07:18.104+0800: 415.160: [ParNew: 6606079K->6606079K(6606080K), 0.0000257 secs]2019-12-11T12:07:18.104+0800: 415.160: [CMS2019-12-11T12:07:18.459+0800: 415.515: [CMS-concurrent-mark: 0.392/0.393 secs] [Times: user=0.92 sys=0.02, real=0.39 secs]"
     #(ret, data) = parseAbortablePrecleanFullGC0(text, {})
@@ -394,7 +445,7 @@ parseAbortablePrecleanFullGC1 = andP([ \
 	newP(r"\[Metaspace:\s+", None), \
 	newP(regexp_heap_info + r"\],\s+", mkDictModifier("perm", get_int3)), \
 	newP(regexp_float + r"\s*secs\s*\]\s*", mkDictModifier("response", get_float)), \
-	newP(r"\[Times:.*\]$", None), ])
+	parseTimes, ])
 if __debug__:
     text = r" (concurrent mode failure): 1041940K->1048575K(1048576K), 3.0127238 secs] 7646509K->1423853K(7654656K), [Metaspace: 9132K->9132K(1058816K)], 5.3052202 secs] [Times: user=5.14 sys=0.17, real=5.30 secs]"
     (ret, data) = parseAbortablePrecleanFullGC1(text, {})
@@ -411,11 +462,11 @@ if __debug__:
 parseAbortablePrecleanFailureTime = andP([ \
 	mkTagger("type", "CMS-concurrent-abortable-preclean-failure-time"), \
 	newP(r"\s*CMS:\s*abort preclean due to time\s*", None), \
-	newP(regexp_float_colon, mkDictModifier("timestamp", get_float)), \
+	parseTimestamp, \
 	newP(r"\[CMS-concurrent-abortable-preclean:\s*", None), \
 	newP(regexp_float + r"/", None), \
 	newP(regexp_float + r"\s*secs\s*\]\s*", mkDictModifier("response", get_float)), \
-	newP(r"\[Times:.*\]$", None), ])
+	parseTimes, ])
 if __debug__:
     text = r" CMS: abort preclean due to time 2019-12-11T12:08:12.632+0800: 469.688: [CMS-concurrent-abortable-preclean: 0.128/5.034 secs] [Times: user=16.42 sys=3.59, real=5.04 secs]"
     (ret, data) = parseAbortablePrecleanFailureTime(text, {})
@@ -441,11 +492,11 @@ if __debug__:
 
 parseRemark = andP([ \
 	mkTagger("type", "CMS-remark"), \
-	newP(regexp_float_colon, mkDictModifier("timestamp", get_float)), \
+	parseTimestamp, \
 	newP(r"\[GC\s+\(CMS Final Remark\)\s+\[YG occupancy.+CMS-remark:\s+\d+K\(\d+K\)\]\s*", None), \
 	newP(r"\d+K\(\d+K\),\s*", None), \
 	newP(regexp_float + r"\s*secs\]\s*", mkDictModifier("response", get_float)), \
-	newP(r"\[Times:.*\]$", None), ])
+	parseTimes, ])
 if __debug__:
     text = r"2019-12-05T04:58:15.792+0800: 335.407: [GC (CMS Final Remark) [YG occupancy: 2668048 K (5662336 K)]2019-12-05T04:58:15.792+0800: 335.407: [Rescan (parallel) , 0.8799493 secs]2019-12-05T04:58:16.672+0800: 336.287: [weak refs processing, 0.0000365 secs]2019-12-05T04:58:16.672+0800: 336.287: [class unloading, 0.0067348 secs]2019-12-05T04:58:16.679+0800: 336.294: [scrub symbol table, 0.0027506 secs]2019-12-05T04:58:16.682+0800: 336.297: [scrub string table, 0.0002704 secs][1 CMS-remark: 1939770K(2097152K)] 4607818K(7759488K), 0.8898802 secs] [Times: user=0.88 sys=0.01, real=0.88 secs]"
     (ret, data) = parseRemark(text, {})
@@ -456,7 +507,7 @@ if __debug__:
 
 parseSweepStart = andP([ \
 	mkTagger("type", "CMS-concurrent-sweep-start"), \
-	newP(regexp_float_colon, mkDictModifier("timestamp", get_float)), \
+	parseTimestamp, \
 	newP(r"\[CMS-concurrent-sweep-start\]$", None), ])
 if __debug__:
     text = r"2019-12-05T04:58:16.682+0800: 336.297: [CMS-concurrent-sweep-start]"
@@ -468,11 +519,11 @@ if __debug__:
 
 parseSweep = andP([ \
 	mkTagger("type", "CMS-concurrent-sweep"), \
-	newP(regexp_float_colon, mkDictModifier("timestamp", get_float)), \
+	parseTimestamp, \
 	newP(r"\[CMS-concurrent-sweep:\s+", None), \
 	newP(regexp_float + r"/", None), \
 	newP(regexp_float + r"\s+secs\]\s+", mkDictModifier("response", get_float)), \
-	newP(r"\[Times:.*\]$", None), ])
+	parseTimes, ])
 if __debug__:
     text = r"2019-12-05T04:58:17.259+0800: 336.873: [CMS-concurrent-sweep: 0.483/0.576 secs] [Times: user=3.43 sys=0.44, real=0.58 secs]"
     (ret, data) = parseSweep(text, {})
@@ -483,7 +534,7 @@ if __debug__:
 
 parseResetStart = andP([ \
 	mkTagger("type", "CMS-concurrent-reset-start"), \
-	newP(regexp_float_colon, mkDictModifier("timestamp", get_float)), \
+	parseTimestamp, \
 	newP(r"\[CMS-concurrent-reset-start\]$", None), ])
 if __debug__:
     text = r"2019-12-05T04:58:17.259+0800: 336.874: [CMS-concurrent-reset-start]"
@@ -495,11 +546,11 @@ if __debug__:
 
 parseReset = andP([ \
 	mkTagger("type", "CMS-concurrent-reset"), \
-	newP(regexp_float_colon, mkDictModifier("timestamp", get_float)), \
+	parseTimestamp, \
 	newP(r"\[CMS-concurrent-reset:\s+", None), \
 	newP(regexp_float + r"/", None), \
 	newP(regexp_float + r"\s+secs\]\s+", mkDictModifier("response", get_float)), \
-	newP(r"\[Times:.*\]$", None), ])
+	parseTimes, ])
 if __debug__:
     text = r"2019-12-05T04:58:17.265+0800: 336.880: [CMS-concurrent-reset: 0.007/0.007 secs] [Times: user=0.05 sys=0.01, real=0.01 secs]"
     (ret, data) = parseReset(text, {})
@@ -510,7 +561,7 @@ if __debug__:
 
 parseFullGC = andP([ \
 	mkTagger("type", "FullGC"), \
-	newP(regexp_float_colon, mkDictModifier("timestamp", get_float)), \
+	parseTimestamp, \
 	orP([newP(r"\[Full GC\s*\(System\.gc\(\)\)\s*", mkDictModifier("system", get_true)), \
 		newP(r"\[Full GC\s*", None), ]), \
 	newP(regexp_float_colon, None), \
@@ -523,7 +574,7 @@ parseFullGC = andP([ \
 	newP(r"\]\s*(?:icms_dc=\d+\s*)?", None), \
 	newP(r",\s*", None), \
 	newP(regexp_float + r"\s*secs\]\s*", mkDictModifier("response", get_float)), \
-	newP(r"\[Times:.*\]$", None), ])
+	parseTimes, ])
 if __debug__:
     # text = r"7.992: [Full GC 7.992: [CMS: 6887K->19772K(65536K), 0.4137230 secs] 34678K->19772K(114688K), [CMS Perm : 54004K->53982K(54152K)] icms_dc=0 , 0.4140100 secs] [Times: user=0.68 sys=0.14, real=0.41 secs]"
     # (ret, data) = parseFullGC(text, {})
@@ -539,12 +590,12 @@ if __debug__:
 # This is for -XX:+UseParallelGC
 parseParallelGC = andP([ \
 	mkTagger("type", "ParallelGC"), \
-	newP(regexp_float_colon, mkDictModifier("timestamp", get_float)), \
+	parseTimestamp, \
 	newP(r"\[GC\s+\[PSYoungGen:\s*", None), \
 	newP(regexp_heap_info + r"\s*\]\s*", mkDictModifier("heap_new", get_int3)), \
 	newP(regexp_heap_info + r"\s*,\s*", mkDictModifier("heap_all", get_int3)), \
 	newP(regexp_float + r"\s*secs\s*\]\s*", mkDictModifier("response", get_float)), \
-	newP(r"\[Times:.*\]$", None), ])
+	parseTimes, ])
 # if __debug__:
 #     text = r"162.002: [GC [PSYoungGen: 39323K->3653K(49152K)] 87187K->56999K(114688K), 0.0207580 secs] [Times: user=0.08 sys=0.00, real=0.02 secs]"
 #     (ret, data) = parseParallelGC(text, {})
@@ -556,7 +607,7 @@ parseParallelGC = andP([ \
 # This is for -XX:+UseParallelGC
 parseParallelFullGC = andP([ \
 	mkTagger("type", "ParallelFullGC"), \
-	newP(regexp_float_colon, mkDictModifier("timestamp", get_float)), \
+	parseTimestamp, \
 	orP([newP(r"\[Full GC\s*\(System\)\s*\[PSYoungGen:\s*", mkDictModifier("system", get_true)), \
 		newP(r"\[Full GC\s*\[PSYoungGen:\s*", None), ]), \
 	newP(regexp_heap_info + r"\s*\]\s*", mkDictModifier("heap_new", get_int3)), \
@@ -566,7 +617,7 @@ parseParallelFullGC = andP([ \
 	newP(r"\[PSPermGen:\s*", None), \
 	newP(regexp_heap_info + r"\s*\]\s*,\s*", mkDictModifier("perm", get_int3)), \
 	newP(regexp_float + r"\s*secs\s*\]\s*", mkDictModifier("response", get_float)), \
-	newP(r"\[Times:.*\]$", None), ])
+	parseTimes, ])
 # if __debug__:
 #     text = r"162.657: [Full GC [PSYoungGen: 6189K->0K(50752K)] [PSOldGen: 58712K->43071K(65536K)] 64902K->43071K(116288K) [PSPermGen: 81060K->81060K(81152K)], 0.3032230 secs] [Times: user=0.30 sys=0.00, real=0.30 secs]"
 #     (ret, data) = parseParallelFullGC(text, {})
@@ -578,14 +629,14 @@ parseParallelFullGC = andP([ \
 # This is for -XX:+UseSerialGC
 parseSerialGC = andP([ \
 	mkTagger("type", "SerialGC"), \
-	newP(regexp_float_colon, mkDictModifier("timestamp", get_float)), \
+	parseTimestamp, \
 	newP(r"\[GC\s+", None), \
 	newP(regexp_float_colon + r"\[DefNew:\s*", None), \
 	newP(regexp_heap_info + r"\s*,\s*", mkDictModifier("heap_new", get_int3)), \
 	newP(regexp_float + r"\s*secs\s*\]\s*", None), \
 	newP(regexp_heap_info + r"\s*,\s*", mkDictModifier("heap_all", get_int3)), \
 	newP(regexp_float + r"\s*secs\s*\]\s*", mkDictModifier("response", get_float)), \
-	newP(r"\[Times:.*\]$", None), ])
+	parseTimes, ])
 # if __debug__:
 #     text = r"4.687: [GC 4.687: [DefNew: 33343K->649K(49152K), 0.0021450 secs] 45309K->12616K(114688K), 0.0021800 secs] [Times: user=0.00 sys=0.00, real=0.00 secs]"
 #     (ret, data) = parseSerialGC(text, {})
@@ -597,7 +648,7 @@ parseSerialGC = andP([ \
 # This is for -XX:+UseSerialGC
 parseSerialFullGC = andP([ \
 	mkTagger("type", "SerialFullGC"), \
-	newP(regexp_float_colon, mkDictModifier("timestamp", get_float)), \
+	parseTimestamp, \
 	newP(r"\[Full GC\s+", None), \
 	newP(regexp_float_colon + r"\s*", None), \
 	newP(r"\[Tenured:\s*", None), \
@@ -607,7 +658,7 @@ parseSerialFullGC = andP([ \
 	newP(r"\[Perm\s*:\s*", None), \
 	newP(regexp_heap_info + r"\s*\]\s*,\s*", mkDictModifier("perm", get_int3)), \
 	newP(regexp_float + r"\s*secs\s*\]\s*", mkDictModifier("response", get_float)), \
-	newP(r"\[Times:.*\]$", None), ])
+	parseTimes, ])
 # if __debug__:
 #     text = r"4.899: [Full GC 4.899: [Tenured: 11966K->12899K(65536K), 0.1237750 secs] 22655K->12899K(114688K), [Perm : 32122K->32122K(32128K)], 0.1238590 secs] [Times: user=0.11 sys=0.00, real=0.13 secs]"
 #     (ret, data) = parseSerialFullGC(text, {})
@@ -633,7 +684,7 @@ This supports almost kinds of GC provided by JVM.
        Remark,
        SweepStart, Sweep, ResetStart, Reset}
   parseAbortablePrecleanFullGC0 and parseAbortablePrecleanFullGC1
-  must be always together.
+  are joined by MULTILINE_RULES.
 
 -XX:+UseParallelGC
   parseParallelFullGC, parseParallelGC.
@@ -655,6 +706,18 @@ parseJavaGcLog = orP([ \
     parseSerialGC, \
 ])
 
+# Literals one of which is in every line parseJavaGcLog parses.
+# Lines without any of them are rejected by gclog_prefilter.py.
+PREFILTER_LITERALS = ("[GC", "[Full GC", "CMS-", "[Times:")
+
+# Events printed over many lines, joined by gclog_assemble.py.
+MULTILINE_RULES = [
+    {"start": "CMS-concurrent-abortable-preclean-fullgc0",
+     "end": "CMS-concurrent-abortable-preclean-fullgc1",
+     "type": "CMS-concurrent-abortable-preclean-fullgc",
+     "lookahead": 4, "timeout": None},
+]
+
 
 ################################################################################
 # Parser of list of integer. This is for test.
@@ -703,41 +766,58 @@ if __debug__:
 ################################################################################
 # main
 ################################################################################
-    
-dirs = sys.argv[1]
-allfiles = os.listdir(dirs)
-files = []
-for f in allfiles:
-    if f.startswith('gclog') and f.endswith('log'):
-        files.append(f)
-
-for file in files:
-    print(file)
-    with open(dirs+file,'r') as fd:
-        data_prev = None
-        output = []
-        for line in fd.readlines():
+
+"""
+Parse lines of a gc log lazily.
+
+Events printed over many lines are joined by MULTILINE_RULES
+(gclog_assemble.py), e.g. a CMS-concurrent-abortable-preclean-fullgc0
+event and the CMS-concurrent-abortable-preclean-fullgc1 event following
+it into one CMS-concurrent-abortable-preclean-fullgc event.
+
+lines :: Iterable String
+unparsed :: ((String, ParseError) -> ANY) | None # called for lines failed to parse.
+parser :: Parser | None # parseJavaGcLog by default, or a wrapper of it
+                        # such as gclog_cache.mkShapeCache.
+return :: Generator Dictionary
+
+"""
+def iterGcLog(lines, unparsed=None, parser=None):
+    if parser is None:
+        parser = parseJavaGcLog
+
+    def parsed_():
+        for line in lines:
+            text = line.rstrip()
             try:
-                text = line.rstrip()
-                #print texts
-                (ret, data) = parseJavaGcLog(text, {})
-                print(file)
-                if data["type"] == "CMS-concurrent-abortable-preclean-fullgc0":
-                    data_prev = data
-                    continue
-                if data["type"] == "CMS-concurrent-abortable-preclean-fullgc1":
-                    assert data_prev["type"] == "CMS-concurrent-abortable-preclean-fullgc0"
-                    data_prev.update(data)
-                    data = data_prev
-                    data_prev = None
-                    data["type"] = "CMS-concurrent-abortable-preclean-fullgc"
-                if __debug__:
-                    print ("len: %d" % len(ret))
-                # print json.dumps(data)
-                output.append(data)
+                (ret, data) = parser(text, {})
             except ParseError, msg:
-                #print msg
-                print ("###%s" % text)
+                if unparsed is not None:
+                    unparsed(text, msg)
+                continue
+            yield data
+
+    return gclog_assemble.assemble(parsed_(), MULTILINE_RULES)
+
+if __name__=='__main__':
+    import gclog_pipe
+    if gclog_pipe.isPipe(sys.argv[1:]):
+        gclog_pipe.runPipe(sys.modules[__name__], sys.argv[1:])
+        exit(0)
+    dirs = sys.argv[1]
+    allfiles = os.listdir(dirs)
+    files = []
+    for f in allfiles:
+        if f.startswith('gclog') and f.endswith('log'):
+            files.append(f)
+
+    def print_unparsed(text, msg):
+        print ("###%s" % text)
+
+    for file in files:
+        print(file)
+        with open(dirs+file,'r') as fd:
+            output = list(iterGcLog(fd, print_unparsed))
         with open(dirs+file+'_2','w') as fd:
             fd.write(json.dumps(output))
 
@@ -57,6 +57,9 @@ def newP(regexStr, dataModifier):
         else:
             msg = "Parse failed: pattern \"%s\" for \"%s\"" % (regexStr, line)
             raise ParseError(msg)
+    # Kept for tools which look into the grammar (see gclog_cache.py).
+    parse_.regexStr = regexStr
+    parse_.dataModifier = dataModifier
     return parse_
 
 ################################################################################
@@ -113,6 +116,8 @@ def andP(parsers):
             text0 = text1
             data0 = data1
         return (text0, data0)
+    parseAnd_.combinator = 'and'
+    parseAnd_.parsers = parsers
     return parseAnd_
 
 """
@@ -133,6 +138,8 @@ def orP(parsers):
                 msgL.append(msg)
         msgs = toString(msgL)
         raise ParseError(msgs)
+    parseOr_.combinator = 'or'
+    parseOr_.parsers = parsers
     return parseOr_
 
 """
@@ -193,6 +200,8 @@ def mkTagger(key, value):
     def tagger_(line, dictData):
         dictData[key] = value
         return (line, dictData)
+    tagger_.tagKey = key
+    tagger_.tagValue = value
     return tagger_
 
 
@@ -223,9 +232,10 @@ def get_string(match_strL):
 # Regexp aliases.
 ################################################################################
 
-regexp_timestamp = r"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d+\.\d+\+\d{4}:\s+"
+regexp_timestamp = r"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d+\.\d+[+-]\d{4}:\s+"
 regexp_float = r"(\d+\.\d+)"
 regexp_time_float_colon = regexp_timestamp + regexp_float + r":\s+"
+regexp_date = r"(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d+\.\d+[+-]\d{4}):\s+"
 regexp_heap_info = regexp_float + r"\s\(" + regexp_float + r"\s\)->" + \
                    regexp_float + r"\s\(" + regexp_float + r"\s\)\s*"
 regexp_float_secs = regexp_float + r"\s*secs\s*"
@@ -237,9 +247,19 @@ regexp_basic_string = r"([0-9a-zA-Z_-]+)"
 # Parsers for gc log entries.
 ################################################################################
 
+"""
+Date and uptime stamps at the head of an event.
+e.g. 2019-12-05T04:17:14.531+0800: 5.388:
+
+"""
+parseTimestamp = andP([ \
+        newP(regexp_date, mkDictModifier("utc", get_string)), \
+        newP(regexp_float + r":\s+", mkDictModifier("timestamp", get_float)), \
+    ])
+
 parseSheConcReset = andP([ \
         mkTagger("type", "She Conc Reset"), \
-        newP(regexp_time_float_colon, mkDictModifier("timestamp", get_float)), \
+        parseTimestamp, \
         newP(r"\[Concurrent\sreset,\s", None), \
         newP(regexp_float_ms + r"\]$", mkDictModifier("response", get_float)), \
     ])
@@ -252,7 +272,7 @@ if __debug__:
 
 parseShePauseInitMark = andP([ \
         mkTagger("type", "She Pause Init Mark"), \
-        newP(regexp_time_float_colon, mkDictModifier("timestamp", get_float)), \
+        parseTimestamp, \
         newP(r"\[Pause\sInit\sMark.*,\s", None), \
         newP(regexp_float_ms + r"\]$", mkDictModifier("response", get_float)), \
     ])
@@ -265,7 +285,7 @@ if __debug__:
 
 parseSheConcMark = andP([ \
         mkTagger("type", "She Conc Mark"), \
-        newP(regexp_time_float_colon, mkDictModifier("timestamp", get_float)), \
+        parseTimestamp, \
         newP(r"\[Concurrent\smarking.*,\s", None), \
         newP(regexp_float_ms + r"\]$", mkDictModifier("response", get_float)), \
     ])
@@ -278,7 +298,7 @@ if __debug__:
 
 parseSheConcPreclean = andP([ \
         mkTagger("type", "She Conc Preclean"), \
-        newP(regexp_time_float_colon, mkDictModifier("timestamp", get_float)), \
+        parseTimestamp, \
         newP(r"\[Concurrent\sprecleaning,\s", None), \
         newP(regexp_float_ms + r"\]$", mkDictModifier("response", get_float)), \
     ])
@@ -291,7 +311,7 @@ if __debug__:
 
 parseShePauseFinalMark = andP([ \
         mkTagger("type", "She Pause Final Mark"), \
-        newP(regexp_time_float_colon, mkDictModifier("timestamp", get_float)), \
+        parseTimestamp, \
         newP(r"\[Pause\sFinal\sMark.*,\s", None), \
         newP(regexp_float_ms + r"\]$", mkDictModifier("response", get_float)), \
     ])
@@ -304,7 +324,7 @@ if __debug__:
 
 parseSheConcCleanup = andP([ \
         mkTagger("type", "She Conc Cleanup"), \
-        newP(regexp_time_float_colon, mkDictModifier("timestamp", get_float)), \
+        parseTimestamp, \
         newP(r"\[Concurrent\scleanup.*,\s", None), \
         newP(regexp_float_ms + r"\]$", mkDictModifier("response", get_float)), \
     ])
@@ -317,7 +337,7 @@ if __debug__:
 
 parseSheConcEvac = andP([ \
         mkTagger("type", "She Conc Evacuation"), \
-        newP(regexp_time_float_colon, mkDictModifier("timestamp", get_float)), \
+        parseTimestamp, \
         newP(r"\[Concurrent\sevacuation,\s", None), \
         newP(regexp_float_ms + r"\]$", mkDictModifier("response", get_float)), \
     ])
@@ -330,7 +350,7 @@ if __debug__:
 
 parseShePauseInitUpdateRefs = andP([ \
         mkTagger("type", "She Pause Init Update Refs"), \
-        newP(regexp_time_float_colon, mkDictModifier("timestamp", get_float)), \
+        parseTimestamp, \
         newP(r"\[Pause\sInit\sUpdate\sRefs,\s", None), \
         newP(regexp_float_ms + r"\]$", mkDictModifier("response", get_float)), \
     ])
@@ -343,7 +363,7 @@ if __debug__:
 
 parseSheConcUpdateRefs = andP([ \
         mkTagger("type", "She Conc Update Refs"), \
-        newP(regexp_time_float_colon, mkDictModifier("timestamp", get_float)), \
+        parseTimestamp, \
         newP(r"\[Concurrent\supdate\sreferences,\s", None), \
         newP(regexp_float_ms + r"\]$", mkDictModifier("response", get_float)), \
     ])
@@ -356,7 +376,7 @@ if __debug__:
 
 parseShePauseFinalUpdateRefs = andP([ \
         mkTagger("type", "She Pause Final Update Refs"), \
-        newP(regexp_time_float_colon, mkDictModifier("timestamp", get_float)), \
+        parseTimestamp, \
         newP(r"\[Pause\sFinal\sUpdate\sRefs,\s", None), \
         newP(regexp_float_ms + r"\]$", mkDictModifier("response", get_float)), \
     ])
@@ -404,6 +424,10 @@ parseJavaGcLog = orP([ \
         parseShePauseFinalUpdateRefs, \
     ])
 
+# Literals one of which is in every line parseJavaGcLog parses.
+# Lines without any of them are rejected by gclog_prefilter.py.
+PREFILTER_LITERALS = ("[Pause", "[Concurrent")
+
 
 ################################################################################
 # Parser of list of integer. This is for test.
@@ -455,32 +479,49 @@ if __debug__:
 ################################################################################
 # main
 ################################################################################
-    
-dirs = sys.argv[1]
-allfiles = os.listdir(dirs)
-files = []
-for f in allfiles:
-    if f.startswith('gclog') and f.endswith('log'):
-        files.append(f)
-
-for file in files:
-    print(file)
-    with open(dirs+file,'r') as fd:
-        data_prev = None
-        output = []
-        for line in fd.readlines():
-            try:
-                text = line.rstrip()
-                #print texts
-                (ret, data) = parseJavaGcLog(text, {})
-                print(file)
-                if __debug__:
-                    print ("len: %d" % len(ret))
-                # print json.dumps(data)
-                output.append(data)
-            except ParseError, msg:
-                print msg
-                #print ("###%s" % text)
+
+"""
+Parse lines of a gc log lazily.
+
+lines :: Iterable String
+unparsed :: ((String, ParseError) -> ANY) | None # called for lines failed to parse.
+parser :: Parser | None # parseJavaGcLog by default, or a wrapper of it
+                        # such as gclog_cache.mkShapeCache.
+return :: Generator Dictionary
+
+"""
+def iterGcLog(lines, unparsed=None, parser=None):
+    if parser is None:
+        parser = parseJavaGcLog
+    for line in lines:
+        text = line.rstrip()
+        try:
+            (ret, data) = parser(text, {})
+        except ParseError, msg:
+            if unparsed is not None:
+                unparsed(text, msg)
+            continue
+        yield data
+
+if __name__=='__main__':
+    import gclog_pipe
+    if gclog_pipe.isPipe(sys.argv[1:]):
+        gclog_pipe.runPipe(sys.modules[__name__], sys.argv[1:])
+        exit(0)
+    dirs = sys.argv[1]
+    allfiles = os.listdir(dirs)
+    files = []
+    for f in allfiles:
+        if f.startswith('gclog') and f.endswith('log'):
+            files.append(f)
+
+    def print_unparsed(text, msg):
+        print msg
+
+    for file in files:
+        print(file)
+        with open(dirs+file,'r') as fd:
+            output = list(iterGcLog(fd, print_unparsed))
         with open(dirs+file+'_2','w') as fd:
             fd.write(json.dumps(output))
 
@@ -3,6 +3,9 @@
 import re
 import sys, os
 import json
+from collections import OrderedDict
+import gclog_chunk
+import gclog_unified
 
 """
 This is a parser of Shenandoah GC log of OpenJDk8.
@@ -12,6 +15,19 @@ Required JVM option: -Xloggc:${GC_LOG_FILE} -XX:+PrintGCDateStamps -XX:+PrintGCD
 Usage:
    java ${JVM_OPTIONS} ${ANY_OTHER_OPTIONS}
    this.py < ${GC_LOG_FILE} | grep -v ^### | ${YOUR_ANALYZER}
+   # One JSON object per event, flushed every --batch=N events or
+   # --latency=SECS seconds. --unparsed writes failed lines as ###${LINE}
+   # (see gclog_pipe.py).
+   this.py gclog_dir [line|chunk|numpy]
+   # The second argument selects the backend (default: line).
+   # chunk scans 16MB buffers with fused patterns (see gclog_chunk.py).
+   # numpy also decodes the headers of all lines at once (see gclog_unified.py).
+   # --levels=info,debug and --tags=gc,gc+phases select the lines given to
+   # the grammar by their decorators (see gclog_unified.py).
+   # --layout=utctime,uptimemillis,pid,tid,level gives the decorators of -Xlog
+   # (default: time,uptime,tid,level,tags), and --layout=auto detects them.
+   # --cycles gives one "She Cycle" per gc id instead of its phases
+   # (see iterCycles).
 
 You can get all data as a python dictionary structure
 in your analyer as follows:
@@ -56,6 +72,9 @@ def newP(regexStr, dataModifier):
         else:
             msg = "Parse failed: pattern \"%s\" for \"%s\"" % (regexStr, line)
             raise ParseError(msg)
+    # Kept for compilers of the grammar (see gclog_chunk.py).
+    parse_.regexStr = regexStr
+    parse_.dataModifier = dataModifier
     return parse_
 
 ################################################################################
@@ -112,6 +131,8 @@ def andP(parsers):
             text0 = text1
             data0 = data1
         return (text0, data0)
+    parseAnd_.combinator = 'and'
+    parseAnd_.parsers = parsers
     return parseAnd_
 
 """
@@ -132,6 +153,8 @@ def orP(parsers):
                 msgL.append(msg)
         msgs = toString(msgL)
         raise ParseError(msgs)
+    parseOr_.combinator = 'or'
+    parseOr_.parsers = parsers
     return parseOr_
 
 """
@@ -192,6 +215,8 @@ def mkTagger(key, value):
     def tagger_(line, dictData):
         dictData[key] = value
         return (line, dictData)
+    tagger_.tagKey = key
+    tagger_.tagValue = value
     return tagger_
 
 
@@ -201,6 +226,12 @@ def get_float(match_strL):
     assert len(match_strL) == 1
     return float(match_strL[0])
 
+# match_strL :: [String] # length must be 1.
+# return :: Int
+def get_int(match_strL):
+    assert len(match_strL) == 1
+    return int(match_strL[0])
+
 # match_strL :: [String] # length must be 3.
 # return :: [Int] # length is 3.
 def get_int3(match_strL):
@@ -217,27 +248,71 @@ def get_true(match_strL):
 def get_string(match_strL):
     return match_strL[0]
 
+# Causes of gc are a few strings repeated in every event,
+# so they are interned to share one object per category.
+# match_strL :: [String] # length must be 1.
+# return :: String
+def get_intern(match_strL):
+    assert len(match_strL) == 1
+    return intern(match_strL[0])
+
 
 ################################################################################
 # Regexp aliases.
 ################################################################################
 
-regexp_timestamp = r"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d+\.\d+\+\d{4}"
+regexp_timestamp = r"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d+\.\d+[+-]\d{4}"
 regexp_float = r"(\d+\.\d+)"
 regexp_heap_info = regexp_float + r"\s\(" + regexp_float + r"\s\)->" + \
                    regexp_float + r"\s\(" + regexp_float + r"\s\)\s*"
+regexp_heap_mb = r"(\d+)M->(\d+)M\((\d+)M\)"
 regexp_basic_string = r"([0-9a-zA-Z_-]+)"
+# Notes of a phase, e.g. "(process weakrefs) (unload classes) "
+regexp_phase_notes = r"(?:\([^()]*\)\s)*"
 
 
 ################################################################################
 # Parsers for gc log entries.
 ################################################################################
 
+"""
+Decorators at the head of every line.
+e.g. [2021-09-10T15:23:34.217+0800][123.534s][76035][info]
+     [2021-09-10T15:23:34.217+0800][123.534s][76035][info][gc,marking  ]
+
+This is shared by all the events. Its steps are compiled from the
+decorators of -Xlog by setLayout, and replaced in place so that the
+events need not be rebuilt for another layout.
+Time goes to "utc" and uptime to "end_sec" (see gclog_unified.py).
+Any level is accepted here. Levels and tags are selected before the
+grammar in every backend (info and UNIFIED_TAGS by default, see iterGcLog).
+
+"""
+parseUnifiedHeader = andP([])
+
+"""
+Set the decorator layout of the logs to parse.
+
+spec :: String # decorators of -Xlog, e.g. "utctime,uptimemillis,pid,tid,level"
+
+"""
+def setLayout(spec):
+    steps = []
+    for (name, regexStr, modifier) in gclog_unified.layoutSteps(spec):
+        p = newP(regexStr, modifier)
+        p.decorator = name
+        steps.append(p)
+    parseUnifiedHeader.parsers[:] = steps
+
+setLayout(gclog_unified.DEFAULT_LAYOUT)
+
+# The gc id after the decorators, e.g. " GC(33) ".
+parseGcId = newP(r"\sGC\((\d+)\)\s", mkDictModifier("gc_id", get_int))
+
 parseSheConcReset = andP([
         mkTagger("type", "She Conc Reset"),
-        newP(r"\[(" + regexp_timestamp + r")\]", mkDictModifier("utc", get_string)),
-        newP(r"\[" + regexp_float + r"s\]", mkDictModifier("end_sec", get_float)),
-        newP(r"\[\d+\]\[info\]\sGC\(\d+\)\s", None),
+        parseUnifiedHeader,
+        parseGcId,
         newP(r"Concurrent\sreset\s", None),
         newP(regexp_float + r"ms$", mkDictModifier("dur_ms", get_float)),
     ])
@@ -250,10 +325,9 @@ if __debug__:
 
 parseShePauseInitMark = andP([
         mkTagger("type", "She Pause Init Mark"),
-        newP(r"\[(" + regexp_timestamp + r")\]", mkDictModifier("utc", get_string)),
-        newP(r"\[" + regexp_float + r"s\]", mkDictModifier("end_sec", get_float)),
-        newP(r"\[\d+\]\[info\]\sGC\(\d+\)\s", None),
-        newP(r"Pause\sInit\sMark\s" + regexp_float + r"ms$", mkDictModifier("dur_ms", get_float)),
+        parseUnifiedHeader,
+        parseGcId,
+        newP(r"Pause\sInit\sMark\s" + regexp_phase_notes + regexp_float + r"ms$", mkDictModifier("dur_ms", get_float)),
     ])
 if __debug__:
     text = r"[2021-12-04T01:36:06.008+0800][2079.224s][9113 ][info] GC(1247) Pause Init Mark 2.837ms"
@@ -264,10 +338,9 @@ if __debug__:
 
 parseSheConcMark = andP([
         mkTagger("type", "She Conc Mark"),
-        newP(r"\[(" + regexp_timestamp + r")\]", mkDictModifier("utc", get_string)),
-        newP(r"\[" + regexp_float + r"s\]", mkDictModifier("end_sec", get_float)),
-        newP(r"\[\d+\]\[info\]\sGC\(\d+\)\s", None),
-        newP(r"Concurrent\smarking\s" + regexp_float + r"ms$", mkDictModifier("dur_ms", get_float)),
+        parseUnifiedHeader,
+        parseGcId,
+        newP(r"Concurrent\smarking\s" + regexp_phase_notes + regexp_float + r"ms$", mkDictModifier("dur_ms", get_float)),
     ])
 if __debug__:
     text = r"[2021-12-04T01:36:07.200+0800][2080.416s][9112 ][info] GC(1247) Concurrent marking 1191.750ms"
@@ -278,10 +351,9 @@ if __debug__:
 
 parseShePauseFinalMark = andP([
         mkTagger("type", "She Pause Final Mark"),
-        newP(r"\[(" + regexp_timestamp + r")\]", mkDictModifier("utc", get_string)),
-        newP(r"\[" + regexp_float + r"s\]", mkDictModifier("end_sec", get_float)),
-        newP(r"\[\d+\]\[info\]\sGC\(\d+\)\s", None),
-        newP(r"Pause\sFinal\sMark\s" + regexp_float + r"ms$", mkDictModifier("dur_ms", get_float)),
+        parseUnifiedHeader,
+        parseGcId,
+        newP(r"Pause\sFinal\sMark\s" + regexp_phase_notes + regexp_float + r"ms$", mkDictModifier("dur_ms", get_float)),
     ])
 if __debug__:
     text = r"[2021-12-04T01:36:18.177+0800][2091.393s][9113 ][info] GC(1258) Pause Final Mark 3.618ms"
@@ -292,10 +364,11 @@ if __debug__:
 
 parseSheConcCleanup = andP([
         mkTagger("type", "She Conc Cleanup"),
-        newP(r"\[(" + regexp_timestamp + r")\]", mkDictModifier("utc", get_string)),
-        newP(r"\[" + regexp_float + r"s\]", mkDictModifier("end_sec", get_float)),
-        newP(r"\[\d+\]\[info\]\sGC\(\d+\)\s", None),
-        newP(r"Concurrent\scleanup\s.+M\)\s" + regexp_float + r"ms$", mkDictModifier("dur_ms", get_float)),
+        parseUnifiedHeader,
+        parseGcId,
+        newP(r"Concurrent\scleanup\s", None),
+        newP(regexp_heap_mb + r"\s", mkDictModifier("heap_mb", get_int3)),
+        newP(regexp_float + r"ms$", mkDictModifier("dur_ms", get_float)),
     ])
 if __debug__:
     text = r"[2021-12-04T01:36:18.178+0800][2091.393s][9112 ][info] GC(1258) Concurrent cleanup 9386M->9536M(16384M) 0.255ms"
@@ -306,9 +379,8 @@ if __debug__:
 
 parseSheConcEvac = andP([ \
         mkTagger("type", "She Conc Evacuation"), \
-        newP(r"\[(" + regexp_timestamp + r")\]", mkDictModifier("utc", get_string)),
-        newP(r"\[" + regexp_float + r"s\]", mkDictModifier("end_sec", get_float)),
-        newP(r"\[\d+\]\[info\]\sGC\(\d+\)\s", None),
+        parseUnifiedHeader,
+        parseGcId,
         newP(r"Concurrent\sevacuation\s" + regexp_float + r"ms$", mkDictModifier("dur_ms", get_float)),
     ])
 if __debug__:
@@ -320,9 +392,8 @@ if __debug__:
 
 parseShePauseInitUpdateRefs = andP([
         mkTagger("type", "She Pause Init Update Refs"),
-        newP(r"\[(" + regexp_timestamp + r")\]", mkDictModifier("utc", get_string)),
-        newP(r"\[" + regexp_float + r"s\]", mkDictModifier("end_sec", get_float)),
-        newP(r"\[\d+\]\[info\]\sGC\(\d+\)\s", None),
+        parseUnifiedHeader,
+        parseGcId,
         newP(r"Pause\sInit\sUpdate\sRefs\s" + regexp_float + r"ms$", mkDictModifier("dur_ms", get_float)),
     ])
 if __debug__:
@@ -334,9 +405,8 @@ if __debug__:
 
 parseSheConcUpdateRefs = andP([
         mkTagger("type", "She Conc Update Refs"),
-        newP(r"\[(" + regexp_timestamp + r")\]", mkDictModifier("utc", get_string)),
-        newP(r"\[" + regexp_float + r"s\]", mkDictModifier("end_sec", get_float)),
-        newP(r"\[\d+\]\[info\]\sGC\(\d+\)\s", None),
+        parseUnifiedHeader,
+        parseGcId,
         newP(r"Concurrent\supdate\sreferences\s" + regexp_float + r"ms$", mkDictModifier("dur_ms", get_float)),
     ])
 if __debug__:
@@ -348,9 +418,8 @@ if __debug__:
 
 parseShePauseFinalUpdateRefs = andP([
         mkTagger("type", "She Pause Final Update Refs"),
-        newP(r"\[(" + regexp_timestamp + r")\]", mkDictModifier("utc", get_string)),
-        newP(r"\[" + regexp_float + r"s\]", mkDictModifier("end_sec", get_float)),
-        newP(r"\[\d+\]\[info\]\sGC\(\d+\)\s", None),
+        parseUnifiedHeader,
+        parseGcId,
         newP(r"Pause\sFinal\sUpdate\sRefs\s" + regexp_float + r"ms$", mkDictModifier("dur_ms", get_float)),
     ])
 if __debug__:
@@ -362,14 +431,43 @@ if __debug__:
 
 parseShePauseFull = andP([
         mkTagger("type", "She Pause Full"),
-        newP(r"\[(" + regexp_timestamp + r")\]", mkDictModifier("utc", get_string)),
-        newP(r"\[" + regexp_float + r"s\]", mkDictModifier("end_sec", get_float)),
-        newP(r"\[\d+\]\[info\]\sGC\(\d+\)\s", None),
-        newP(r"Pause\sFull\s.+M\)\s" + regexp_float + r"ms$", mkDictModifier("dur_ms", get_float)),
+        parseUnifiedHeader,
+        parseGcId,
+        newP(r"Pause\sFull\s", None),
+        newP(regexp_heap_mb + r"\s", mkDictModifier("heap_mb", get_int3)),
+        newP(regexp_float + r"ms$", mkDictModifier("dur_ms", get_float)),
     ])
 if __debug__:
     text = r"[2021-12-03T22:17:35.493+0800][122.471s][77549][info] GC(18) Pause Full 15546M->5928M(16384M) 2699.792ms"
-    (ret, data) = parseShePauseInitUpdateRefs(text, {})
+    (ret, data) = parseShePauseFull(text, {})
+    print text
+    print len(ret)
+    print data
+
+parseShePauseDegenerated = andP([
+        mkTagger("type", "She Pause Degenerated"),
+        parseUnifiedHeader,
+        parseGcId,
+        newP(r"Pause\sDegenerated\sGC\s\(([^()]+)\)\s", mkDictModifier("degen_point", get_intern)),
+        newP(regexp_heap_mb + r"\s", mkDictModifier("heap_mb", get_int3)),
+        newP(regexp_float + r"ms$", mkDictModifier("dur_ms", get_float)),
+    ])
+if __debug__:
+    text = r"[2021-12-03T22:17:32.793+0800][119.771s][77549][info] GC(18) Pause Degenerated GC (Mark) 16327M->15546M(16384M) 812.094ms"
+    (ret, data) = parseShePauseDegenerated(text, {})
+    print text
+    print len(ret)
+    print data
+
+parseSheCancel = andP([
+        mkTagger("type", "She Cancel"),
+        parseUnifiedHeader,
+        parseGcId,
+        newP(r"Cancelling\sGC:\s(.+?)\s*$", mkDictModifier("cause", get_intern)),
+    ])
+if __debug__:
+    text = r"[2021-12-03T22:17:31.981+0800][118.959s][77548][info] GC(18) Cancelling GC: Allocation Failure"
+    (ret, data) = parseSheCancel(text, {})
     print text
     print len(ret)
     print data
@@ -396,6 +494,8 @@ Events:
   ConcUpdateRefs
   PauseFinalUpdateRefs
   PauseFull
+  PauseDegenerated
+  Cancel
 """
 parseJavaGcLog = orP([
         parseSheConcReset,
@@ -408,8 +508,134 @@ parseJavaGcLog = orP([
         parseSheConcUpdateRefs,
         parseShePauseFinalUpdateRefs,
         parseShePauseFull,
+        parseShePauseDegenerated,
+        parseSheCancel,
     ])
 
+# Literals one of which is in every line parseJavaGcLog parses.
+# Lines without any of them are rejected by gclog_prefilter.py.
+PREFILTER_LITERALS = (" GC(",)
+
+# Tag sets of the lines parseJavaGcLog parses, in the form of -Xlog.
+# Lines with other tags are skipped when the tags decorator is logged.
+UNIFIED_TAGS = "gc"
+
+
+################################################################################
+# Cycles.
+################################################################################
+
+# Events of a cycle: type -> (field of its time, 'conc' | 'pause' | None).
+CYCLE_PHASES = {
+    "She Conc Reset": ("conc_reset_ms", 'conc'),
+    "She Pause Init Mark": ("pause_init_mark_ms", 'pause'),
+    "She Conc Mark": ("conc_mark_ms", 'conc'),
+    "She Pause Final Mark": ("pause_final_mark_ms", 'pause'),
+    "She Conc Cleanup": ("conc_cleanup_ms", 'conc'),
+    "She Conc Evacuation": ("conc_evac_ms", 'conc'),
+    "She Pause Init Update Refs": ("pause_init_update_refs_ms", 'pause'),
+    "She Conc Update Refs": ("conc_update_refs_ms", 'conc'),
+    "She Pause Final Update Refs": ("pause_final_update_refs_ms", 'pause'),
+    "She Pause Degenerated": ("pause_degenerated_ms", 'pause'),
+    "She Pause Full": ("pause_full_ms", 'pause'),
+    "She Cancel": (None, None),
+}
+
+# Gc ids whose cycles are open at most.
+MAX_OPEN_CYCLES = 4
+
+"""
+A new cycle of a gc id.
+
+gcId :: Int
+return :: Dictionary
+
+"""
+def newCycle(gcId):
+    return {"type": "She Cycle", "gc_id": gcId, "phases": 0,
+            "conc_ms": 0.0, "pause_ms": 0.0, "pauses": 0,
+            "outcome": "concurrent", "cancelled": False}
+
+"""
+Add an event to its cycle.
+
+cycle :: Dictionary # of newCycle.
+data :: Dictionary
+
+"""
+def addToCycle(cycle, data):
+    (key, kind) = CYCLE_PHASES[data["type"]]
+    cycle["phases"] += 1
+    if "end_sec" in data:
+        end = data["end_sec"]
+        start = end - data.get("dur_ms", 0.0) / 1000.0
+        if "start_sec" not in cycle or start < cycle["start_sec"]:
+            cycle["start_sec"] = start
+        if "end_sec" not in cycle or end >= cycle["end_sec"]:
+            cycle["end_sec"] = end
+            if "utc" in data:
+                cycle["utc"] = data["utc"]
+    if key is not None:
+        # e.g. the two Concurrent cleanups of a cycle are summed.
+        cycle[key] = cycle.get(key, 0.0) + data["dur_ms"]
+        cycle[kind + "_ms"] += data["dur_ms"]
+        if kind == 'pause':
+            cycle["pauses"] += 1
+    if "heap_mb" in data:
+        cycle["heap_mb"] = data["heap_mb"]
+    t = data["type"]
+    if t == "She Cancel":
+        cycle["cancelled"] = True
+        cycle["cancel_cause"] = data["cause"]
+    elif t == "She Pause Degenerated":
+        if cycle["outcome"] != "full":
+            cycle["outcome"] = "degenerated"
+        cycle["degen_point"] = data["degen_point"]
+    elif t == "She Pause Full":
+        cycle["outcome"] = "full"
+
+"""
+Reduce the phases of each gc id to one cycle, lazily.
+
+A cycle is given when an event of a later gc id comes, as Shenandoah
+runs one cycle at a time, so at most maxOpen cycles are held (more only
+for logs out of order, whose oldest cycles are then given early).
+A cycle has
+    gc_id, start_sec, end_sec, utc    of its first and last events.
+    conc_ms, pause_ms, pauses         total times of its phases.
+    ${phase}_ms                       time of each phase (CYCLE_PHASES).
+    heap_mb                           of its last event with heap.
+    outcome                           "concurrent", "degenerated" or "full".
+    cancelled, cancel_cause           Cancelling GC: ${cause}.
+    degen_point                       e.g. "Mark" of a degenerated gc.
+Events without a gc id or not of a cycle are given as they are.
+
+events :: Iterable Dictionary
+maxOpen :: Int
+return :: Generator Dictionary
+
+"""
+def iterCycles(events, maxOpen=MAX_OPEN_CYCLES):
+    cycles = OrderedDict()
+    latest = None
+    for data in events:
+        gcId = data.get("gc_id")
+        if gcId is None or data["type"] not in CYCLE_PHASES:
+            yield data
+            continue
+        if latest is None or gcId > latest:
+            for k in [k for k in cycles if k < gcId]:
+                yield cycles.pop(k)
+            latest = gcId
+        cycle = cycles.get(gcId)
+        if cycle is None:
+            if len(cycles) >= maxOpen:
+                yield cycles.popitem(last=False)[1]
+            cycle = cycles[gcId] = newCycle(gcId)
+        addToCycle(cycle, data)
+    for cycle in cycles.itervalues():
+        yield cycle
+
 
 ################################################################################
 # Parser of list of integer. This is for test.
@@ -462,33 +688,105 @@ if __debug__:
 # main
 ################################################################################
 
-dirs = sys.argv[1]
-allfiles = os.listdir(dirs)
-files = []
-for f in allfiles:
-    if f.startswith('gc_She') and f.endswith('log'):
-        files.append(f)
-
-for file in files:
-    print(file)
-    with open(dirs+file,'r') as fd:
-        data_prev = None
-        output = []
-        for line in fd.readlines():
-            try:
-                text = line.rstrip()
-                #print texts
-                (ret, data) = parseJavaGcLog(text, {})
-                #print(file)
-                if __debug__:
-                    print ("len: %d" % len(ret))
-                # print json.dumps(data)
-                output.append(data)
-            except ParseError, msg:
-                #print msg
-                #print ("###%s" % text)
-                pass
-        with open(dirs+file[0:-3]+'json','w') as fd:
-            fd.write(json.dumps(output))
+"""
+Parse lines of a gc log lazily.
+
+lines :: Iterable String
+unparsed :: ((String, ParseError) -> ANY) | None # called for lines failed to parse.
+parser :: Parser | None # parseJavaGcLog by default, or a wrapper of it
+                        # such as gclog_cache.mkShapeCache.
+levels :: String | [String] | None # levels selected (see gclog_unified.py),
+                                   # None if parser selects the lines itself.
+tags :: String | [String] | None # tag sets selected, None selects all tags.
+return :: Generator Dictionary
+
+"""
+def iterGcLog(lines, unparsed=None, parser=None, levels=gclog_unified.DEFAULT_LEVELS, tags=UNIFIED_TAGS):
+    if parser is None:
+        parser = parseJavaGcLog
+    if levels is not None:
+        parser = gclog_unified.mkDecoratorFilter(parser, ParseError, levels, tags)
+    for line in lines:
+        text = line.rstrip()
+        try:
+            (ret, data) = parser(text, {})
+        except ParseError, msg:
+            if unparsed is not None:
+                unparsed(text, msg)
+            continue
+        yield data
+
+def process_file_chunk(filename, cycles=False, levels=gclog_unified.DEFAULT_LEVELS, tags=UNIFIED_TAGS):
+    scan = gclog_chunk.mkChunkScanner(parseJavaGcLog,
+        accept=gclog_unified.mkDecoratorAccept(levels, tags))
+    stats = {}
+    with open(dirs+filename,'rb') as fd:
+        output = scan(fd, stats)
+        output = list(iterCycles(output) if cycles else output)
+    if __debug__:
+        print stats
+    with open(dirs+filename[0:-3]+'json','w') as fd:
+        fd.write(json.dumps(output))
+
+def process_file_numpy(filename, cycles=False, levels=gclog_unified.DEFAULT_LEVELS, tags=UNIFIED_TAGS):
+    scan = gclog_unified.mkHeaderScanner(parseJavaGcLog, parseUnifiedHeader,
+        accept=gclog_unified.mkDecoratorAccept(levels, tags))
+    stats = {}
+    output = scan(dirs+filename, stats)
+    output = list(iterCycles(output) if cycles else output)
+    if __debug__:
+        print stats
+    with open(dirs+filename[0:-3]+'json','w') as fd:
+        fd.write(json.dumps(output))
+
+def process_file(filename, backend='line', levels=gclog_unified.DEFAULT_LEVELS, tags=UNIFIED_TAGS,
+                 layout=None, cycles=False):
+    if layout == 'auto':
+        with open(dirs+filename,'r') as fd:
+            layout = gclog_unified.detectLayout(fd)
+    if layout is not None:
+        setLayout(layout)
+    if backend == 'numpy' and gclog_unified.np is None:
+        print('numpy is not installed, using the chunk backend')
+        backend = 'chunk'
+    if backend == 'numpy':
+        try:
+            return process_file_numpy(filename, cycles, levels, tags)
+        except ValueError, msg:
+            print('%s, using the chunk backend' % msg)
+            backend = 'chunk'
+    if backend == 'chunk':
+        return process_file_chunk(filename, cycles, levels, tags)
+    parse = gclog_unified.mkDecoratorFilter(parseJavaGcLog, ParseError, levels, tags)
+    with open(dirs+filename,'r') as fd:
+        output = iterGcLog(fd, parser=parse, levels=None)
+        output = list(iterCycles(output) if cycles else output)
+    if __debug__:
+        print parse.stats
+    with open(dirs+filename[0:-3]+'json','w') as fd:
+        fd.write(json.dumps(output))
+
+if __name__=='__main__':
+    import gclog_pipe
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    if gclog_pipe.isPipe(sys.argv[1:]):
+        reduce = iterCycles if '--cycles' in sys.argv[1:] else None
+        gclog_pipe.runPipe(sys.modules[__name__], sys.argv[1:], reduce)
+        exit(0)
+    opts = dict((a[2:].split('=', 1) + [None])[:2] for a in sys.argv[1:] if a.startswith('--'))
+    dirs = args[0]
+    backend = args[1] if len(args) > 1 else 'line'
+    levels = opts.get('levels') or gclog_unified.DEFAULT_LEVELS
+    tags = opts.get('tags') or UNIFIED_TAGS
+    layout = opts.get('layout')
+    allfiles = os.listdir(dirs)
+    files = []
+    for f in allfiles:
+        if f.startswith('gc_She') and f.endswith('log'):
+            files.append(f)
+
+    for file in files:
+        print(file)
+        process_file(file, backend, levels, tags, layout, 'cycles' in opts)
 
 # end of file.
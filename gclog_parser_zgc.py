@@ -0,0 +1,746 @@
+# coding: utf-8
+
+#!/usr/bin/python -O 
+
+import re
+import sys, os
+import json
+import time
+import gclog_chunk
+import gclog_unified
+
+"""
+This is a parser of ZGC log of OpenJDK17.
+
+Required JVM option: 
+    -XX:+UseZGC 
+    -Xlog:gc*:file=gc.log:time,uptime,tid,level
+
+Usage:
+    python2 -O this.py < ${GC_LOG_FILE} | ${YOUR_ANALYZER}
+    # One JSON object per event, flushed every --batch=N events or
+    # --latency=SECS seconds (see gclog_pipe.py).
+    python2 -O this.py gclog_dir [line|chunk|numpy]
+    # If there are gc1.log and gc2.log in gclog_dir,
+    # it will save the results in files gc1.log.json and gc2.log.json respectively.
+    # The second argument selects the backend (default: line).
+    # chunk scans 16MB buffers with fused patterns (see gclog_chunk.py).
+    # numpy also decodes the headers of all lines at once (see gclog_unified.py).
+    # --levels=info,debug and --tags=gc,gc+phases select the lines given to
+    # the grammar by their decorators (see gclog_unified.py).
+    # --layout=uptime,level,tags gives the decorators of -Xlog
+    # (default: time,uptime,tid,level,tags), and --layout=auto detects them.
+    python2 -O this.py bench [CYCLES]
+    # Throughput of the grammar on CYCLES generated gc cycles (see benchGrammar).
+
+You can get all data as a python dictionary structure
+in your analyer as follows:
+
+import sys
+import json
+
+list = []
+for line in sys.stdin:
+    line.rstrip()
+    list.append(dict(json.loads(line)))
+        
+"""
+
+################################################################################
+# Parser generator from regular expression.
+################################################################################
+
+"""
+Generate a parser from regex pattern and modifier.
+
+Parser try to match input text by the pattern.
+If matched, call data_modifier with list of matched strings.
+The modifier add/update tag_str of the dictionary.
+
+regexStr :: String
+dataModifier :: (a, [String]) -> a | None
+return :: (String, a) -> (String, a)
+a :: ANY
+
+dataModifier must not throw exceptions.
+When some errors occur inside dataModifier, a must be not modified.
+
+"""
+def newP(regexStr, dataModifier):
+    p = re.compile("(^%s)" % regexStr)
+    def parse_(line, data):
+        m = p.match(line)
+        if m:
+            if dataModifier is not None:
+                data = dataModifier(data, m.groups()[1:])
+            return (line[len(m.group(1)):], data)
+        else:
+            msg = "Parse failed: pattern \"%s\" for \"%s\"" % (regexStr, line)
+            raise ParseError(msg)
+    # Kept for compilers of the grammar (see gclog_chunk.py).
+    parse_.regexStr = regexStr
+    parse_.dataModifier = dataModifier
+    return parse_
+
+################################################################################
+# Utilities.
+################################################################################
+
+"""
+Just modify data during parse.
+
+dataModifier :: (a, [String]) -> a
+return :: (String, a) -> (String, a)
+a :: ANY
+
+"""
+def appP(dataModifier):
+    def modify_(line, data):
+        if dataModifier is not None:
+            data = dataModifier(data)
+        return (line, data)
+    return modify_
+
+
+# [String] -> String
+def toString(strL):
+    ret = "[%s" % strL[0]
+    for str in strL[1:]:
+        ret += ", %s" % str
+    ret += "]"
+    return ret
+
+
+# Error type for parser.
+class ParseError(Exception):
+    pass
+
+
+################################################################################
+# Parser combinators.
+################################################################################
+
+"""
+Parser combinator AND.
+
+parsers :: [Parser]
+return :: Parser
+
+"""
+def andP(parsers):
+    def parseAnd_(text, data):
+        text0 = text
+        data0 = data
+        for parser in parsers:
+            (text1, data1) = parser(text0, data0)
+            text0 = text1
+            data0 = data1
+        return (text0, data0)
+    parseAnd_.combinator = 'and'
+    parseAnd_.parsers = parsers
+    return parseAnd_
+
+"""
+Parser combinator OR.
+
+parsers :: [Parser]
+return :: Parser
+
+"""
+def orP(parsers):
+    def parseOr_(text, data):
+        msgL = []
+        for parser in parsers:
+            try:
+                (ret_text, ret_data) = parser(text, data)
+                return (ret_text, ret_data)
+            except ParseError, msg:
+                msgL.append(msg)
+        msgs = toString(msgL)
+        raise ParseError(msgs)
+    parseOr_.combinator = 'or'
+    parseOr_.parsers = parsers
+    return parseOr_
+
+"""
+Parser combinator MANY.
+parsers :: [Parser]
+return :: Parser
+
+"""
+def manyP(parser):
+    def parseMany_(text, data):
+        text0 = text
+        data0 = data
+        text1 = text
+        data1 = data
+        try:
+            while True:
+                (text1, data1) = parser(text0, data0)
+                text0 = text1
+                data0 = data1
+        except ParseError, msg:
+            if __debug__:
+                print msg
+        return (text1, data1)
+    return parseMany_
+
+
+################################################################################
+# Utilities.
+################################################################################
+
+"""
+A modifier for dictionary data.
+
+tagStr :: String
+dataConstructor :: [String] -> ANY
+return :: (Dictionary, [String]) -> Dictionary
+
+"""
+def mkDictModifier(tagStr, dataConstructor):
+    def modifyNothing_(dictData, matchStringL):
+        return dictData
+    if tagStr is None or dataConstructor is None:
+        return modifyNothing_
+    def modifyDict_(dictData, matchStringL):
+        dictData[tagStr] = dataConstructor(matchStringL)
+        return dictData
+    return modifyDict_
+
+"""
+Behave like newP but that parses anything, just modify dictionary.
+
+key :: String
+value :: ANY
+return :: (String, Dictionary) -> (String, Dictionary)
+
+"""
+def mkTagger(key, value):
+    def tagger_(line, dictData):
+        dictData[key] = value
+        return (line, dictData)
+    tagger_.tagKey = key
+    tagger_.tagValue = value
+    return tagger_
+
+
+# match_strL :: [String] # length must be 1.
+# return :: Float
+def get_float(match_strL):
+    assert len(match_strL) == 1
+    return float(match_strL[0])
+
+# match_strL :: [String] # length must be 1.
+# return :: Int 
+def get_int(match_strL):
+    assert len(match_strL) == 1
+    return int(match_strL[0])
+
+# match_strL :: [String] # length must be 3.
+# return :: [Int] # length is 3.
+def get_int3(match_strL):
+    assert len(match_strL) == 3
+    return [int(match_strL[0]), int(match_strL[1]), int(match_strL[2])]
+
+# match_strL :: [String]
+# return :: True
+def get_true(match_strL):
+    return True
+
+# match_strL :: [String]
+# return :: String
+def get_string(match_strL):
+    return match_strL[0]
+
+# Causes of gc are a few strings repeated in every event,
+# so they are interned to share one object per category.
+# match_strL :: [String] # length must be 1.
+# return :: String
+def get_intern(match_strL):
+    assert len(match_strL) == 1
+    return intern(match_strL[0])
+
+"""
+A modifier for the heap used before and after a gc.
+
+return :: (Dictionary, [String]) -> Dictionary
+          # [before, before %, after, after %]
+
+"""
+def mkUsedModifier():
+    def modifyUsed_(dictData, matchStringL):
+        dictData["used_mb"] = [int(matchStringL[0]), int(matchStringL[2])]
+        dictData["used_pct"] = [int(matchStringL[1]), int(matchStringL[3])]
+        return dictData
+    return modifyUsed_
+
+
+################################################################################
+# Regexp aliases.
+################################################################################
+
+regexp_float = r"(\d+\.\d+)"
+# 6254M(38%)->1310M(8%)
+regexp_used_mb = r"(\d+)M\((\d+)%\)->(\d+)M\((\d+)%\)"
+# (Warmup), (Allocation Rate), (System.gc())
+regexp_cause = r"\(((?:[^()]|\(\))+)\)"
+
+
+################################################################################
+# Parsers for gc log entries.
+################################################################################
+
+"""
+Decorators at the head of every line.
+e.g. [2021-09-10T15:23:34.217+0800][123.534s][76035][info]
+     [2021-09-10T15:23:34.217+0800][123.534s][76035][info][gc,marking  ]
+
+This is shared by all the events. Its steps are compiled from the
+decorators of -Xlog by setLayout, and replaced in place so that the
+events need not be rebuilt for another layout.
+Time goes to "utc" and uptime to "end_sec" (see gclog_unified.py).
+Any level is accepted here. Levels and tags are selected before the
+grammar in every backend (info and UNIFIED_TAGS by default, see iterGcLog).
+
+"""
+parseUnifiedHeader = andP([])
+
+"""
+Set the decorator layout of the logs to parse.
+
+spec :: String # decorators of -Xlog, e.g. "utctime,uptimemillis,pid,tid,level"
+
+"""
+def setLayout(spec):
+    steps = []
+    for (name, regexStr, modifier) in gclog_unified.layoutSteps(spec):
+        p = newP(regexStr, modifier)
+        p.decorator = name
+        steps.append(p)
+    parseUnifiedHeader.parsers[:] = steps
+
+setLayout(gclog_unified.DEFAULT_LAYOUT)
+
+# The gc id after the decorators, e.g. " GC(102) ".
+parseGcId = newP(r"\sGC\((\d+)\)\s", mkDictModifier("gc_id", get_int))
+
+parseZPauseMarkStart = andP([
+        mkTagger("type", "ZGC Pause Mark Start"),
+        parseUnifiedHeader,
+        parseGcId,
+        newP(r"Pause\sMark\sStart\s" + regexp_float + r"ms$", mkDictModifier("dur_ms", get_float)),
+    ])
+if __debug__:
+    text = r"[2023-03-01T10:15:42.318+0800][3051.620s][21488][info] GC(102) Pause Mark Start 0.012ms"
+    (ret, data) = parseZPauseMarkStart(text, {})
+    print text
+    print len(ret)
+    print data
+
+parseZConcMark = andP([
+        mkTagger("type", "ZGC Concurrent Mark"),
+        parseUnifiedHeader,
+        parseGcId,
+        newP(r"Concurrent\sMark\s" + regexp_float + r"ms$", mkDictModifier("dur_ms", get_float)),
+    ])
+if __debug__:
+    text = r"[2023-03-01T10:15:42.318+0800][3051.620s][21488][info] GC(102) Concurrent Mark 152.431ms"
+    (ret, data) = parseZConcMark(text, {})
+    print text
+    print len(ret)
+    print data
+
+parseZPauseMarkEnd = andP([
+        mkTagger("type", "ZGC Pause Mark End"),
+        parseUnifiedHeader,
+        parseGcId,
+        newP(r"Pause\sMark\sEnd\s" + regexp_float + r"ms$", mkDictModifier("dur_ms", get_float)),
+    ])
+if __debug__:
+    text = r"[2023-03-01T10:15:42.318+0800][3051.620s][21488][info] GC(102) Pause Mark End 0.021ms"
+    (ret, data) = parseZPauseMarkEnd(text, {})
+    print text
+    print len(ret)
+    print data
+
+parseZConcProcessNonStrongRefs = andP([
+        mkTagger("type", "ZGC Concurrent Process Non-Strong References"),
+        parseUnifiedHeader,
+        parseGcId,
+        newP(r"Concurrent\sProcess\sNon-Strong\sReferences\s" + regexp_float + r"ms$", mkDictModifier("dur_ms", get_float)),
+    ])
+if __debug__:
+    text = r"[2023-03-01T10:15:42.318+0800][3051.620s][21488][info] GC(102) Concurrent Process Non-Strong References 8.314ms"
+    (ret, data) = parseZConcProcessNonStrongRefs(text, {})
+    print text
+    print len(ret)
+    print data
+
+parseZConcSelectRelocationSet = andP([
+        mkTagger("type", "ZGC Concurrent Select Relocation Set"),
+        parseUnifiedHeader,
+        parseGcId,
+        newP(r"Concurrent\sSelect\sRelocation\sSet\s" + regexp_float + r"ms$", mkDictModifier("dur_ms", get_float)),
+    ])
+if __debug__:
+    text = r"[2023-03-01T10:15:42.318+0800][3051.620s][21488][info] GC(102) Concurrent Select Relocation Set 5.102ms"
+    (ret, data) = parseZConcSelectRelocationSet(text, {})
+    print text
+    print len(ret)
+    print data
+
+parseZPauseRelocateStart = andP([
+        mkTagger("type", "ZGC Pause Relocate Start"),
+        parseUnifiedHeader,
+        parseGcId,
+        newP(r"Pause\sRelocate\sStart\s" + regexp_float + r"ms$", mkDictModifier("dur_ms", get_float)),
+    ])
+if __debug__:
+    text = r"[2023-03-01T10:15:42.318+0800][3051.620s][21488][info] GC(102) Pause Relocate Start 0.010ms"
+    (ret, data) = parseZPauseRelocateStart(text, {})
+    print text
+    print len(ret)
+    print data
+
+parseZConcRelocate = andP([
+        mkTagger("type", "ZGC Concurrent Relocate"),
+        parseUnifiedHeader,
+        parseGcId,
+        newP(r"Concurrent\sRelocate\s" + regexp_float + r"ms$", mkDictModifier("dur_ms", get_float)),
+    ])
+if __debug__:
+    text = r"[2023-03-01T10:15:42.318+0800][3051.620s][21488][info] GC(102) Concurrent Relocate 48.775ms"
+    (ret, data) = parseZConcRelocate(text, {})
+    print text
+    print len(ret)
+    print data
+
+"""
+Summary of a gc at its end.
+e.g. GC(102) Garbage Collection (Allocation Rate) 6254M(38%)->1310M(8%)
+
+ZGC gives no capacity here, so the heap used before and after goes to
+used_mb [before, after], and its share of the max heap to used_pct.
+
+"""
+parseZGarbageCollection = andP([
+        mkTagger("type", "ZGC Garbage Collection"),
+        parseUnifiedHeader,
+        parseGcId,
+        newP(r"Garbage\sCollection\s", None),
+        newP(regexp_cause + r"\s", mkDictModifier("cause", get_intern)),
+        newP(regexp_used_mb + r"$", mkUsedModifier()),
+    ])
+if __debug__:
+    text = r"[2023-03-01T10:15:42.318+0800][3051.620s][21488][info] GC(102) Garbage Collection (Allocation Rate) 6254M(38%)->1310M(8%)"
+    (ret, data) = parseZGarbageCollection(text, {})
+    print text
+    print len(ret)
+    print data
+
+"""
+A thread stalled until a gc freed memory.
+e.g. Allocation Stall (http-nio-8080-exec-12) 23.918ms
+     GC(103) Allocation Stall (http-nio-8080-exec-12) 23.918ms
+
+Only some releases print the gc id. This is not a pause of the JVM but
+of one thread, whose name goes to "thread".
+
+"""
+parseZAllocationStall = andP([
+        mkTagger("type", "ZGC Allocation Stall"),
+        parseUnifiedHeader,
+        newP(r"\sAllocation\sStall\s\((.+)\)\s", mkDictModifier("thread", get_string)),
+        newP(regexp_float + r"ms$", mkDictModifier("dur_ms", get_float)),
+    ])
+if __debug__:
+    text = r"[2023-03-01T10:15:42.318+0800][3051.620s][21488][info] Allocation Stall (http-nio-8080-exec-12) 23.918ms"
+    (ret, data) = parseZAllocationStall(text, {})
+    print text
+    print len(ret)
+    print data
+
+parseZAllocationStallGcId = andP([
+        mkTagger("type", "ZGC Allocation Stall"),
+        parseUnifiedHeader,
+        parseGcId,
+        newP(r"Allocation\sStall\s\((.+)\)\s", mkDictModifier("thread", get_string)),
+        newP(regexp_float + r"ms$", mkDictModifier("dur_ms", get_float)),
+    ])
+if __debug__:
+    text = r"[2023-03-01T10:15:42.318+0800][3051.620s][21488][info] GC(103) Allocation Stall (http-nio-8080-exec-12) 23.918ms"
+    (ret, data) = parseZAllocationStallGcId(text, {})
+    print text
+    print len(ret)
+    print data
+
+"""
+Java GC Log parser.
+This supports almost kinds of GC provided by JVM.
+
+-XX:+UseZGC
+Events:
+  PauseMarkStart, ConcMark, PauseMarkEnd, ConcProcessNonStrongRefs,
+  ConcSelectRelocationSet, PauseRelocateStart, ConcRelocate,
+  GarbageCollection, AllocationStall
+
+"""
+parseJavaGcLog = orP([
+        parseZPauseMarkStart,
+        parseZConcMark,
+        parseZPauseMarkEnd,
+        parseZConcProcessNonStrongRefs,
+        parseZConcSelectRelocationSet,
+        parseZPauseRelocateStart,
+        parseZConcRelocate,
+        parseZGarbageCollection,
+        parseZAllocationStall,
+        parseZAllocationStallGcId,
+    ])
+
+# Literals one of which is in every line parseJavaGcLog parses.
+# Lines without any of them are rejected by gclog_prefilter.py.
+PREFILTER_LITERALS = (" GC(", "Allocation Stall")
+
+# Tag sets of the lines parseJavaGcLog parses, in the form of -Xlog.
+# Lines with other tags are skipped when the tags decorator is logged.
+UNIFIED_TAGS = "gc,gc+phases,gc+alloc"
+
+
+################################################################################
+# Benchmark.
+################################################################################
+
+# Phases of a generated gc cycle: (message, ms).
+BENCH_CYCLE = [
+    ("Pause Mark Start", 0.012),
+    ("Concurrent Mark", 152.431),
+    ("Pause Mark End", 0.021),
+    ("Concurrent Process Non-Strong References", 8.314),
+    ("Concurrent Select Relocation Set", 5.102),
+    ("Pause Relocate Start", 0.010),
+    ("Concurrent Relocate", 48.775),
+]
+
+"""
+Lines of a ZGC log with the default layout, generated lazily, so that
+the grammar is measured without reading a file.
+Every cycle has its phases, a line of another tag which the grammar
+does not parse, an allocation stall and its summary.
+
+cycles :: Int
+return :: Generator String
+
+"""
+def genZgcLog(cycles):
+    head = "[2023-03-01T10:%02d:%06.3f+0800][%.3fs][21488][info][%s] "
+    uptime = 100.0
+    for gcId in xrange(cycles):
+        stamp = lambda tags: head % (int(uptime / 60) % 60, uptime % 60, uptime, tags)
+        for (name, ms) in BENCH_CYCLE:
+            uptime += ms / 1000.0
+            yield stamp("gc,phases   ") + "GC(%d) %s %.3fms\n" % (gcId, name, ms)
+        yield stamp("gc,load     ") + "GC(%d) Load: 3.21/2.87/2.55\n" % gcId
+        yield stamp("gc          ") + "Allocation Stall (worker-%d) 1.250ms\n" % (gcId % 16)
+        yield stamp("gc          ") + \
+              "GC(%d) Garbage Collection (Allocation Rate) 6254M(38%%)->1310M(8%%)\n" % gcId
+        uptime += 1.0
+
+"""
+Throughput of the grammar on generated lines.
+
+The lines of genZgcLog are parsed by iterGcLog as they are generated,
+so only the grammar and the generator are timed, in constant memory.
+
+cycles :: Int
+parser :: Parser | None # as iterGcLog.
+return :: Dictionary # {'lines', 'events', 'secs', 'lines_per_sec', 'events_per_sec'}
+
+"""
+def benchGrammar(cycles, parser=None):
+    counts = {'lines': 0}
+
+    def counted_(lines):
+        for line in lines:
+            counts['lines'] += 1
+            yield line
+
+    t0 = time.time()
+    n = 0
+    for data in iterGcLog(counted_(genZgcLog(cycles)), parser=parser):
+        n += 1
+    secs = time.time() - t0
+    return {'lines': counts['lines'], 'events': n, 'secs': secs,
+            'lines_per_sec': counts['lines'] / secs if secs > 0 else None,
+            'events_per_sec': n / secs if secs > 0 else None}
+
+
+################################################################################
+# Parser of list of integer. This is for test.
+################################################################################
+
+"""
+A modifier for list.
+
+return :: ([[String]], [String]) -> [String]
+
+"""
+def mkListAppender():
+    def listAppend_(list, matchStringL):
+        if len(matchStringL) > 0:
+            list.append(matchStringL[0])
+        return list
+    return listAppend_
+
+"""
+Convert last element to Int.
+
+list :: [Int, Int, ..., Int, String]
+return :: [Int, Int, ..., Int, Int]
+
+"""
+def convertLastToInt(list):
+    list[-1] = int(list[-1])
+    return list
+
+# Parser of list of integer. This is for test.
+parseIntList = andP([
+        newP(r"\s*\[\s*", None), 
+        manyP(
+                andP([
+                        newP(r"(\d+)\s*(?:,\s*)?", mkListAppender()),
+                        appP(convertLastToInt), 
+                    ])
+             ), 
+        newP(r"\s*\]\s*", None), 
+    ])
+if __debug__:
+    text = r"[10, 20, 30]"
+    (ret, data) = parseIntList(text, [])
+    print text
+    print len(ret)
+    print data
+
+
+################################################################################
+# main
+################################################################################
+"""
+Parse lines of a gc log lazily.
+
+lines :: Iterable String
+unparsed :: ((String, ParseError) -> ANY) | None # called for lines failed to parse.
+parser :: Parser | None # parseJavaGcLog by default, or a wrapper of it
+                        # such as gclog_cache.mkShapeCache.
+levels :: String | [String] | None # levels selected (see gclog_unified.py),
+                                   # None if parser selects the lines itself.
+tags :: String | [String] | None # tag sets selected, None selects all tags.
+return :: Generator Dictionary
+
+"""
+def iterGcLog(lines, unparsed=None, parser=None, levels=gclog_unified.DEFAULT_LEVELS, tags=UNIFIED_TAGS):
+   if parser is None:
+       parser = parseJavaGcLog
+   if levels is not None:
+       parser = gclog_unified.mkDecoratorFilter(parser, ParseError, levels, tags)
+   for line in lines:
+       text = line.rstrip()
+       try:
+           (ret, data) = parser(text, {})
+       except ParseError, msg:
+           if unparsed is not None:
+               unparsed(text, msg)
+           continue
+       yield data
+
+def process_file_chunk(filename, levels=gclog_unified.DEFAULT_LEVELS, tags=UNIFIED_TAGS):
+   scan = gclog_chunk.mkChunkScanner(parseJavaGcLog,
+       accept=gclog_unified.mkDecoratorAccept(levels, tags))
+   stats = {}
+   with open(dirs+filename,'rb') as fd:
+       output = list(scan(fd, stats))
+   if __debug__:
+       print stats
+   with open(dirs+filename+'.json','w') as fd:
+       fd.write(json.dumps(output))
+
+def process_file_numpy(filename, levels=gclog_unified.DEFAULT_LEVELS, tags=UNIFIED_TAGS):
+   scan = gclog_unified.mkHeaderScanner(parseJavaGcLog, parseUnifiedHeader,
+       accept=gclog_unified.mkDecoratorAccept(levels, tags))
+   stats = {}
+   output = list(scan(dirs+filename, stats))
+   if __debug__:
+       print stats
+   with open(dirs+filename+'.json','w') as fd:
+       fd.write(json.dumps(output))
+
+def process_file(filename, backend='line', levels=gclog_unified.DEFAULT_LEVELS, tags=UNIFIED_TAGS,
+                layout=None):
+   if layout == 'auto':
+       with open(dirs+filename,'r') as fd:
+           layout = gclog_unified.detectLayout(fd)
+   if layout is not None:
+       setLayout(layout)
+   if backend == 'numpy' and gclog_unified.np is None:
+       print('numpy is not installed, using the chunk backend')
+       backend = 'chunk'
+   if backend == 'numpy':
+       try:
+           return process_file_numpy(filename, levels, tags)
+       except ValueError, msg:
+           print('%s, using the chunk backend' % msg)
+           backend = 'chunk'
+   if backend == 'chunk':
+       return process_file_chunk(filename, levels, tags)
+   parse = gclog_unified.mkDecoratorFilter(parseJavaGcLog, ParseError, levels, tags)
+   with open(dirs+filename,'r') as fd:
+       output = list(iterGcLog(fd, parser=parse, levels=None))
+   if __debug__:
+       print parse.stats
+   with open(dirs+filename+'.json','w') as fd:
+       fd.write(json.dumps(output))
+
+if __name__=='__main__':
+    import gclog_pipe
+    from multiprocessing import Pool
+
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    if args and args[0] == 'bench':
+        print json.dumps(benchGrammar(int(args[1]) if len(args) > 1 else 100000))
+        exit(0)
+    if gclog_pipe.isPipe(sys.argv[1:]):
+        gclog_pipe.runPipe(sys.modules[__name__], sys.argv[1:])
+        exit(0)
+    opts = dict((a[2:].split('=', 1) + [None])[:2] for a in sys.argv[1:] if a.startswith('--'))
+    dirs = args[0]
+    backend = args[1] if len(args) > 1 else 'line'
+    levels = opts.get('levels') or gclog_unified.DEFAULT_LEVELS
+    tags = opts.get('tags') or UNIFIED_TAGS
+    layout = opts.get('layout')
+    allfiles = os.listdir(dirs)
+    files = []
+    for f in allfiles:
+        if f.endswith('gclog') or f.endswith('.log'):
+            files.append(f)
+
+    if len(files) == 0:
+        print('No gclog to parse')
+        exit(0)
+    pool = Pool(processes=len(files))
+    multi_results = []
+
+    for filename in files:
+        i = files.index(filename)
+        print("Thread %d for %s"%(i,filename))
+        multi_results.append(
+            pool.apply_async(
+                process_file,
+                (filename, backend, levels, tags, layout)
+            )
+        )
+    print('Waiting for results ...')
+    for res in multi_results:
+        res.get()
+    print('Finished to process %d gclogs'%len(files))
+# end of file.
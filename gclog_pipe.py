@@ -0,0 +1,254 @@
+# coding: utf-8
+
+import sys, os
+import json
+import time
+import errno
+import select
+import signal
+import inspect
+import importlib
+
+"""
+Pipe mode of the parser modules.
+
+stdin is read as it comes, and one JSON object per event is written to
+stdout, so that a parser can sit in a pipeline such as
+    kubectl logs -f ${POD} | this.py | ${YOUR_ANALYZER}
+
+stdin is read by os.read, not by the file object, whose read-ahead
+would hold lines back until 8KB came. A partial line waits for its
+newline.
+Events are written in batches: a batch is flushed when it has `batch`
+events, or when its first event has waited `latency` seconds, even if
+no more lines come (select() waits on stdin until then).
+
+A slow reader of stdout makes the writes block, so no more of stdin is
+read meanwhile and the writer upstream blocks in turn; at most one
+batch is held. When the reader goes away (head, a closed pipe), the
+process ends silently by SIGPIPE, as grep does.
+
+Lines which fail to parse are written as ###${LINE} with --unparsed,
+as the usage of the modules expects (grep -v ^###).
+
+The unified logging modules take --layout (auto peeks at the first
+lines of stdin, see gclog_unified.detectLayout), and --levels and --tags
+for their iterGcLog, as in their directory mode.
+
+Usage:
+    this.py < ${GC_LOG_FILE} | ${YOUR_ANALYZER}
+    this.py - [--batch=N] [--latency=SECS] [--unparsed] | ${YOUR_ANALYZER}
+    # this.py is a parser module such as gclog_parser_cms.py.
+    python2 -O gclog_pipe.py module [--batch=N] [--latency=SECS] [--unparsed]
+    this.py - [--layout=SPEC|auto] [--levels=LEVELS] [--tags=TAGS]
+    # this.py is a unified logging module such as gclog_parser_g1_jdk11.py.
+
+"""
+
+################################################################################
+# Constants.
+################################################################################
+
+# Events of a batch.
+DEFAULT_BATCH = 256
+
+# Seconds an event may wait in a batch.
+DEFAULT_LATENCY = 0.2
+
+# Bytes read from stdin at a time.
+READ_SIZE = 64 * 1024
+
+
+################################################################################
+# Output.
+################################################################################
+
+"""
+Restore the default action of SIGPIPE, which python2 ignores, so that
+the process ends when the reader of stdout goes away.
+
+"""
+def defaultSigpipe():
+    if hasattr(signal, 'SIGPIPE'):
+        signal.signal(signal.SIGPIPE, signal.SIG_DFL)
+
+"""
+Make a writer which flushes by batch size or latency.
+
+The writer takes a line of text, and has
+    .flush()     write the batch now.
+    .timeout()   seconds until the batch must be flushed, None if empty.
+    .stats       {'lines': Int, 'flushes': Int}
+
+out :: File
+batch :: Int
+latency :: Float
+return :: (String -> ()) # with .flush, .timeout and .stats.
+
+"""
+def mkBatchWriter(out, batch=DEFAULT_BATCH, latency=DEFAULT_LATENCY):
+    pending = []
+    since = [None]    # time of the first line of the batch.
+    stats = {'lines': 0, 'flushes': 0}
+    clock = time.time
+
+    def flush_():
+        if pending:
+            out.write(''.join(pending))
+            del pending[:]
+            stats['flushes'] += 1
+        out.flush()
+        since[0] = None
+
+    def timeout_():
+        if since[0] is None:
+            return None
+        return max(0.0, since[0] + latency - clock())
+
+    def write_(text):
+        if since[0] is None:
+            since[0] = clock()
+        pending.append(text)
+        stats['lines'] += 1
+        if len(pending) >= batch or clock() - since[0] >= latency:
+            flush_()
+
+    write_.flush = flush_
+    write_.timeout = timeout_
+    write_.stats = stats
+    return write_
+
+
+################################################################################
+# Input.
+################################################################################
+
+"""
+Lines of a file as they come.
+
+While the writer holds a batch, the wait for more input is bounded by
+the latency of the writer, and the batch is flushed when it runs out.
+
+fd :: File
+writer :: Writer | None # of mkBatchWriter.
+return :: Generator String
+
+"""
+def pipeLines(fd, writer=None):
+    fileno = fd.fileno()
+    partial = ''
+    while True:
+        timeout = writer.timeout() if writer is not None else None
+        if timeout is not None:
+            try:
+                (ready, w, x) = select.select([fileno], [], [], timeout)
+            except select.error, e:
+                if e.args[0] == errno.EINTR:
+                    continue
+                raise
+            if not ready:
+                writer.flush()
+                continue
+        try:
+            chunk = os.read(fileno, READ_SIZE)
+        except OSError, e:
+            if e.errno == errno.EINTR:
+                continue
+            raise
+        if not chunk:
+            break
+        lines = (partial + chunk).split('\n')
+        partial = lines.pop()
+        for line in lines:
+            yield line + '\n'
+    if partial:
+        yield partial
+
+
+################################################################################
+# Pipe.
+################################################################################
+
+"""
+Parse lines and write the events as JSON lines.
+
+module :: Module # a parser module.
+lines :: Iterable String
+writer :: Writer # of mkBatchWriter.
+unparsed :: Bool # write lines failed to parse as ###${LINE}.
+reduce :: (Generator Dictionary -> Generator Dictionary) | None
+          # applied to the events, e.g. iterCycles of gclog_parser_she_jdk11.
+select :: {String: String} | None # levels and tags given to iterGcLog of a
+                                  # unified logging module.
+return :: Int # events written.
+
+"""
+def pipeEvents(module, lines, writer, unparsed=False, reduce=None, select=None):
+    if unparsed:
+        def write_unparsed(text, msg):
+            writer("###%s\n" % text)
+    else:
+        write_unparsed = None
+    n = 0
+    dumps = json.dumps
+    events = module.iterGcLog(lines, write_unparsed, **(select or {}))
+    if reduce is not None:
+        events = reduce(events)
+    for data in events:
+        writer(dumps(data) + '\n')
+        n += 1
+    writer.flush()
+    return n
+
+"""
+Run the pipe mode of a parser module from its main.
+
+module :: Module
+argv :: [String] # options of the command line.
+reduce :: (Generator Dictionary -> Generator Dictionary) | None # as pipeEvents.
+return :: Int # events written.
+
+"""
+def runPipe(module, argv, reduce=None):
+    opts = dict((a[2:].split('=', 1) + [None])[:2] for a in argv if a.startswith('--'))
+    defaultSigpipe()
+    writer = mkBatchWriter(sys.stdout,
+                           int(opts.get('batch') or DEFAULT_BATCH),
+                           float(opts.get('latency') or DEFAULT_LATENCY))
+    lines = pipeLines(sys.stdin, writer)
+    layout = opts.get('layout')
+    if layout and hasattr(module, 'setLayout'):
+        if layout == 'auto':
+            import itertools
+            import gclog_unified
+            head = list(itertools.islice(lines, gclog_unified.DETECT_LINES))
+            layout = gclog_unified.detectLayout(head)
+            lines = itertools.chain(head, lines)
+        if layout:
+            module.setLayout(layout)
+    select = dict((k, opts[k]) for k in ('levels', 'tags') if opts.get(k))
+    if select and 'levels' not in inspect.getargspec(module.iterGcLog).args:
+        raise ValueError("--levels and --tags are only for the unified logging modules")
+    return pipeEvents(module, lines, writer, 'unparsed' in opts, reduce, select)
+
+"""
+Whether the command line of a parser module asks for the pipe mode,
+i.e. has no directory or has - as it.
+
+argv :: [String] # without the program name.
+return :: Bool
+
+"""
+def isPipe(argv):
+    args = [a for a in argv if not a.startswith('--')]
+    return len(args) == 0 or args[0] == '-'
+
+
+################################################################################
+# main
+################################################################################
+
+if __name__=='__main__':
+    runPipe(importlib.import_module(sys.argv[1]), sys.argv[2:])
+
+# end of file.
@@ -0,0 +1,139 @@
+# coding: utf-8
+
+import sys
+import json
+import time
+import importlib
+
+"""
+Literal prefilter for gc logs mixed with application logs.
+
+When -XX:+PrintGCDetails goes to stdout, gc lines are a few among the
+lines of the application, and each of those lines tries all the
+alternatives of parseJavaGcLog before it is rejected.
+This filter rejects a line by plain substring checks, before any regex
+runs, unless it contains one of the literals of the parser module
+(PREFILTER_LITERALS, e.g. "[GC", "[Full GC", "CMS-", " GC(").
+
+The time saved is estimated by sampling: one rejected line in
+SAMPLE_EVERY is also given to the parser and timed, and the mean time
+of those is multiplied by the lines rejected. A sampled line which the
+parser does parse is counted as a false reject, which means the
+literals of the module are missing one. Sampling only measures: the
+line is rejected all the same, so the output does not depend on which
+lines are sampled.
+
+Usage:
+    parse = mkPrefilter(module.parseJavaGcLog, module.ParseError,
+                        module.PREFILTER_LITERALS)
+    for data in module.iterGcLog(lines, parser=parse):
+        ...
+    print prefilterReport(parse.stats)
+
+    python2 -O this.py module < ${GC_LOG_FILE} | ${YOUR_ANALYZER}
+    # module is a parser module such as gclog_parser_cms.
+    # The report is written to stderr.
+
+"""
+
+################################################################################
+# Constants.
+################################################################################
+
+# Literals of the gc lines of JDK8 and unified logging.
+DEFAULT_LITERALS = ("[GC", "[Full GC", "CMS-", " GC(")
+
+# One rejected line in this many is timed by the parser.
+SAMPLE_EVERY = 64
+
+
+################################################################################
+# Prefilter.
+################################################################################
+
+"""
+Wrap a parser with a literal prefilter.
+
+The wrapper behaves like the parser, and has the counters as .stats.
+    lines          lines given.
+    skipped        lines rejected by the literals.
+    filter_secs    time spent on the literal checks.
+    sampled        rejected lines timed by the parser.
+    sampled_secs   time the parser spent on them.
+    false_rejects  sampled lines which the parser parsed.
+
+parser :: Parser # typically parseJavaGcLog, or a gclog_cache wrapper of it.
+error :: Exception class # ParseError of the module of the parser.
+literals :: (String,)
+sampleEvery :: Int # 0 disables sampling.
+return :: Parser
+
+"""
+def mkPrefilter(parser, error, literals=DEFAULT_LITERALS, sampleEvery=SAMPLE_EVERY):
+    literals = tuple(literals)
+    stats = {'lines': 0, 'skipped': 0, 'filter_secs': 0.0,
+             'sampled': 0, 'sampled_secs': 0.0, 'false_rejects': 0}
+    clock = time.time
+
+    def parseFiltered_(text, data):
+        stats['lines'] += 1
+        t0 = clock()
+        for literal in literals:
+            if literal in text:
+                break
+        else:
+            stats['filter_secs'] += clock() - t0
+            stats['skipped'] += 1
+            if sampleEvery > 0 and stats['skipped'] % sampleEvery == 0:
+                t1 = clock()
+                try:
+                    parser(text, {})
+                    parsed = True
+                except error:
+                    parsed = False
+                stats['sampled'] += 1
+                stats['sampled_secs'] += clock() - t1
+                if parsed:
+                    stats['false_rejects'] += 1
+            raise error("Prefiltered: no gc literal in \"%s\"" % text)
+        stats['filter_secs'] += clock() - t0
+        return parser(text, data)
+
+    parseFiltered_.stats = stats
+    return parseFiltered_
+
+"""
+Summary of the stats of a prefilter.
+
+saved_secs is the estimated time which the parser would have spent on
+the skipped lines, less the time of the literal checks.
+
+stats :: Dictionary
+return :: Dictionary
+
+"""
+def prefilterReport(stats):
+    report = dict(stats)
+    if stats['sampled'] > 0:
+        perLine = stats['sampled_secs'] / stats['sampled']
+        report['saved_secs'] = perLine * stats['skipped'] - stats['filter_secs']
+    else:
+        report['saved_secs'] = None
+    if stats['lines'] > 0:
+        report['skipped_ratio'] = float(stats['skipped']) / stats['lines']
+    return report
+
+
+################################################################################
+# main
+################################################################################
+
+if __name__=='__main__':
+    module = importlib.import_module(sys.argv[1])
+    literals = getattr(module, 'PREFILTER_LITERALS', DEFAULT_LITERALS)
+    parse = mkPrefilter(module.parseJavaGcLog, module.ParseError, literals)
+    for data in module.iterGcLog(sys.stdin, parser=parse):
+        print json.dumps(data)
+    sys.stderr.write(json.dumps(prefilterReport(parse.stats)) + '\n')
+
+# end of file.
@@ -0,0 +1,845 @@
+# coding: utf-8
+
+#!/usr/bin/python -O 
+
+import re
+import sys, os
+import json
+import math
+import itertools
+from collections import deque
+import gclog_unified
+import gclog_window
+
+"""
+This is a parser of the safepoints of JVM logs, JDK8 and unified logging
+of OpenJDK9+, and a join of them with the gc pauses of the other parser
+modules.
+
+A safepoint stops all the application threads, for a gc or for another
+operation of the VM (biased lock revocation, deoptimization, thread
+dumps, class redefinition, ...). Pause times of gc events leave out the
+time to reach the safepoint (TTSP) and the safepoints of no gc, which
+the lines parsed here give.
+
+Required JVM option: 
+    JDK8:    -XX:+PrintGCApplicationStoppedTime
+             (and -XX:+PrintSafepointStatistics for operation names,
+             printed to stdout)
+    OpenJDK9+: -Xlog:gc*,safepoint:file=gc.log:time,uptime,tid,level,tags
+
+Events:
+    Safepoint   stopped_ms   time the application threads were stopped.
+                ttsp_ms      time to reach the safepoint, if printed.
+                operation    VM operation, e.g. G1CollectForAllocation,
+                             if printed (JDK8 statistics, OpenJDK9+).
+                at_ms, cleanup_ms, since_last_ms
+                             times of OpenJDK13+ lines.
+    Safepoint Begin, the "Entering safepoint region" line of OpenJDK9-12,
+    is not given: its operation goes to the next Safepoint.
+A Safepoint is stamped when it ends ("end_sec", uptime), except a line
+of JDK8 statistics which is stamped when it starts ("timestamp").
+
+Join with gc pauses:
+    The gc parser modules leave the safepoint lines of a log unparsed,
+    where mkSafepointCatcher catches them, so that a log is read once
+    for both. joinPauses gives each safepoint the time of the gc pauses
+    within it, and stallWindows sums per window the stop which no gc
+    pause accounts for (non_gc_stall_ms).
+
+Usage:
+    python2 -O this.py < ${GC_LOG_FILE} | ${YOUR_ANALYZER}
+    # One JSON object per safepoint, flushed every --batch=N events or
+    # --latency=SECS seconds (see gclog_pipe.py).
+    python2 -O this.py gclog_dir
+    # If there are gc1.log and gc2.log in gclog_dir,
+    # it will save the safepoints in files gc1.log.json and gc2.log.json respectively.
+    # --layout=uptime,level,tags gives the decorators of -Xlog
+    # (default: time,uptime,tid,level,tags), and --layout=auto detects them.
+    python2 -O this.py stall module size [uptime|utc] < ${GC_LOG_FILE}
+    # module is the parser module of the gc events of the log, such as
+    # gclog_parser_cms. One JSON object per window of size seconds.
+    # --layout gives the decorators of both modules, as above.
+
+You can get all data as a python dictionary structure
+in your analyer as follows:
+
+import sys
+import json
+
+list = []
+for line in sys.stdin:
+    line.rstrip()
+    list.append(dict(json.loads(line)))
+        
+"""
+
+################################################################################
+# Parser generator from regular expression.
+################################################################################
+
+"""
+Generate a parser from regex pattern and modifier.
+
+Parser try to match input text by the pattern.
+If matched, call data_modifier with list of matched strings.
+The modifier add/update tag_str of the dictionary.
+
+regexStr :: String
+dataModifier :: (a, [String]) -> a | None
+return :: (String, a) -> (String, a)
+a :: ANY
+
+dataModifier must not throw exceptions.
+When some errors occur inside dataModifier, a must be not modified.
+
+"""
+def newP(regexStr, dataModifier):
+    p = re.compile("(^%s)" % regexStr)
+    def parse_(line, data):
+        m = p.match(line)
+        if m:
+            if dataModifier is not None:
+                data = dataModifier(data, m.groups()[1:])
+            return (line[len(m.group(1)):], data)
+        else:
+            msg = "Parse failed: pattern \"%s\" for \"%s\"" % (regexStr, line)
+            raise ParseError(msg)
+    # Kept for compilers of the grammar (see gclog_chunk.py).
+    parse_.regexStr = regexStr
+    parse_.dataModifier = dataModifier
+    return parse_
+
+################################################################################
+# Utilities.
+################################################################################
+
+"""
+Just modify data during parse.
+
+dataModifier :: (a, [String]) -> a
+return :: (String, a) -> (String, a)
+a :: ANY
+
+"""
+def appP(dataModifier):
+    def modify_(line, data):
+        if dataModifier is not None:
+            data = dataModifier(data)
+        return (line, data)
+    return modify_
+
+
+# [String] -> String
+def toString(strL):
+    ret = "[%s" % strL[0]
+    for str in strL[1:]:
+        ret += ", %s" % str
+    ret += "]"
+    return ret
+
+
+# Error type for parser.
+class ParseError(Exception):
+    pass
+
+
+################################################################################
+# Parser combinators.
+################################################################################
+
+"""
+Parser combinator AND.
+
+parsers :: [Parser]
+return :: Parser
+
+"""
+def andP(parsers):
+    def parseAnd_(text, data):
+        text0 = text
+        data0 = data
+        for parser in parsers:
+            (text1, data1) = parser(text0, data0)
+            text0 = text1
+            data0 = data1
+        return (text0, data0)
+    parseAnd_.combinator = 'and'
+    parseAnd_.parsers = parsers
+    return parseAnd_
+
+"""
+Parser combinator OR.
+
+parsers :: [Parser]
+return :: Parser
+
+"""
+def orP(parsers):
+    def parseOr_(text, data):
+        msgL = []
+        for parser in parsers:
+            try:
+                (ret_text, ret_data) = parser(text, data)
+                return (ret_text, ret_data)
+            except ParseError, msg:
+                msgL.append(msg)
+        msgs = toString(msgL)
+        raise ParseError(msgs)
+    parseOr_.combinator = 'or'
+    parseOr_.parsers = parsers
+    return parseOr_
+
+"""
+Parser combinator MANY.
+parsers :: [Parser]
+return :: Parser
+
+"""
+def manyP(parser):
+    def parseMany_(text, data):
+        text0 = text
+        data0 = data
+        text1 = text
+        data1 = data
+        try:
+            while True:
+                (text1, data1) = parser(text0, data0)
+                text0 = text1
+                data0 = data1
+        except ParseError, msg:
+            if __debug__:
+                print msg
+        return (text1, data1)
+    return parseMany_
+
+
+################################################################################
+# Utilities.
+################################################################################
+
+"""
+A modifier for dictionary data.
+
+tagStr :: String
+dataConstructor :: [String] -> ANY
+return :: (Dictionary, [String]) -> Dictionary
+
+"""
+def mkDictModifier(tagStr, dataConstructor):
+    def modifyNothing_(dictData, matchStringL):
+        return dictData
+    if tagStr is None or dataConstructor is None:
+        return modifyNothing_
+    def modifyDict_(dictData, matchStringL):
+        dictData[tagStr] = dataConstructor(matchStringL)
+        return dictData
+    return modifyDict_
+
+"""
+Behave like newP but that parses anything, just modify dictionary.
+
+key :: String
+value :: ANY
+return :: (String, Dictionary) -> (String, Dictionary)
+
+"""
+def mkTagger(key, value):
+    def tagger_(line, dictData):
+        dictData[key] = value
+        return (line, dictData)
+    tagger_.tagKey = key
+    tagger_.tagValue = value
+    return tagger_
+
+
+# match_strL :: [String] # length must be 1.
+# return :: Float
+def get_float(match_strL):
+    assert len(match_strL) == 1
+    return float(match_strL[0])
+
+# match_strL :: [String] # length must be 1.
+# return :: Int 
+def get_int(match_strL):
+    assert len(match_strL) == 1
+    return int(match_strL[0])
+
+# match_strL :: [String] # length must be 3.
+# return :: [Int] # length is 3.
+def get_int3(match_strL):
+    assert len(match_strL) == 3
+    return [int(match_strL[0]), int(match_strL[1]), int(match_strL[2])]
+
+# match_strL :: [String]
+# return :: True
+def get_true(match_strL):
+    return True
+
+# match_strL :: [String]
+# return :: String
+def get_string(match_strL):
+    return match_strL[0]
+
+# Causes of gc are a few strings repeated in every event,
+# so they are interned to share one object per category.
+# match_strL :: [String] # length must be 1.
+# return :: String
+def get_intern(match_strL):
+    assert len(match_strL) == 1
+    return intern(match_strL[0])
+
+
+"""
+A modifier for the times of a stopped line, in seconds.
+
+return :: (Dictionary, [String]) -> Dictionary
+          # [stopped, stopping threads | None]
+
+"""
+def mkStoppedModifier():
+    def modifyStopped_(dictData, matchStringL):
+        dictData["stopped_ms"] = float(matchStringL[0]) * 1000.0
+        if matchStringL[1] is not None:
+            dictData["ttsp_ms"] = float(matchStringL[1]) * 1000.0
+        return dictData
+    return modifyStopped_
+
+"""
+A modifier for the stamps of a JDK8 line, whose date is optional.
+
+key :: String # of the uptime, "end_sec" or "timestamp".
+return :: (Dictionary, [String]) -> Dictionary # [date | None, uptime]
+
+"""
+def mkJdk8StampModifier(key):
+    def modifyStamp_(dictData, matchStringL):
+        if matchStringL[0] is not None:
+            dictData["utc"] = matchStringL[0]
+        dictData[key] = float(matchStringL[1])
+        return dictData
+    return modifyStamp_
+
+"""
+A modifier for a line of -XX:+PrintSafepointStatistics, in ms.
+
+return :: (Dictionary, [String]) -> Dictionary
+          # [operation, total, initially_running, wait_to_block,
+          #  spin, block, sync, cleanup, vmop, page_trap_count | None]
+
+"""
+def mkStatisticsModifier():
+    def modifyStatistics_(dictData, matchStringL):
+        (spin, block, sync, cleanup, vmop) = [int(s) for s in matchStringL[4:9]]
+        dictData["operation"] = intern(matchStringL[0])
+        dictData["threads"] = [int(s) for s in matchStringL[1:4]]
+        dictData["spin_ms"] = spin
+        dictData["block_ms"] = block
+        dictData["ttsp_ms"] = sync
+        dictData["cleanup_ms"] = cleanup
+        dictData["vmop_ms"] = vmop
+        dictData["stopped_ms"] = sync + cleanup + vmop
+        return dictData
+    return modifyStatistics_
+
+"""
+A modifier for a safepoint line of OpenJDK13+, in ns.
+
+return :: (Dictionary, [String]) -> Dictionary
+          # [operation, since last, reaching, cleanup | None, at, total]
+
+"""
+def mkSafepointNanosModifier():
+    def modifyNanos_(dictData, matchStringL):
+        dictData["operation"] = intern(matchStringL[0])
+        dictData["since_last_ms"] = int(matchStringL[1]) / 1e6
+        dictData["ttsp_ms"] = int(matchStringL[2]) / 1e6
+        if matchStringL[3] is not None:
+            dictData["cleanup_ms"] = int(matchStringL[3]) / 1e6
+        dictData["at_ms"] = int(matchStringL[4]) / 1e6
+        dictData["stopped_ms"] = int(matchStringL[5]) / 1e6
+        return dictData
+    return modifyNanos_
+
+
+################################################################################
+# Regexp aliases.
+################################################################################
+
+regexp_float = r"(\d+\.\d+)"
+regexp_date = r"(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d+\.\d+[+-]\d{4}):\s+"
+# G1IncCollectionPause, RevokeBias, no vm operation
+regexp_operation = r"([A-Za-z][\w-]*(?:\s[A-Za-z][\w-]*)*)"
+regexp_int_ns = r"(\d+)\sns"
+
+
+################################################################################
+# Parsers for safepoint entries.
+################################################################################
+
+"""
+Decorators at the head of every line of unified logging.
+e.g. [2021-09-10T15:23:34.217+0800][123.534s][76035][info][safepoint   ]
+
+Its steps are compiled from the decorators of -Xlog by setLayout, as
+in the gc parser modules (see gclog_unified.py).
+
+"""
+parseUnifiedHeader = andP([])
+
+"""
+Set the decorator layout of the logs to parse.
+
+spec :: String # decorators of -Xlog, e.g. "utctime,uptimemillis,pid,tid,level"
+
+"""
+def setLayout(spec):
+    steps = []
+    for (name, regexStr, modifier) in gclog_unified.layoutSteps(spec):
+        p = newP(regexStr, modifier)
+        p.decorator = name
+        steps.append(p)
+    parseUnifiedHeader.parsers[:] = steps
+
+setLayout(gclog_unified.DEFAULT_LAYOUT)
+
+# The stop of a safepoint, printed by JDK8 and OpenJDK9-12.
+# Stopping threads is not printed by early JDK8.
+parseStoppedTime = newP(
+    r"\s*Total\stime\sfor\swhich\sapplication\sthreads\swere\sstopped:\s" + regexp_float +
+    r"\sseconds(?:,\sStopping\sthreads\stook:\s" + regexp_float + r"\sseconds)?\s*$",
+    mkStoppedModifier())
+
+parseSafepointJdk8 = andP([
+        mkTagger("type", "Safepoint"),
+        newP(r"(?:" + regexp_date + r")?" + regexp_float + r":\s+", mkJdk8StampModifier("end_sec")),
+        parseStoppedTime,
+    ])
+if __debug__:
+    text = r"2019-12-05T04:06:46.931+0800: 6.931: Total time for which application threads were stopped: 0.1353210 seconds, Stopping threads took: 0.0031520 seconds"
+    (ret, data) = parseSafepointJdk8(text, {})
+    print text
+    print len(ret)
+    print data
+
+"""
+A line of -XX:+PrintSafepointStatistics, stamped when the safepoint
+starts. Its times are in ms.
+                   vmop    [threads: total initially_running wait_to_block]    [time: spin block sync cleanup vmop] page_trap_count
+6.794: G1IncCollectionPause [      73          0              0    ]      [     0     0     3     0   131    ]  0
+
+"""
+parseSafepointStatistics = andP([
+        mkTagger("type", "Safepoint"),
+        newP(regexp_float + r":\s+", mkDictModifier("timestamp", get_float)),
+        newP(regexp_operation +
+             r"\s+\[\s*(\d+)\s+(\d+)\s+(\d+)\s*\]" +
+             r"\s+\[\s*(\d+)\s+(\d+)\s+(\d+)\s+(\d+)\s+(\d+)\s*\]" +
+             r"(?:\s+(\d+))?\s*$",
+             mkStatisticsModifier()),
+    ])
+if __debug__:
+    text = r"6.794: G1IncCollectionPause             [      73          0              0    ]      [     0     0     3     0   131    ]  0   "
+    (ret, data) = parseSafepointStatistics(text, {})
+    print text
+    print len(ret)
+    print data
+
+parseSafepointUnified = andP([
+        mkTagger("type", "Safepoint"),
+        parseUnifiedHeader,
+        parseStoppedTime,
+    ])
+if __debug__:
+    text = r"[2021-09-10T15:23:34.358+0800][123.658s][76035][info][safepoint   ] Total time for which application threads were stopped: 0.1588713 seconds, Stopping threads took: 0.0002105 seconds"
+    (ret, data) = parseSafepointUnified(text, {})
+    print text
+    print len(ret)
+    print data
+
+# The operation of the next Safepoint, printed by OpenJDK9-12.
+parseSafepointBegin = andP([
+        mkTagger("type", "Safepoint Begin"),
+        parseUnifiedHeader,
+        newP(r"\s*Entering\ssafepoint\sregion:\s" + regexp_operation + r"\s*$",
+             mkDictModifier("operation", get_intern)),
+    ])
+if __debug__:
+    text = r"[2021-09-10T15:23:34.199+0800][123.499s][76035][info][safepoint   ] Entering safepoint region: G1CollectForAllocation"
+    (ret, data) = parseSafepointBegin(text, {})
+    print text
+    print len(ret)
+    print data
+
+"""
+A safepoint of OpenJDK13+, whose times are in ns. Cleanup is printed
+by OpenJDK21.
+
+"""
+parseSafepointNanos = andP([
+        mkTagger("type", "Safepoint"),
+        parseUnifiedHeader,
+        newP(r"\s*Safepoint\s\"" + regexp_operation + r"\",\sTime\ssince\slast:\s" + regexp_int_ns +
+             r",\sReaching\ssafepoint:\s" + regexp_int_ns +
+             r"(?:,\sCleanup:\s" + regexp_int_ns + r")?" +
+             r",\sAt\ssafepoint:\s" + regexp_int_ns +
+             r",\sTotal:\s" + regexp_int_ns + r"\s*$",
+             mkSafepointNanosModifier()),
+    ])
+if __debug__:
+    text = r'[2023-02-14T16:40:11.873+0800][5521.094s][18221][info][safepoint   ] Safepoint "G1CollectForAllocation", ' + \
+           r'Time since last: 1290637916 ns, Reaching safepoint: 105521 ns, At safepoint: 5413729 ns, Total: 5519250 ns'
+    (ret, data) = parseSafepointNanos(text, {})
+    print text
+    print len(ret)
+    print data
+
+parseJavaGcLog = orP([
+        parseSafepointJdk8,
+        parseSafepointStatistics,
+        parseSafepointUnified,
+        parseSafepointBegin,
+        parseSafepointNanos,
+    ])
+
+# Literals one of which a safepoint line has (see gclog_prefilter.py).
+PREFILTER_LITERALS = ("Total time for which", "safepoint", "  [ ")
+
+# Tag sets of the lines given to the grammar (see gclog_unified.py).
+UNIFIED_TAGS = "safepoint"
+
+"""
+Give the operation of a Safepoint Begin to the Safepoint which follows.
+
+state :: [String | None] # operation of the open region.
+data :: Dictionary
+return :: Dictionary | None # None for a Safepoint Begin.
+
+"""
+def withOperation(state, data):
+    if data["type"] == "Safepoint Begin":
+        state[0] = data["operation"]
+        return None
+    if state[0] is not None:
+        data.setdefault("operation", state[0])
+        state[0] = None
+    return data
+
+
+################################################################################
+# Join with gc pauses.
+################################################################################
+
+# Seconds of log a safepoint waits for the gc pauses within it, which a
+# gc parser module may give late (see gclog_assemble.py).
+DEFAULT_HORIZON = 2.0
+
+# Seconds a pause may stick out of a safepoint, as stamps are in ms.
+SLACK = 0.001
+
+"""
+Catch the safepoints of the lines which a gc parser module leaves
+unparsed. This is given to iterGcLog of the module as `unparsed`.
+
+unparsed :: ((String, ParseError) -> ANY) | None # called for the other lines.
+return :: (String, Exception) -> () # with .held, deque of the safepoints caught.
+
+"""
+def mkSafepointCatcher(unparsed=None):
+    held = deque()
+    state = [None]
+
+    def catch_(text, msg):
+        try:
+            (ret, data) = parseJavaGcLog(text, {})
+        except ParseError:
+            if unparsed is not None:
+                unparsed(text, msg)
+            return
+        data = withOperation(state, data)
+        if data is not None:
+            held.append(data)
+
+    catch_.held = held
+    return catch_
+
+"""
+Events of a gc parser module with the safepoints caught from its lines,
+in the order of the log.
+
+events :: Iterable Dictionary # iterGcLog of a module given `catch`.
+catch :: Catcher # of mkSafepointCatcher.
+return :: Generator Dictionary
+
+"""
+def interleave(events, catch):
+    held = catch.held
+    for data in events:
+        while held:
+            yield held.popleft()
+        yield data
+    while held:
+        yield held.popleft()
+
+"""
+Start and end of a safepoint.
+
+data :: Dictionary
+clock :: 'utc' | 'uptime'
+return :: (Float, Float) | None
+
+"""
+def safepointInterval(data, clock='uptime'):
+    t = gclog_window.stampSeconds(data, clock)
+    if t is None:
+        return None
+    dur = data["stopped_ms"] / 1000.0
+    if "end_sec" in data:
+        return (t - dur, t)
+    return (t, t + dur)
+
+"""
+Give a safepoint the time of the pauses within it.
+    gc_ms       time of the gc pauses within the safepoint.
+    non_gc_ms   stopped_ms - gc_ms, the stop no gc pause accounts for:
+                the whole safepoint of another operation, and the time
+                to reach and leave the safepoint of a gc.
+
+held :: (Float, Float, Dictionary) # (start, end, safepoint)
+pauses :: Iterable (Float, Float)
+return :: Dictionary
+
+"""
+def chargePauses(held, pauses):
+    (lo, hi, data) = held
+    lo -= SLACK
+    hi += SLACK
+    overlap = 0.0
+    for (start, end) in pauses:
+        overlap += max(0.0, min(hi, end) - max(lo, start))
+    data["gc_ms"] = min(data["stopped_ms"], overlap * 1000.0)
+    data["non_gc_ms"] = data["stopped_ms"] - data["gc_ms"]
+    return data
+
+"""
+Safepoints of a stream of events, joined by time with the gc pauses of
+the stream (see chargePauses).
+
+A safepoint is held until an event stamped `horizon` seconds after its
+end comes, so a pause which comes after it in the stream is joined as
+well. Pauses are dropped when no held safepoint can reach them, so the
+memory is bounded by the events of `horizon` seconds.
+
+events :: Iterable Dictionary
+clock :: 'utc' | 'uptime'
+horizon :: Float
+return :: Generator Dictionary # Safepoints with gc_ms and non_gc_ms.
+
+"""
+def joinPauses(events, clock='uptime', horizon=DEFAULT_HORIZON):
+    pauses = deque()   # (start, end) of the pauses in order of the stream.
+    held = deque()     # (start, end, safepoint) in order of the stream.
+    latest = None
+    for data in events:
+        if data.get("type") == "Safepoint":
+            iv = safepointInterval(data, clock)
+            if iv is None:
+                continue
+            held.append(iv + (data,))
+        else:
+            iv = gclog_window.pauseInterval(data, clock)
+            if iv is None:
+                continue
+            pauses.append(iv)
+        if latest is None or iv[1] > latest:
+            latest = iv[1]
+        while held and held[0][1] + horizon < latest:
+            first = held.popleft()
+            while pauses and pauses[0][1] < first[0] - horizon:
+                pauses.popleft()
+            yield chargePauses(first, pauses)
+    while held:
+        yield chargePauses(held.popleft(), pauses)
+
+# Dictionary
+def newStall():
+    return {"safepoints": 0, "stopped_ms": 0.0, "ttsp_ms": 0.0, "max_ttsp_ms": 0.0,
+            "gc_safepoints": 0, "gc_ms": 0.0,
+            "non_gc_safepoints": 0, "non_gc_stall_ms": 0.0, "operations": {}}
+
+"""
+Add a safepoint of joinPauses to a window.
+
+stall :: Dictionary
+data :: Dictionary
+
+"""
+def addStall(stall, data):
+    stall["safepoints"] += 1
+    stall["stopped_ms"] += data["stopped_ms"]
+    ttsp = data.get("ttsp_ms", 0.0)
+    stall["ttsp_ms"] += ttsp
+    stall["max_ttsp_ms"] = max(stall["max_ttsp_ms"], ttsp)
+    if data["gc_ms"] > 0:
+        stall["gc_safepoints"] += 1
+        stall["gc_ms"] += data["gc_ms"]
+    else:
+        stall["non_gc_safepoints"] += 1
+    stall["non_gc_stall_ms"] += data["non_gc_ms"]
+    if "operation" in data and data["non_gc_ms"] > 0:
+        ops = stall["operations"]
+        ops[data["operation"]] = ops.get(data["operation"], 0.0) + data["non_gc_ms"]
+
+"""
+Windowed stall of the safepoints of joinPauses.
+
+For every tumbling window of `size` seconds this computes
+    safepoints, stopped_ms       safepoints which started within the
+                                 window, and their stop.
+    ttsp_ms, max_ttsp_ms         their time to reach the safepoint.
+    gc_safepoints, gc_ms         the safepoints of gc pauses, and the
+                                 time of the pauses.
+    non_gc_safepoints            the safepoints of no gc pause.
+    non_gc_stall_ms              the stop which no gc pause accounts for.
+    non_gc_share                 non_gc_stall_ms / window size.
+    operations                   non_gc_stall_ms per operation, where the
+                                 log names them.
+A safepoint goes to the window where it starts, or to the first open
+window if it comes after that is closed. Windows without safepoints
+are given as well, so the windows are contiguous. The last window ends
+with the last safepoint, and non_gc_share is normalised by the time it
+covers.
+
+safepoints :: Iterable Dictionary
+size :: Float # seconds.
+clock :: 'utc' | 'uptime'
+return :: Generator Dictionary
+
+"""
+def stallWindows(safepoints, size, clock='uptime'):
+    current = None
+    last = None
+    stall = newStall()
+
+    def close_(w, final=False):
+        stall["start"] = w * size
+        stall["end"] = (w + 1) * size
+        if final and stall["start"] < last < stall["end"]:
+            stall["end"] = last
+        stall["non_gc_share"] = stall["non_gc_stall_ms"] / ((stall["end"] - stall["start"]) * 1000.0)
+        return stall
+
+    for data in safepoints:
+        iv = safepointInterval(data, clock)
+        if iv is None:
+            continue
+        w = int(math.floor(iv[0] / size))
+        if current is None:
+            current = w
+        while current < w:
+            yield close_(current)
+            stall = newStall()
+            current += 1
+        addStall(stall, data)
+        last = max(last, iv[1])
+    if current is not None:
+        yield close_(current, True)
+
+
+################################################################################
+# main
+################################################################################
+"""
+Parse lines of a log lazily.
+
+lines :: Iterable String
+unparsed :: ((String, ParseError) -> ANY) | None # called for lines failed to parse.
+parser :: Parser | None # parseJavaGcLog by default, or a wrapper of it
+                        # such as gclog_prefilter.mkPrefilter.
+return :: Generator Dictionary
+
+"""
+def iterGcLog(lines, unparsed=None, parser=None):
+   if parser is None:
+       parser = parseJavaGcLog
+   state = [None]
+   for line in lines:
+       text = line.rstrip()
+       try:
+           (ret, data) = parser(text, {})
+       except ParseError, msg:
+           if unparsed is not None:
+               unparsed(text, msg)
+           continue
+       data = withOperation(state, data)
+       if data is not None:
+           yield data
+
+def process_file(filename, layout=None):
+   if layout == 'auto':
+       with open(dirs+filename,'r') as fd:
+           layout = gclog_unified.detectLayout(fd)
+   if layout is not None:
+       setLayout(layout)
+   with open(dirs+filename,'r') as fd:
+       output = list(iterGcLog(fd))
+   with open(dirs+filename+'.json','w') as fd:
+       fd.write(json.dumps(output))
+
+if __name__=='__main__':
+    import importlib
+    import gclog_pipe
+    from multiprocessing import Pool
+
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    opts = dict((a[2:].split('=', 1) + [None])[:2] for a in sys.argv[1:] if a.startswith('--'))
+    layout = opts.get('layout')
+    if args and args[0] == 'stall':
+        module = importlib.import_module(args[1])
+        size = float(args[2])
+        clock = args[3] if len(args) > 3 else 'uptime'
+        gclog_pipe.defaultSigpipe()
+        lines = sys.stdin
+        if layout == 'auto':
+            head = list(itertools.islice(lines, gclog_unified.DETECT_LINES))
+            layout = gclog_unified.detectLayout(head)
+            lines = itertools.chain(head, lines)
+        if layout:
+            setLayout(layout)
+            if hasattr(module, 'setLayout'):
+                module.setLayout(layout)
+        catch = mkSafepointCatcher()
+        events = interleave(module.iterGcLog(lines, catch), catch)
+        for w in stallWindows(joinPauses(events, clock), size, clock):
+            print json.dumps(w)
+        exit(0)
+    if gclog_pipe.isPipe(sys.argv[1:]):
+        gclog_pipe.runPipe(sys.modules[__name__], sys.argv[1:])
+        exit(0)
+    dirs = args[0]
+    allfiles = os.listdir(dirs)
+    files = []
+    for f in allfiles:
+        if f.endswith('gclog') or f.endswith('.log'):
+            files.append(f)
+
+    if len(files) == 0:
+        print('No gclog to parse')
+        exit(0)
+    pool = Pool(processes=len(files))
+    multi_results = []
+
+    for filename in files:
+        i = files.index(filename)
+        print("Thread %d for %s"%(i,filename))
+        multi_results.append(
+            pool.apply_async(
+                process_file,
+                (filename, layout)
+            )
+        )
+    print('Waiting for results ...')
+    for res in multi_results:
+        res.get()
+    print('Finished to process %d gclogs'%len(files))
+# end of file.
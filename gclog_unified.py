@@ -0,0 +1,643 @@
+# coding: utf-8
+
+import os
+import re
+import mmap
+import time
+
+import gclog_chunk
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+"""
+Helpers for the unified logging of OpenJDK9+ (-Xlog:gc*).
+
+Vectorised header decoding:
+    The decorators time and uptime are at the head of every line.
+        [2021-09-10T15:23:34.217+0800][123.534s]
+    The file is mmapped, the offsets of newlines are found by numpy,
+    and the time and uptime of all lines in a buffer are decoded at once.
+    Only the message body after the decorators is left to the regex
+    grammar of a parser module.
+
+    numpy is optional. mkHeaderScanner raises ImportError without it.
+
+Decorator layouts:
+    The decorators of a line are given by -Xlog, e.g.
+        -Xlog:gc*:file=gc.log:time,uptime,tid,level
+        -Xlog:gc*:file=gc.log:utctime,uptimemillis,pid,tid,level,tags
+    and are printed in a fixed order whatever the order in the option.
+    layoutSteps compiles such a spec (or one found by detectLayout from the
+    first lines of a log) into the regex steps of the header parser which
+    all the events of a grammar share. Time decorators are put into "utc"
+    and uptime decorators into "end_sec", whatever their unit.
+
+Level and tag filter:
+    With -Xlog:gc*=debug most lines are debug/trace or sub-lines such as
+    gc,phases which no grammar parses. The decorators at the head of a
+    line are split by position, and a line whose level or tags are not
+    selected is rejected before any regex runs.
+    Levels are e.g. "info,debug" and tags are tag sets in the form of
+    -Xlog, e.g. "gc,gc+marking,safepoint*" ("*" selects every tag set
+    which contains the others).
+    The scanners take the filter as accept (mkDecoratorAccept), and the
+    line parsers as a wrapper (mkDecoratorFilter).
+
+Usage:
+    scan = mkHeaderScanner(parseJavaGcLog, parseUnifiedHeader)
+    stats = {}
+    for data in scan(filename, stats):
+        ...
+
+    accept = mkDecoratorAccept("info", UNIFIED_TAGS)
+    scan = mkHeaderScanner(parseJavaGcLog, parseUnifiedHeader, accept=accept)
+
+    parse = mkDecoratorFilter(parseJavaGcLog, ParseError, "info", UNIFIED_TAGS)
+    for data in iterGcLog(lines, parser=parse):
+        ...
+
+"""
+
+################################################################################
+# Constants.
+################################################################################
+
+# "[2021-09-10T15:23:34.217+0800]"
+TIME_WIDTH = 30
+# Positions of the digits and the separators in TIME_WIDTH.
+TIME_DIGITS = [1, 2, 3, 4, 6, 7, 9, 10, 12, 13, 15, 16, 18, 19, 21, 22, 23,
+               25, 26, 27, 28]
+TIME_SEPARATORS = [(0, '['), (5, '-'), (8, '-'), (11, 'T'), (14, ':'),
+                   (17, ':'), (20, '.'), (29, ']'), (30, '[')]
+
+# Bytes looked at for "123.534s]" after TIME_WIDTH.
+UPTIME_WIDTH = 24
+
+# Decorators in the order the JVM prints them:
+# (name, short name, regex of the value)
+DECORATORS = [
+    ("time", "t", r"(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d+\.\d+[+-]\d{4})"),
+    ("utctime", "utc", r"(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d+\.\d+[+-]\d{4})"),
+    ("uptime", "u", r"(\d+\.\d+)s"),
+    ("timemillis", "tm", r"(\d+)ms"),
+    ("uptimemillis", "um", r"(\d+)ms"),
+    ("timenanos", "tn", r"(\d+)ns"),
+    ("uptimenanos", "un", r"(\d+)ns"),
+    ("hostname", "hn", r"[\w.-]+"),
+    ("pid", "p", r"\d+"),
+    ("tid", "ti", r"\d+"),
+    ("level", "l", r"\w+"),
+    ("tags", "tg", r"[\w,]+"),
+]
+
+# Layout of the parser modules unless another is set.
+DEFAULT_LAYOUT = "time,uptime,tid,level,tags"
+
+# Lines looked at by detectLayout.
+DETECT_LINES = 100
+
+# Levels of unified logging.
+LEVELS = frozenset(["trace", "debug", "info", "warning", "error"])
+
+# Levels which the grammars are written for.
+DEFAULT_LEVELS = "info"
+
+# Characters of the tags decorator.
+TAG_CHARS = frozenset("abcdefghijklmnopqrstuvwxyz0123456789,")
+
+
+################################################################################
+# Vectorised header decoding.
+################################################################################
+
+"""
+Offsets of the lines in a buffer.
+The last line is included only if it ends with a newline.
+
+buf :: numpy.ndarray(uint8)
+base :: Int # offset of buf in the file.
+return :: (numpy.ndarray(int64), numpy.ndarray(int64)) # starts and ends.
+
+"""
+def lineIndex(buf, base=0):
+    ends = np.flatnonzero(buf == 10)
+    starts = np.empty_like(ends)
+    if len(ends) > 0:
+        starts[0] = 0
+        starts[1:] = ends[:-1] + 1
+    return (starts + base, ends + base)
+
+"""
+Decode the time and uptime decorators of lines.
+
+Lines which don't start with the decorators are marked invalid.
+The results are the same as regexp_timestamp and regexp_float of the
+parser modules give for the fixed width form written by the JVM.
+
+buf :: numpy.ndarray(uint8) # whole file.
+starts :: numpy.ndarray(int64)
+ends :: numpy.ndarray(int64)
+return :: {'valid': ndarray(bool), 'utc': ndarray(S28),
+           'end_sec': ndarray(float64), 'body': ndarray(int64)}
+
+"""
+def decodeHeaders(buf, starts, ends):
+    last = len(buf) - 1
+    valid = (ends - starts) > TIME_WIDTH + 4
+
+    # [2021-09-10T15:23:34.217+0800][
+    cols = np.arange(TIME_WIDTH + 1)
+    head = buf[np.minimum(starts[:, None] + cols, last)]
+    for (i, c) in TIME_SEPARATORS:
+        valid &= head[:, i] == ord(c)
+    valid &= (head[:, 24] == ord('+')) | (head[:, 24] == ord('-'))
+    digits = head[:, TIME_DIGITS]
+    valid &= ((digits >= 48) & (digits <= 57)).all(axis=1)
+    utc = np.ascontiguousarray(head[:, 1:TIME_WIDTH - 1]).view('S28').ravel()
+
+    # 123.534s]
+    cols = np.arange(UPTIME_WIDTH)
+    win = buf[np.minimum(starts[:, None] + (TIME_WIDTH + 1) + cols, last)]
+    isDot = win == ord('.')
+    isSec = win == ord('s')
+    dot = isDot.argmax(axis=1)
+    sec = isSec.argmax(axis=1)
+    valid &= isDot.any(axis=1) & isSec.any(axis=1)
+    valid &= (dot > 0) & (sec > dot + 1)
+    rows = np.arange(len(starts))
+    valid &= win[rows, np.minimum(sec + 1, UPTIME_WIDTH - 1)] == ord(']')
+    isNum = (cols[None, :] < sec[:, None]) & (cols[None, :] != dot[:, None])
+    d = win.astype(np.int64) - 48
+    valid &= ((d >= 0) & (d <= 9) | ~isNum).all(axis=1)
+    # Place value of each digit as if the dot were not there.
+    power = sec[:, None] - 1 - cols[None, :] - (cols[None, :] < dot[:, None])
+    power = np.where(isNum, power, 0)
+    value = (np.where(isNum, d, 0) * 10 ** power).sum(axis=1)
+    end_sec = value / 10.0 ** (sec - dot - 1)
+    body = starts + (TIME_WIDTH + 1) + sec + 2
+
+    return {'valid': valid, 'utc': utc, 'end_sec': end_sec, 'body': body}
+
+"""
+Make a scanner which decodes headers by numpy and bodies by regex.
+
+The layout of the header must start with time (or utctime) and uptime.
+The other decorators are left to the regex.
+Lines which accept rejects (e.g. mkDecoratorAccept) are unmatched, and
+are not given to the regex.
+
+parser :: Parser # parseJavaGcLog of a unified logging module.
+header :: Parser # parseUnifiedHeader of the module.
+chunkSize :: Int
+accept :: (String -> Bool) | None # of a whole line.
+return :: (String, Dictionary | None) -> Generator Dictionary
+
+"""
+def mkHeaderScanner(parser, header, chunkSize=gclog_chunk.CHUNK_SIZE, accept=None):
+    if np is None:
+        raise ImportError("numpy is required for the header scanner")
+    names = [getattr(p, 'decorator', None) for p in header.parsers[:2]]
+    if names[0] not in ("time", "utctime") or names[1] != "uptime":
+        raise ValueError("The header scanner needs the layout time,uptime,...: %r" % names)
+    families = gclog_chunk.compileFused(parser, skip=header.parsers[:2], prefix="")
+
+    def scan_(filename, stats=None):
+        if stats is None:
+            stats = {}
+        stats.setdefault('lines', 0)
+        stats.setdefault('matched', 0)
+        stats.setdefault('unmatched', 0)
+        with open(filename, 'rb') as fd:
+            size = os.fstat(fd.fileno()).st_size
+            if size == 0:
+                return
+            mm = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            buf = np.frombuffer(mm, dtype=np.uint8)
+            off = 0
+            while off < size:
+                n = chunkSize
+                while True:
+                    # A line may be longer than a chunk.
+                    (starts, ends) = lineIndex(buf[off:off + n], off)
+                    if len(ends) > 0 or off + n >= size:
+                        break
+                    n *= 2
+                if off + n >= size and (len(ends) == 0 or ends[-1] != size - 1):
+                    # The last line has no newline.
+                    starts = np.append(starts, ends[-1] + 1 if len(ends) > 0 else off)
+                    ends = np.append(ends, size)
+                hdr = decodeHeaders(buf, starts, ends)
+                idx = np.flatnonzero(hdr['valid'])
+                utcL = hdr['utc'][idx].tolist()
+                secL = hdr['end_sec'][idx].tolist()
+                bodyL = hdr['body'][idx].tolist()
+                endL = ends[idx].tolist()
+                startL = starts[idx].tolist()
+                batch = []
+                for k in xrange(len(idx)):
+                    if accept is not None and not accept(mm[startL[k]:endL[k]]):
+                        continue
+                    for (pattern, table) in families:
+                        m = pattern.match(mm, bodyL[k], endL[k])
+                        if m:
+                            batch.append((k, m, table))
+                            break
+                stats['lines'] += len(starts)
+                stats['matched'] += len(batch)
+                stats['unmatched'] += len(starts) - len(batch)
+                for (k, m, table) in batch:
+                    data = gclog_chunk.convertMatch(m, m.lastindex, table[m.lastindex])
+                    data['utc'] = utcL[k]
+                    data['end_sec'] = secL[k]
+                    yield data
+                off = int(ends[-1]) + 1
+            del buf
+        finally:
+            mm.close()
+    return scan_
+
+
+################################################################################
+# Decorator layouts.
+################################################################################
+
+"""
+Utc of epoch seconds in the form of the time decorator.
+
+t :: Float
+return :: String # e.g. 2021-09-10T07:23:34.217+0000
+
+"""
+def epochToUtc(t):
+    ms = int(round(t * 1000))
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(ms // 1000)) + \
+        ".%03d+0000" % (ms % 1000)
+
+# Data modifiers of decorators.
+# (Dictionary, [String]) -> Dictionary
+
+def setUtc(data, matchStringL):
+    data["utc"] = matchStringL[0]
+    return data
+
+def setTimeMillis(data, matchStringL):
+    data.setdefault("utc", epochToUtc(int(matchStringL[0]) / 1000.0))
+    return data
+
+def setTimeNanos(data, matchStringL):
+    data.setdefault("utc", epochToUtc(int(matchStringL[0]) / 1e9))
+    return data
+
+def setUptime(data, matchStringL):
+    data["end_sec"] = float(matchStringL[0])
+    return data
+
+def setUptimeMillis(data, matchStringL):
+    data.setdefault("end_sec", int(matchStringL[0]) / 1000.0)
+    return data
+
+def setUptimeNanos(data, matchStringL):
+    data.setdefault("end_sec", int(matchStringL[0]) / 1e9)
+    return data
+
+MODIFIERS = {"time": setUtc, "utctime": setUtc,
+             "timemillis": setTimeMillis, "timenanos": setTimeNanos,
+             "uptime": setUptime, "uptimemillis": setUptimeMillis,
+             "uptimenanos": setUptimeNanos}
+
+"""
+Compile a decorator spec into regex steps.
+
+The names may be long or short (e.g. "uptime" or "u") and in any order.
+The steps are in the order the JVM prints the decorators.
+The tags decorator is optional in a line, so that a layout matches
+logs with and without it.
+
+spec :: String | [String] # e.g. "time,uptime,tid,level"
+return :: [(String, String, dataModifier | None)] # (name, regexStr, modifier)
+
+"""
+def layoutSteps(spec):
+    if isinstance(spec, basestring):
+        spec = spec.split(',')
+    names = set()
+    for d in spec:
+        d = d.strip()
+        if not d:
+            continue
+        for (name, short, value) in DECORATORS:
+            if d in (name, short):
+                names.add(name)
+                break
+        else:
+            raise ValueError("Unknown decorator: %s" % d)
+    steps = []
+    for (name, short, value) in DECORATORS:
+        if name not in names:
+            continue
+        regexStr = r"\[\s*" + value + r"\s*\]"
+        if name == 'tags':
+            regexStr = "(?:%s)?" % regexStr
+        steps.append((name, regexStr, MODIFIERS.get(name)))
+    return steps
+
+"""
+Make a reader of the time decorators at the head of a line.
+Time decorators are printed before the others, so only they are matched.
+
+spec :: String | [String] # as layoutSteps.
+return :: (String -> (Float | None, String | None) | None) | None
+          # (uptime, utc) of a line. None for a layout without time.
+
+"""
+def mkLineTime(spec):
+    steps = [(name, regexStr, modifier) for (name, regexStr, modifier) in layoutSteps(spec)
+             if modifier is not None]
+    if len(steps) == 0:
+        return None
+    pattern = re.compile("^" + "".join(regexStr for (name, regexStr, modifier) in steps))
+
+    def lineTime_(line):
+        m = pattern.match(line)
+        if m is None:
+            return None
+        data = {}
+        for (k, (name, regexStr, modifier)) in enumerate(steps):
+            modifier(data, [m.group(k + 1)])
+        return (data.get("end_sec"), data.get("utc"))
+    return lineTime_
+
+"""
+Name of a decorator told by its form.
+
+decorator :: String # without brackets and padding.
+seen :: [String] # names of the decorators before it.
+return :: String | None
+
+"""
+def classifyDecorator(decorator, seen):
+    d = decorator.strip()
+    if re.match(DECORATORS[0][2] + "$", d):
+        return "utctime" if d.endswith("+0000") else "time"
+    if re.match(r"\d+\.\d+s$", d):
+        return "uptime"
+    if re.match(r"\d+ms$", d):
+        # Epoch in ms has 13 digits, uptime much less.
+        return "timemillis" if len(d) > 13 else "uptimemillis"
+    if re.match(r"\d+ns$", d):
+        return "timenanos" if len(d) > 19 else "uptimenanos"
+    if d in LEVELS:
+        return "level"
+    if re.match(r"\d+$", d):
+        return "tid" if "pid" in seen else "pid"
+    if "level" in seen and isTags(d):
+        return "tags"
+    if "pid" not in seen and "tid" not in seen and "level" not in seen:
+        return "hostname"
+    return None
+
+"""
+Detect the decorator spec of a log from its first lines.
+
+With one number decorator it is taken as tid, which has the same form
+as pid.
+
+lines :: Iterable String
+count :: Int
+return :: String | None # e.g. "time,uptime,tid,level,tags". None if not found.
+
+"""
+def detectLayout(lines, count=DETECT_LINES):
+    votes = {}
+    for (i, line) in enumerate(lines):
+        if i >= count:
+            break
+        (decorators, offset) = splitDecorators(line)
+        if len(decorators) == 0:
+            continue
+        names = []
+        for d in decorators:
+            name = classifyDecorator(d, names)
+            if name is None:
+                names = None
+                break
+            names.append(name)
+        if names is None:
+            continue
+        if names.count("pid") == 1 and "tid" not in names:
+            names[names.index("pid")] = "tid"
+        spec = ",".join(names)
+        votes[spec] = votes.get(spec, 0) + 1
+    if len(votes) == 0:
+        return None
+    return max(votes, key=lambda k: votes[k])
+
+
+################################################################################
+# Level and tag filter.
+################################################################################
+
+"""
+Decorators at the head of a line.
+
+text :: String
+return :: ([String], Int) # decorators without padding, offset of the message.
+
+"""
+def splitDecorators(text):
+    # The decorators end at the first "] ", and are split by "][".
+    end = text.find('] ')
+    if end < 0 or not text.startswith('['):
+        return ([], 0)
+    return ([d.rstrip() for d in text[1:end].split('][')], end + 1)
+
+"""
+Whether a decorator is the tags.
+
+decorator :: String
+return :: Bool
+
+"""
+def isTags(decorator):
+    return decorator[:1].isalpha() and decorator not in LEVELS \
+        and TAG_CHARS.issuperset(decorator)
+
+"""
+Positions of the level and the tags in decorators, told from the other
+decorators by their form.
+
+decorators :: [String]
+return :: (Int | None, Int | None)
+
+"""
+def levelTagsAt(decorators):
+    levelAt = None
+    tagsAt = None
+    for (i, d) in enumerate(decorators):
+        if d in LEVELS:
+            levelAt = i
+        elif isTags(d):
+            tagsAt = i
+    return (levelAt, tagsAt)
+
+"""
+Level and tags of a line.
+
+text :: String
+return :: (String | None, frozenset(String) | None)
+
+"""
+def levelTags(text):
+    decorators = splitDecorators(text)[0]
+    (levelAt, tagsAt) = levelTagsAt(decorators)
+    level = decorators[levelAt] if levelAt is not None else None
+    tags = frozenset(decorators[tagsAt].split(',')) if tagsAt is not None else None
+    return (level, tags)
+
+"""
+Parse a selection of levels.
+
+spec :: String | [String] # e.g. "info,debug"
+return :: frozenset(String)
+
+"""
+def parseLevels(spec):
+    if isinstance(spec, basestring):
+        spec = spec.split(',')
+    levels = frozenset(l.strip() for l in spec if l.strip())
+    unknown = levels - LEVELS
+    if unknown:
+        raise ValueError("Unknown levels: %s" % ", ".join(sorted(unknown)))
+    return levels
+
+"""
+Parse a selection of tag sets.
+
+spec :: String | [String] # e.g. "gc,gc+marking,safepoint*"
+return :: [(frozenset(String), Bool)] # (tags, True if "*")
+
+"""
+def parseTagSets(spec):
+    if isinstance(spec, basestring):
+        spec = spec.split(',')
+    tagSets = []
+    for t in spec:
+        t = t.strip()
+        if not t:
+            continue
+        wild = t.endswith('*')
+        tagSets.append((frozenset(x for x in t.rstrip('*').split('+') if x), wild))
+    return tagSets
+
+"""
+Whether tags are selected by tag sets.
+
+tags :: frozenset(String)
+tagSets :: [(frozenset(String), Bool)]
+return :: Bool
+
+"""
+def tagsSelected(tags, tagSets):
+    for (t, wild) in tagSets:
+        if tags == t or (wild and t <= tags):
+            return True
+    return False
+
+"""
+Make a level and tag check of lines.
+
+A line without the level (or tags) decorator is not filtered by it.
+All lines of a log have the same decorators, so the positions of the
+level and the tags are found once and only checked on the next lines.
+
+levels :: String | [String]
+tags :: String | [String] | None # None selects all tags.
+return :: String -> String | None # None if the line is selected,
+                                  # else 'skipped_level' or 'skipped_tags'.
+
+"""
+def mkDecoratorCheck(levels=DEFAULT_LEVELS, tags=None):
+    levels = parseLevels(levels)
+    tagSets = parseTagSets(tags) if tags is not None else None
+    layout = [None, None, None]   # number of decorators, levelAt, tagsAt.
+    # Checks by the level and the tags decorators as printed, padding and all.
+    known = {}
+
+    def check_(text):
+        end = text.find('] ')
+        raw = text[1:end].split('][') if end > 0 and text[:1] == '[' else []
+        n = len(raw)
+        (levelAt, tagsAt) = layout[1:]
+        if n == layout[0]:
+            key = (raw[levelAt] if levelAt is not None else None,
+                   raw[tagsAt] if tagsAt is not None else None)
+            if key in known:
+                return known[key]
+        decorators = [d.rstrip() for d in raw]
+        if n != layout[0] or (levelAt is not None and decorators[levelAt] not in LEVELS) \
+                or (tagsAt is not None and not isTags(decorators[tagsAt])):
+            (levelAt, tagsAt) = levelTagsAt(decorators)
+            layout[:] = [n, levelAt, tagsAt]
+            known.clear()
+        if levelAt is not None and decorators[levelAt] not in levels:
+            skipped = 'skipped_level'
+        elif tagSets is not None and tagsAt is not None \
+                and not tagsSelected(frozenset(decorators[tagsAt].split(',')), tagSets):
+            skipped = 'skipped_tags'
+        else:
+            skipped = None
+        known[(raw[levelAt] if levelAt is not None else None,
+               raw[tagsAt] if tagsAt is not None else None)] = skipped
+        return skipped
+    return check_
+
+"""
+Make a line filter for the scanners (gclog_chunk.mkChunkScanner and
+mkHeaderScanner) from a level and tag check.
+
+levels :: String | [String]
+tags :: String | [String] | None
+return :: String -> Bool
+
+"""
+def mkDecoratorAccept(levels=DEFAULT_LEVELS, tags=None):
+    check = mkDecoratorCheck(levels, tags)
+    return lambda text: check(text) is None
+
+"""
+Wrap a parser of a unified logging module with a level and tag filter
+(see mkDecoratorCheck).
+The wrapper behaves like the parser, and has the counters as .stats.
+    lines          lines given.
+    skipped_level  lines rejected by the level.
+    skipped_tags   lines rejected by the tags.
+
+parser :: Parser # typically parseJavaGcLog.
+error :: Exception class # ParseError of the module of the parser.
+levels :: String | [String]
+tags :: String | [String] | None # None selects all tags.
+return :: Parser
+
+"""
+def mkDecoratorFilter(parser, error, levels=DEFAULT_LEVELS, tags=None):
+    check = mkDecoratorCheck(levels, tags)
+    stats = {'lines': 0, 'skipped_level': 0, 'skipped_tags': 0}
+    reasons = {'skipped_level': "Level is not selected: \"%s\"",
+               'skipped_tags': "Tags are not selected: \"%s\""}
+
+    def parseFiltered_(text, data):
+        stats['lines'] += 1
+        skipped = check(text)
+        if skipped is not None:
+            stats[skipped] += 1
+            raise error(reasons[skipped] % text)
+        return parser(text, data)
+
+    parseFiltered_.stats = stats
+    return parseFiltered_
+
+# end of file.
@@ -0,0 +1,393 @@
+# coding: utf-8
+
+import sys
+import json
+import math
+import importlib
+from collections import deque
+
+import gclog_merge
+
+"""
+Windowed GC overhead and throughput of a stream of gc events.
+
+For every window of a fixed size this computes
+    pause_ms      time spent in gc pauses within the window.
+    pause_share   pause_ms / window size (or the time the last covers).
+    throughput    1 - pause_share.
+    pause_count   number of pauses which ended within the window.
+    max_pause_ms  longest pause which ended within the window.
+    reclaimed_mb  heap freed by the pauses which ended within the window.
+    gc_user_sec, gc_sys_sec, gc_real_sec
+                  sums of [Times: user sys real] of the gc events within
+                  the window, pauses and concurrent phases (JDK8 only).
+    parallelism   (gc_user_sec + gc_sys_sec) / gc_real_sec, None if no times.
+    sys_ratio     gc_sys_sec / (gc_user_sec + gc_sys_sec), None if no times.
+
+Windows are tumbling (step == size) or sliding (size is a multiple of
+step). The stream is cut into panes of the step, and a window is the sum
+of its last size/step panes, kept by running sums and a monotonic queue
+for the maximum, so each event costs O(1) amortised.
+A pause straddling a boundary adds to each pane only the part of it
+inside the pane.
+The last window of a stream ends at its last event (its end is that
+time), and pause_share is normalised by the time it covers.
+
+The events are those of any parser module: time comes from "utc" (wall
+clock, the default) or from "timestamp"/"end_sec" (uptime), and the
+length of a pause from "response" or "dur_ms". A stream whose first
+event has no "utc" (e.g. -Xlog without time decorators) is windowed by
+uptime instead, and each window tells its clock.
+Pauses of one JVM must come in order of time, as a gc log has them.
+
+Usage:
+    python2 -O this.py module size [step] < ${GC_LOG_FILE} | ${YOUR_ANALYZER}
+    # module is a parser module such as gclog_parser_cms.
+    # size and step are in seconds. One JSON object per window.
+
+"""
+
+################################################################################
+# Pauses.
+################################################################################
+
+# JDK8 events which stop the world but are not named "Pause".
+JDK8_PAUSE_TYPES = frozenset([
+    "ParNew", "FullGC", "CMS-initial-mark", "CMS-remark",
+    "CMS-concurrent-abortable-preclean-fullgc",
+    "ParallelGC", "ParallelFullGC", "SerialGC", "SerialFullGC",
+])
+
+"""
+Whether an event is a stop-the-world pause.
+
+data :: Dictionary
+return :: Bool
+
+"""
+def isPause(data):
+    t = data.get("type", "")
+    return t in JDK8_PAUSE_TYPES or " Pause " in t
+
+"""
+Length of a pause in seconds.
+
+data :: Dictionary
+return :: Float | None
+
+"""
+def pauseSeconds(data):
+    if "dur_ms" in data:
+        return data["dur_ms"] / 1000.0
+    if "response" in data:
+        # gclog_parser_she.py gives "response" in ms.
+        if data["type"].startswith("She "):
+            return data["response"] / 1000.0
+        return data["response"]
+    return None
+
+"""
+Time stamped on an event.
+
+data :: Dictionary
+clock :: 'utc' | 'uptime'
+return :: Float | None
+
+"""
+def stampSeconds(data, clock='utc'):
+    if clock == 'utc':
+        if "utc" not in data:
+            return None
+        return gclog_merge.utcSeconds(data["utc"])
+    elif "end_sec" in data:
+        return data["end_sec"]
+    elif "timestamp" in data:
+        return data["timestamp"]
+    return None
+
+"""
+Start and end of a pause.
+
+JDK8 events are stamped when they start, unified logging events when
+they end.
+
+data :: Dictionary
+clock :: 'utc' | 'uptime'
+return :: (Float, Float) | None
+
+"""
+def pauseInterval(data, clock='utc'):
+    if not isPause(data):
+        return None
+    dur = pauseSeconds(data)
+    if dur is None:
+        return None
+    t = stampSeconds(data, clock)
+    if t is None:
+        return None
+    if "end_sec" in data:
+        return (t - dur, t)
+    return (t, t + dur)
+
+"""
+Heap freed by a pause in MB.
+
+data :: Dictionary
+return :: Float
+
+"""
+def reclaimedMB(data):
+    if "heap_all" in data:
+        (before, after, cap) = data["heap_all"]
+        return (before - after) / 1024.0
+    if "heap_mb" in data:
+        (before, after, cap) = data["heap_mb"]
+        return float(before - after)
+    return 0.0
+
+
+################################################################################
+# Windows.
+################################################################################
+
+# Dictionary
+def newPane():
+    return {"pause_sec": 0.0, "pause_count": 0, "max_pause_sec": 0.0,
+            "reclaimed_mb": 0.0,
+            "gc_user_sec": 0.0, "gc_sys_sec": 0.0, "gc_real_sec": 0.0}
+
+# Fields of a pane summed over a window.
+SUM_FIELDS = ["pause_sec", "pause_count", "reclaimed_mb",
+              "gc_user_sec", "gc_sys_sec", "gc_real_sec"]
+
+"""
+State of the windows of one stream.
+
+size :: Float
+step :: Float
+clock :: 'utc' | 'uptime'
+return :: Dictionary
+
+"""
+def newWindowState(size, step, clock='utc'):
+    return {"size": size, "step": step, "k": int(round(size / step)),
+            "clock": clock,
+            "end": None,         # time of the last event.
+            "panes": {},         # open panes by index.
+            "next": None,        # index of the first open pane.
+            "last": None,        # index of the last pane with data.
+            "closed": deque(),   # last k closed panes: (index, pane).
+            "sums": dict((f, 0) for f in SUM_FIELDS),
+            "maxq": deque()}     # (index, max_pause_sec) decreasing.
+
+"""
+Add a pause to the panes it overlaps.
+The count, the maximum and the reclaimed heap go to the pane where the
+pause ends.
+
+state :: Dictionary
+start :: Float
+end :: Float
+data :: Dictionary
+
+"""
+def addPause(state, start, end, data):
+    step = state["step"]
+    panes = state["panes"]
+    # A pause may not go back into closed panes.
+    p0 = max(int(math.floor(start / step)), state["next"])
+    p1 = max(p0, int(math.ceil(end / step)) - 1)
+    for p in xrange(p0, p1 + 1):
+        lo = max(start, p * step)
+        hi = min(end, (p + 1) * step)
+        pane = panes.get(p)
+        if pane is None:
+            pane = panes[p] = newPane()
+        pane["pause_sec"] += max(0.0, hi - lo)
+    pane = panes[p1]
+    pane["pause_count"] += 1
+    pane["max_pause_sec"] = max(pane["max_pause_sec"], end - start)
+    pane["reclaimed_mb"] += reclaimedMB(data)
+    addTimes(pane, data)
+    if state["last"] is None or p1 > state["last"]:
+        state["last"] = p1
+    state["end"] = max(state["end"], end)
+
+"""
+Add [Times: user sys real] of an event to a pane.
+
+pane :: Dictionary
+data :: Dictionary
+
+"""
+def addTimes(pane, data):
+    if "times" in data:
+        (user, system, real) = data["times"]
+        pane["gc_user_sec"] += user
+        pane["gc_sys_sec"] += system
+        pane["gc_real_sec"] += real
+
+"""
+Add an event which is not a pause, to the pane of its stamp.
+
+state :: Dictionary
+t :: Float
+data :: Dictionary
+
+"""
+def addEvent(state, t, data):
+    p = max(int(math.floor(t / state["step"])), state["next"])
+    pane = state["panes"].get(p)
+    if pane is None:
+        pane = state["panes"][p] = newPane()
+    addTimes(pane, data)
+    if state["last"] is None or p > state["last"]:
+        state["last"] = p
+    state["end"] = max(state["end"], t)
+
+"""
+Close a pane and make the window which ends with it.
+
+state :: Dictionary
+p :: Int
+final :: Bool # True at the end of the stream, where the window may be partial.
+return :: Dictionary | None # None until the first k panes are closed.
+
+"""
+def closePane(state, p, final=False):
+    pane = state["panes"].pop(p, None) or newPane()
+    closed = state["closed"]
+    sums = state["sums"]
+    maxq = state["maxq"]
+    closed.append((p, pane))
+    for f in SUM_FIELDS:
+        sums[f] += pane[f]
+    while maxq and maxq[-1][1] <= pane["max_pause_sec"]:
+        maxq.pop()
+    maxq.append((p, pane["max_pause_sec"]))
+    k = state["k"]
+    if len(closed) > k:
+        (q, old) = closed.popleft()
+        for f in SUM_FIELDS:
+            sums[f] -= old[f]
+    while maxq[0][0] <= p - k:
+        maxq.popleft()
+    if len(closed) < k:
+        return None
+    size = state["size"]
+    step = state["step"]
+    start = (p + 1) * step - size
+    end = (p + 1) * step
+    if final and start < state["end"] < end:
+        end = state["end"]
+    share = sums["pause_sec"] / (end - start)
+    cpu = sums["gc_user_sec"] + sums["gc_sys_sec"]
+    real = sums["gc_real_sec"]
+    return {"start": start, "end": end, "clock": state["clock"],
+            "pause_ms": sums["pause_sec"] * 1000.0,
+            "pause_share": share,
+            "throughput": 1.0 - share,
+            "pause_count": sums["pause_count"],
+            "max_pause_ms": maxq[0][1] * 1000.0,
+            "reclaimed_mb": sums["reclaimed_mb"],
+            "gc_user_sec": sums["gc_user_sec"],
+            "gc_sys_sec": sums["gc_sys_sec"],
+            "gc_real_sec": real,
+            "parallelism": cpu / real if real > 0 else None,
+            "sys_ratio": sums["gc_sys_sec"] / cpu if cpu > 0 else None}
+
+"""
+Close the panes before a pane.
+
+state :: Dictionary
+until :: Int
+final :: Bool # as closePane.
+return :: Generator Dictionary
+
+"""
+def closeUntil(state, until, final=False):
+    if state["next"] is None:
+        state["next"] = until
+    while state["next"] < until:
+        w = closePane(state, state["next"], final)
+        state["next"] += 1
+        if w is not None:
+            yield w
+
+"""
+Clock of a stream, from its first timed event.
+
+data :: Dictionary
+clock :: 'utc' | 'uptime' # asked for.
+return :: 'utc' | 'uptime'
+
+"""
+def streamClock(data, clock='utc'):
+    if clock == 'utc' and "utc" not in data:
+        return 'uptime'
+    return clock
+
+"""
+Windowed pause statistics of a stream of events.
+
+Panes are closed when a pause starts or an event with times is stamped
+after them, and all are closed at the end of the stream.
+
+events :: Iterable Dictionary
+size :: Float # seconds.
+step :: Float | None # seconds. None makes tumbling windows.
+clock :: 'utc' | 'uptime'
+key :: (Dictionary -> ANY) | None # windows are made per key, e.g. per "jvm".
+return :: Generator Dictionary
+
+"""
+def windowStats(events, size, step=None, clock='utc', key=None):
+    if step is None:
+        step = size
+    if abs(size / step - round(size / step)) > 1e-9:
+        raise ValueError("size must be a multiple of step")
+    states = {}
+    for data in events:
+        if "times" not in data and not isPause(data):
+            continue
+        group = key(data) if key is not None else None
+        state = states.get(group)
+        c = state["clock"] if state is not None else streamClock(data, clock)
+        iv = pauseInterval(data, c)
+        if iv is not None:
+            at = iv[0]
+        elif "times" in data:
+            at = stampSeconds(data, c)
+            if at is None:
+                continue
+        else:
+            continue
+        if state is None:
+            state = states[group] = newWindowState(size, step, c)
+        for w in closeUntil(state, int(math.floor(at / step))):
+            if key is not None:
+                w["key"] = group
+            yield w
+        if iv is not None:
+            addPause(state, iv[0], iv[1], data)
+        else:
+            addEvent(state, at, data)
+    for (group, state) in states.items():
+        for w in closeUntil(state, state["last"] + 1, True):
+            if key is not None:
+                w["key"] = group
+            yield w
+
+
+################################################################################
+# main
+################################################################################
+
+if __name__=='__main__':
+    module = importlib.import_module(sys.argv[1])
+    size = float(sys.argv[2])
+    step = float(sys.argv[3]) if len(sys.argv) > 3 else None
+    for w in windowStats(module.iterGcLog(sys.stdin), size, step):
+        print json.dumps(w)
+
+# end of file.